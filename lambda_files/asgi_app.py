@@ -0,0 +1,207 @@
+"""
+ASGI entry point: serve the Lambda handler core from a long-running container.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8080 --timeout-graceful-shutdown 30
+
+Every HTTP request becomes the same event lambda_handler receives from API Gateway,
+so one codebase serves both deployments:
+
+    POST /          matching (single, batch, top-K, "async": true)
+    POST /jobs      same request body, queued as an async job; returns 202 and a job_id
+    GET /jobs/<id>  the job's status, and its result once finished
+    GET /health     liveness check (503 while shutting down)
+    OPTIONS *       CORS preflight
+
+The event loop never blocks. Preflights and health checks are answered on it
+directly. Other requests run on a thread pool of ASGI_MAX_CONCURRENCY threads, and
+their model calls go through the process-wide model client and its keep-alive
+connection pool (see model_backend.create_bedrock_client). Up to ASGI_MAX_PENDING
+more requests wait for a free thread; beyond that, requests are turned away at once
+with a 503. On shutdown, new requests get a 503 while the ones in flight are given
+ASGI_SHUTDOWN_TIMEOUT_SECONDS to finish.
+
+Streamed simulations are served by local_server.py. For load tests, run the
+server with MODEL_BACKEND=fake, or drive the app in-process with
+python benchmark.py --asgi.
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import lambda_function
+
+# Requests handled at once per process; raise BEDROCK_MAX_WORKERS with it, since each
+# request waits on at most one model call at a time (two while hedging)
+MAX_CONCURRENCY = int(os.environ.get('ASGI_MAX_CONCURRENCY', '64'))
+# Requests allowed to wait for a free slot before new ones are rejected with a 503
+MAX_PENDING = int(os.environ.get('ASGI_MAX_PENDING', '1024'))
+# Stands in for the Lambda timeout (API Gateway gives up after 29 seconds)
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get('ASGI_REQUEST_TIMEOUT_SECONDS', '29'))
+SHUTDOWN_TIMEOUT_SECONDS = float(os.environ.get('ASGI_SHUTDOWN_TIMEOUT_SECONDS', '30'))
+# Warm the model connection and candidate indexes before accepting traffic
+WARMUP_ON_STARTUP = os.environ.get('ASGI_WARMUP', 'true').lower() != 'false'
+# Threads running async jobs in this process (0 leaves them to python job_queue.py)
+JOB_WORKERS = int(os.environ.get('ASGI_JOB_WORKERS', '0'))
+
+BUSY_BODY = json.dumps({"success": False, "error": "The matchmaking service is busy. Please try again shortly."})
+
+
+def unavailable(body):
+    """503 answered by the app itself, while shutting down or when the queue is full."""
+    return {
+        "statusCode": 503,
+        "headers": dict(lambda_function.CORS_HEADERS, **{"Content-Type": "application/json", "Retry-After": "1"}),
+        "body": body
+    }
+
+
+def lambda_event(scope, body):
+    """The API Gateway (REST API) event for an ASGI HTTP request."""
+    method = scope['method']
+    path = scope['path']
+    _, separator, job_id = path.rstrip('/').rpartition('/jobs/')
+    if method == 'GET' and separator and job_id:
+        body = json.dumps({"job_id": job_id})
+    elif method == 'POST' and path.rstrip('/').endswith('/jobs'):
+        try:
+            request = json.loads(body or '{}')
+        except json.JSONDecodeError:
+            request = None
+        if isinstance(request, dict):
+            request['async'] = True
+            body = json.dumps(request)
+    return {
+        'httpMethod': method,
+        'path': path,
+        'headers': {name.decode('latin-1'): value.decode('latin-1') for name, value in scope.get('headers', [])},
+        'queryStringParameters': None,
+        'body': body,
+    }
+
+
+class HandlerApp:
+    """ASGI application running lambda_handler with bounded concurrency."""
+
+    def __init__(self, handler=None, max_concurrency=MAX_CONCURRENCY, max_pending=MAX_PENDING,
+                 request_timeout=REQUEST_TIMEOUT_SECONDS, shutdown_timeout=SHUTDOWN_TIMEOUT_SECONDS,
+                 warmup=WARMUP_ON_STARTUP, job_workers=JOB_WORKERS):
+        self.handler = handler or lambda_function.lambda_handler
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.warmup = warmup
+        self.job_workers = job_workers
+        self.in_flight = 0
+        self.draining = False
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='handler')
+        self._slots = None
+        self._idle = None
+        self._job_worker = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    def _ensure_primitives(self):
+        # Created on the serving loop, not at import time
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._idle = asyncio.Event()
+            self._idle.set()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def startup(self):
+        self._ensure_primitives()
+        loop = asyncio.get_running_loop()
+        if self.warmup:
+            await loop.run_in_executor(self._executor, self.handler, {'warmup': True}, None)
+        if self.job_workers > 0:
+            self._job_worker = lambda_function.start_job_workers(self.job_workers)
+        print(f"🚀 ASGI app ready: {self.max_concurrency} concurrent requests, "
+              f"{self.max_pending} pending, {self.job_workers} job worker(s)")
+
+    async def shutdown(self):
+        """Refuse new requests and give the ones in flight time to finish."""
+        self._ensure_primitives()
+        self.draining = True
+        print(f"🛑 Shutting down with {self.in_flight} request(s) in flight")
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ {self.in_flight} request(s) still running after {self.shutdown_timeout}s")
+        loop = asyncio.get_running_loop()
+        if self._job_worker is not None:
+            await loop.run_in_executor(None, self._job_worker.stop, self.shutdown_timeout)
+        self._executor.shutdown(wait=False)
+
+    async def _read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks).decode('utf-8', errors='replace')
+
+    async def _http(self, scope, receive, send):
+        self._ensure_primitives()
+        body = await self._read_body(receive)
+        if body is None:
+            return
+        event = lambda_event(scope, body)
+        route = lambda_function.route_event(event)
+
+        if self.draining and route != 'preflight':
+            await self._send(send, unavailable(json.dumps({"status": "draining"}) if route == 'health' else BUSY_BODY))
+            return
+        if route in ('preflight', 'health'):
+            # Microseconds of work; not worth a thread hop
+            await self._send(send, self.handler(event, None))
+            return
+        if self.in_flight >= self.max_concurrency + self.max_pending:
+            await self._send(send, unavailable(BUSY_BODY))
+            return
+
+        self.in_flight += 1
+        self._idle.clear()
+        try:
+            async with self._slots:
+                context = lambda_function.JobContext(self.request_timeout)
+                loop = asyncio.get_running_loop()
+                response = await loop.run_in_executor(self._executor, self.handler, event, context)
+        finally:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._idle.set()
+        await self._send(send, response)
+
+    @staticmethod
+    async def _send(send, response):
+        body = (response.get('body') or '').encode('utf-8')
+        headers = [(name.lower().encode('latin-1'), str(value).encode('latin-1'))
+                   for name, value in (response.get('headers') or {}).items()]
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': response.get('statusCode', 200), 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+app = HandlerApp()
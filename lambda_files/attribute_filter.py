@@ -0,0 +1,276 @@
+"""
+Hard attribute filters applied before any candidate reaches the model.
+
+Profiles carry structured facts: the frontend's formatter writes phrases such as
+"lives in Denver, CO", "smokes sometimes", "wants children: no" and "very
+religious (muslim)", and candidate names end in "(Female)" / "(Male)". The
+extractor turns a profile into a small dict of attributes with a handful of regular
+expressions. AttributeIndex keeps one bitset (a Python int, bit i = candidate i)
+per attribute value, so the candidates compatible with a user are a few AND/OR
+operations over the whole pool - microseconds even for 100k candidates.
+A fact only counts when it is about the profile's author: a sentence that mentions
+someone else first ("she lives in Denver, smokes sometimes") is skipped.
+
+Unknown values never exclude anyone: a candidate whose smoking habits are not
+stated is kept even for a user who rules out smokers. The rules are:
+
+    gender      the candidate's gender is one the user is looking for, and vice versa
+    children    "wants children: yes" and "no" rule each other out
+    smoking     a user who rules out smokers excludes candidates who smoke, and the reverse
+    religion    when religion is very important to either side, it must match
+    location    different cities are excluded unless either side is open to long distance
+"""
+import json
+import os
+import re
+
+GENDERS = ('female', 'male', 'nonbinary')
+
+GENDER_WORDS = {
+    'woman': 'female', 'female': 'female', 'girl': 'female', 'women': 'female',
+    'man': 'male', 'male': 'male', 'guy': 'male', 'men': 'male',
+    'non-binary': 'nonbinary', 'nonbinary': 'nonbinary', 'enby': 'nonbinary',
+}
+GENDER_ALTERNATION = '|'.join(sorted(GENDER_WORDS, key=len, reverse=True))
+
+NAME_GENDER = re.compile(r'\((female|male|non-binary)\)', re.IGNORECASE)
+SELF_GENDER = re.compile(
+    rf"\b(?:i'?m|i am|as)\s+an?\s+(?:\d+[- ]year[- ]old\s+)?"
+    rf"(?:(?:straight|gay|lesbian|bisexual|pansexual|queer)\s+)?({GENDER_ALTERNATION})\b",
+    re.IGNORECASE
+)
+SEEKING = re.compile(
+    rf"\b(?:looking for|seeking|interested in|want to meet|attracted to)\s+(?:an?\s+)?"
+    rf"({GENDER_ALTERNATION})(?:\s+(?:or|and|/)\s+(?:an?\s+)?({GENDER_ALTERNATION}))?\b",
+    re.IGNORECASE
+)
+ORIENTATION = re.compile(r'\b(straight|heterosexual|gay|lesbian|bisexual|pansexual|queer)\b', re.IGNORECASE)
+
+NON_SMOKER = re.compile(r"\b(?:non-?smoker|(?:i\s+)?(?:don'?t|do not|never)\s+smoke)\b", re.IGNORECASE)
+SOMETIMES_SMOKER = re.compile(r'\b(?:smokes? (?:sometimes|occasionally|socially)|social smoker|occasional smoker)\b', re.IGNORECASE)
+SMOKER = re.compile(r"\b(?:smokes? (?:yes|regularly|daily|frequently)|i smoke|i'?m a smoker|i am a smoker)\b", re.IGNORECASE)
+NO_SMOKERS = re.compile(
+    r"\b(?:no smokers|non-?smokers? only|(?:can'?t|cannot|won'?t|will not) (?:date|stand|be with) (?:a )?smokers?"
+    r"|smoking is a (?:deal ?-?breaker|no-?go)|deal ?-?breakers?:?[^.]*\bsmok)",
+    re.IGNORECASE
+)
+
+WANTS_CHILDREN = re.compile(r'\bwants? (?:children|kids):\s*(yes|no|open to it)\b', re.IGNORECASE)
+CHILDREN_YES = re.compile(r"\b(?:i (?:want|would love) (?:to have )?(?:children|kids)|want(?:s)? (?:children|kids) (?:someday|in the future|one day))\b", re.IGNORECASE)
+CHILDREN_NO = re.compile(r"\b(?:(?:i )?(?:don'?t|do not|never) want (?:children|kids)|child-?free|no kids for me)\b", re.IGNORECASE)
+
+RELIGIONS = ('agnostic', 'atheist', 'buddhist', 'catholic', 'christian', 'hindu', 'jewish', 'muslim', 'spiritual')
+RELIGION_ALTERNATION = '|'.join(RELIGIONS)
+RELIGION_IMPORTANCE = re.compile(rf'\b(very|somewhat) religious \(({RELIGION_ALTERNATION})\)', re.IGNORECASE)
+RELIGION_SELF = re.compile(rf"\b(?:i'?m|i am)\s+(?:an?\s+)?(?:devout\s+|practicing\s+)?({RELIGION_ALTERNATION})\b", re.IGNORECASE)
+
+# The place is the run of capitalized words after the phrase ("lives in Denver, CO",
+# "Living in New York has..."), so free text after it is never swallowed
+LOCATION = re.compile(
+    r"\b(?:[Ll]ives in|[Ll]iving in|[Bb]ased in|I live in)\s+"
+    r"((?:(?:St|Ft|Mt)\. )?[A-Z][\w'-]*(?: (?!I\b)[A-Z][\w'-]*){0,3})\b"
+)
+# A word said three times in a row is a stutter, not a place ("Bora Bora Bora")
+REPEATED_PLACE_WORD = re.compile(r"\b(\w+) \1 \1\b", re.IGNORECASE)
+LONG_DISTANCE = re.compile(r'\b(?:open to (?:long[- ]distance|relocat\w*)|willing to (?:move|relocate)|long[- ]distance is fine)\b', re.IGNORECASE)
+
+# Facts after one of these in the same sentence describe someone else ("she lives
+# in Denver, smokes sometimes", "someone who wants kids"), not the profile's author
+OTHER_PERSON = re.compile(
+    r"\b(?:she|he|they|her|his|him|their|them|someone|somebody|anyone|partner|who|whose"
+    r"|my (?:ex|friend|sister|brother|mom|mother|dad|father|parents|roommate))\b",
+    re.IGNORECASE
+)
+SENTENCE_END = re.compile(r'[.!?\n]')
+
+# Attribute fields a candidate record may state directly instead of in its text
+RECORD_FIELDS = ('gender', 'seeking', 'smoking', 'no_smokers', 'wants_children', 'religion',
+                 'religion_very_important', 'location', 'long_distance')
+
+
+def seeking_from_orientation(orientation, gender):
+    orientation = orientation.lower()
+    if orientation in ('bisexual', 'pansexual', 'queer'):
+        return set(GENDERS)
+    if gender is None:
+        return None
+    if orientation in ('straight', 'heterosexual'):
+        return {'male'} if gender == 'female' else {'female'} if gender == 'male' else None
+    if orientation == 'lesbian':
+        return {'female'}
+    return {gender}  # gay
+
+
+def own_match(pattern, text):
+    """First match of pattern that is about the author, or None.
+
+    A match counts unless its sentence mentions another person before it, so the
+    formatter's phrases ("28 years old, lives in Denver, CO.") and first-person
+    statements count, and descriptions of a partner, ex or friend do not.
+    """
+    for match in pattern.finditer(text):
+        sentence_start = max((end.end() for end in SENTENCE_END.finditer(text, 0, match.start())), default=0)
+        if not OTHER_PERSON.search(text, sentence_start, match.start()):
+            return match
+    return None
+
+
+def extract_attributes(text):
+    """Attributes the author states about themselves; attributes not stated are absent."""
+    attributes = {}
+
+    match = NAME_GENDER.search(text) or SELF_GENDER.search(text)
+    if match:
+        attributes['gender'] = GENDER_WORDS[match.group(1).lower()]
+
+    match = own_match(SEEKING, text)
+    if match:
+        attributes['seeking'] = {GENDER_WORDS[word.lower()] for word in match.groups() if word}
+    else:
+        match = own_match(ORIENTATION, text)
+        seeking = match and seeking_from_orientation(match.group(1), attributes.get('gender'))
+        if seeking:
+            attributes['seeking'] = seeking
+
+    if own_match(SMOKER, text):
+        attributes['smoking'] = 'yes'
+    elif own_match(SOMETIMES_SMOKER, text):
+        attributes['smoking'] = 'sometimes'
+    elif own_match(NON_SMOKER, text):
+        attributes['smoking'] = 'no'
+    if own_match(NO_SMOKERS, text):
+        attributes['no_smokers'] = True
+
+    match = own_match(WANTS_CHILDREN, text)
+    if match:
+        answer = match.group(1).lower()
+        attributes['wants_children'] = 'open' if answer == 'open to it' else answer
+    elif own_match(CHILDREN_NO, text):
+        attributes['wants_children'] = 'no'
+    elif own_match(CHILDREN_YES, text):
+        attributes['wants_children'] = 'yes'
+
+    match = own_match(RELIGION_IMPORTANCE, text)
+    if match:
+        attributes['religion'] = match.group(2).lower()
+        attributes['religion_very_important'] = match.group(1).lower() == 'very'
+    else:
+        match = own_match(RELIGION_SELF, text)
+        if match:
+            attributes['religion'] = match.group(1).lower()
+
+    match = own_match(LOCATION, text)
+    if match and not REPEATED_PLACE_WORD.search(match.group(1)):
+        attributes['location'] = normalize_location(match.group(1))
+    if own_match(LONG_DISTANCE, text):
+        attributes['long_distance'] = True
+
+    return attributes
+
+
+def normalize_location(location):
+    """City part of a location, lowercased: "San Francisco, CA" -> "san francisco"."""
+    return location.split(',')[0].strip().lower()
+
+
+def candidate_attributes(candidate):
+    """Attributes of a candidate record: explicit fields win over what its text states."""
+    attributes = extract_attributes(f"{candidate['name']}\n{candidate['profile']}")
+    for field in RECORD_FIELDS:
+        value = candidate.get(field)
+        if value is None:
+            continue
+        if field == 'seeking':
+            value = {GENDER_WORDS.get(str(item).lower(), str(item).lower()) for item in value}
+        elif field == 'gender':
+            value = GENDER_WORDS.get(str(value).lower(), str(value).lower())
+        elif field == 'location':
+            value = normalize_location(value)
+        elif isinstance(value, str):
+            value = value.lower()
+        attributes[field] = value
+    return attributes
+
+
+class AttributeIndex:
+    """Inverted index from (attribute, value) to a bitset of candidate positions."""
+
+    def __init__(self, candidates=()):
+        self.size = 0
+        self.bits = {}
+        for position, candidate in enumerate(candidates):
+            self._add(position, candidate_attributes(candidate))
+            self.size = position + 1
+
+    def _add(self, position, attributes):
+        bit = 1 << position
+        for field, value in attributes.items():
+            values = value if isinstance(value, set) else (value,)
+            for item in values:
+                key = f"{field}={str(item).lower()}"
+                self.bits[key] = self.bits.get(key, 0) | bit
+            self.bits[f"{field}?"] = self.bits.get(f"{field}?", 0) | bit
+
+    def _get(self, key):
+        return self.bits.get(key, 0)
+
+    def _unknown(self, field):
+        return self.all ^ self._get(f"{field}?")
+
+    @property
+    def all(self):
+        return (1 << self.size) - 1
+
+    def compatible(self, user):
+        """Bitset of the candidates compatible with a user's extracted attributes."""
+        allowed = self.all
+        gender = user.get('gender')
+
+        if user.get('seeking'):
+            wanted = self._unknown('gender')
+            for item in user['seeking']:
+                wanted |= self._get(f"gender={item}")
+            allowed &= wanted
+        if gender:
+            allowed &= self._get(f"seeking={gender}") | self._unknown('seeking')
+
+        wants_children = user.get('wants_children')
+        if wants_children == 'yes':
+            allowed &= ~self._get('wants_children=no')
+        elif wants_children == 'no':
+            allowed &= ~self._get('wants_children=yes')
+
+        if user.get('no_smokers'):
+            allowed &= ~(self._get('smoking=yes') | self._get('smoking=sometimes'))
+        if user.get('smoking') in ('yes', 'sometimes'):
+            allowed &= ~self._get('no_smokers=true')
+
+        religion = user.get('religion')
+        if religion:
+            same_or_unknown = self._get(f"religion={religion}") | self._unknown('religion')
+            if user.get('religion_very_important'):
+                allowed &= same_or_unknown
+            # Candidates for whom religion is very important need a match too
+            allowed &= ~(self._get('religion_very_important=true') & ~same_or_unknown)
+
+        location = user.get('location')
+        if location and not user.get('long_distance'):
+            allowed &= (self._get(f"location={location}") | self._unknown('location')
+                        | self._get('long_distance=true'))
+
+        return allowed & self.all
+
+    def save(self, directory):
+        """Write the bitsets as attributes.json next to the pre-ranking index."""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'attributes.json'), 'w', encoding='utf-8') as f:
+            json.dump({"size": self.size, "bits": {key: format(bits, 'x') for key, bits in self.bits.items()}}, f)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, 'attributes.json'), encoding='utf-8') as f:
+            state = json.load(f)
+        index = cls()
+        index.size = state['size']
+        index.bits = {key: int(bits, 16) for key, bits in state['bits'].items()}
+        return index
@@ -0,0 +1,241 @@
+"""
+Latency/throughput benchmark for lambda_handler.
+
+Drives the handler with concurrent requests against the local fake backend (or
+real Bedrock with --backend bedrock) and reports p50/p95/p99 latency, throughput
+and the time spent in each model stage. Results are written as JSON so runs can
+be compared across commits:
+
+    python benchmark.py --requests 200 --concurrency 16 --time-scale 0.05 --output bench.json
+    python benchmark.py --requests 200 --concurrency 16 --time-scale 0.05 --compare bench.json
+    ASGI_MAX_CONCURRENCY=2000 BEDROCK_MAX_WORKERS=2000 python benchmark.py --asgi --requests 5000 --concurrency 2000
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import lambda_function
+from model_backend import MIN_CACHE_TOKENS, FakeBedrockBackend, InstrumentedBackend, create_bedrock_client
+
+SAMPLE_PROFILES = [
+    "I'm a 28-year-old software engineer living in San Francisco, CA. I love hiking, indie music, and exploring coffee shops. Non-smoker, drinks: socially. Wants children: yes.",
+    "25 years old, lives in New York, NY. Works as a teacher. I enjoy reading and cooking. Looking for someone kind and adventurous.",
+    "I love hiking and spending time outdoors on weekends. Honesty and good communication are most important to me. 31 years old, lives in Denver, CO.",
+    "Jazz lover and amateur pastry chef, 34, based in Chicago. I travel whenever I can and I'm happiest at a farmers market on a Saturday morning.",
+    "Museum nerd and history buff, 29, lives in Boston. I run every morning, read historical fiction, and want someone curious about the world.",
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values):
+    """Latency summary in milliseconds."""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2),
+    }
+
+
+def load_profiles(path):
+    """Profiles from a JSONL file of {"user_partner_profile": ...} lines, or the samples."""
+    if not path:
+        return SAMPLE_PROFILES
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line)['user_partner_profile'] for line in f if line.strip()]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_asgi_requests(args, request_body):
+    """POST args.requests bodies to asgi_app in-process, args.concurrency at a time.
+
+    The app's own limits (ASGI_MAX_CONCURRENCY, ASGI_MAX_PENDING) apply, so
+    concurrency above them measures queueing and load shedding.
+    """
+    import asyncio
+    from asgi_app import HandlerApp
+
+    app = HandlerApp(warmup=False, job_workers=0)
+
+    async def one_request(i, slots):
+        messages = [{'type': 'http.request', 'body': request_body(i).encode('utf-8'), 'more_body': False}]
+        statuses = []
+
+        async def receive():
+            return messages.pop() if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        async with slots:
+            started = time.perf_counter()
+            await app({'type': 'http', 'method': 'POST', 'path': '/', 'headers': []}, receive, send)
+            return time.perf_counter() - started, statuses[0]
+
+    async def run_all():
+        slots = asyncio.Semaphore(args.concurrency)
+        outcomes = await asyncio.gather(*(one_request(i, slots) for i in range(args.requests)))
+        await app.shutdown()
+        return outcomes
+
+    return asyncio.run(run_all())
+
+
+def run_benchmark(args):
+    if args.backend == 'fake':
+        backend = FakeBedrockBackend(
+            selection_latency_ms=args.selection_latency_ms,
+            simulation_latency_ms=args.simulation_latency_ms,
+            latency_sigma=args.latency_sigma,
+            throttle_rate=args.throttle_rate,
+            malformed_rate=args.malformed_rate,
+            time_scale=args.time_scale,
+            min_cache_tokens=args.min_cache_tokens,
+            seed=args.seed,
+        )
+    else:
+        backend = create_bedrock_client()
+    instrumented = InstrumentedBackend(backend)
+    lambda_function.set_model_client(instrumented)
+
+    profiles = load_profiles(args.profiles)
+    extra = json.loads(args.body) if args.body else {}
+
+    def request_body(i):
+        # Vary the text so the result cache does not turn the run into a cache benchmark
+        profile = f"{profiles[i % len(profiles)]} (request {i})" if args.unique else profiles[i % len(profiles)]
+        return json.dumps(dict(extra, user_partner_profile=profile))
+
+    def one_request(i):
+        event = {"httpMethod": "POST", "body": request_body(i)}
+        started = time.perf_counter()
+        result = lambda_function.lambda_handler(event, None)
+        return time.perf_counter() - started, result['statusCode']
+
+    # The handler's logging still runs (and is measured); it just isn't shown
+    with open(os.devnull, 'w') as devnull, \
+            (contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)):
+        started = time.perf_counter()
+        if args.asgi:
+            outcomes = run_asgi_requests(args, request_body)
+        else:
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                outcomes = list(executor.map(one_request, range(args.requests)))
+        wall_time = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in outcomes]
+    status_codes = {}
+    for _, status in outcomes:
+        status_codes[str(status)] = status_codes.get(str(status), 0) + 1
+
+    model_time = sum(sum(values) for values in instrumented.timings.values())
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        "config": {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'verbose')},
+        "requests": args.requests,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_rps": round(args.requests / wall_time, 2) if wall_time else None,
+        "status_codes": status_codes,
+        "latency": summarize(latencies),
+        "stages": {
+            kind: dict(summarize(values), errors=instrumented.errors.get(kind, 0))
+            for kind, values in sorted(instrumented.timings.items())
+        },
+        # Handler time not spent waiting on the model: parsing, ranking, caching, logging
+        "local_overhead_ms_per_request": round((sum(latencies) - model_time) / len(latencies) * 1000, 3) if latencies else None,
+        "cache": lambda_function.RESULT_CACHE.stats(),
+        "tokens": instrumented.usage,
+    }
+
+
+def print_report(report, baseline=None):
+    print(f"\n📊 {report['requests']} requests in {report['wall_time_s']}s "
+          f"({report['throughput_rps']} req/s), status codes {report['status_codes']}")
+    rows = [("end-to-end", report['latency'], baseline and baseline.get('latency'))]
+    rows += [
+        (kind, stats, baseline and baseline.get('stages', {}).get(kind))
+        for kind, stats in report['stages'].items()
+    ]
+    print(f"{'stage':<28}{'count':>7}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+    for name, stats, base in rows:
+        if not stats.get('count'):
+            continue
+        line = f"{name:<28}{stats['count']:>7}{stats['p50_ms']:>11}{stats['p95_ms']:>11}{stats['p99_ms']:>11}"
+        if base and base.get('count'):
+            line += f"   (p95 {stats['p95_ms'] - base['p95_ms']:+.2f} ms vs baseline)"
+        print(line)
+    print(f"local overhead per request: {report['local_overhead_ms_per_request']} ms")
+    tokens = report.get('tokens') or {}
+    if tokens:
+        print(f"input tokens: {tokens.get('inputTokens', 0)} uncached, {tokens.get('cacheReadInputTokens', 0)} cache read, "
+              f"{tokens.get('cacheWriteInputTokens', 0)} cache write; output tokens: {tokens.get('outputTokens', 0)}")
+    if baseline:
+        print(f"throughput vs baseline: {report['throughput_rps'] - baseline['throughput_rps']:+.2f} req/s "
+              f"(baseline commit {baseline.get('commit')})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=('fake', 'bedrock'), default='fake')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--asgi', action='store_true',
+                        help="Send the requests through asgi_app on one event loop instead of calling lambda_handler")
+    parser.add_argument('--profiles', help="JSONL file of {\"user_partner_profile\": ...} lines")
+    parser.add_argument('--body', help="Extra JSON fields merged into every request body, e.g. '{\"top_k\": 3}'")
+    parser.add_argument('--unique', action=argparse.BooleanOptionalAction, default=True,
+                        help="Make every profile unique so results are not served from the cache")
+    parser.add_argument('--selection-latency-ms', type=float, default=400)
+    parser.add_argument('--simulation-latency-ms', type=float, default=3000)
+    parser.add_argument('--latency-sigma', type=float, default=0.35)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--malformed-rate', type=float, default=0.0)
+    parser.add_argument('--time-scale', type=float, default=1.0, help="Scale all fake latencies, e.g. 0.05")
+    parser.add_argument('--min-cache-tokens', type=int, default=MIN_CACHE_TOKENS,
+                        help="Shortest prefix the fake will cache; 0 shows what caching would save")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help="Show the handler's own logging")
+    parser.add_argument('--output', help="Write the report as JSON to this path")
+    parser.add_argument('--compare', help="Baseline report to compare against")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    baseline = None
+    if args.compare and os.path.exists(args.compare):
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Saved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
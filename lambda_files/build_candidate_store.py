@@ -0,0 +1,77 @@
+"""
+Build a packed candidate store (and its pre-ranking index) from JSON or JSONL.
+
+Input is either a JSON array or one JSON object per line, each with at least
+"name" and "profile":
+
+    python build_candidate_store.py candidates.jsonl candidates.pkcs
+
+This writes candidates.pkcs and candidates.pkcs.index/ (the pre-ranking index and
+the attribute filter bitsets). Ship both with the
+function (or on a layer / EFS) and point CANDIDATE_STORE_PATH at the .pkcs file.
+Use --demo to export the built-in DEMO_CANDIDATE_PROFILES instead of a file.
+"""
+import argparse
+import json
+import time
+
+from attribute_filter import AttributeIndex
+from candidate_index import CandidateIndex, candidate_document
+from candidate_store import CandidateStore, index_path_for, write_candidate_store
+
+
+def read_candidates(path):
+    """Yield candidate dicts from a JSON array or a JSONL file."""
+    with open(path, encoding='utf-8') as f:
+        first_char = f.read(1)
+        while first_char and first_char.isspace():
+            first_char = f.read(1)
+        f.seek(0)
+        if first_char == '[':
+            yield from json.load(f)
+            return
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON ({e})") from e
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', nargs='?', help="JSON or JSONL file of candidates")
+    parser.add_argument('output', help="Path of the packed store to write")
+    parser.add_argument('--demo', action='store_true', help="Pack DEMO_CANDIDATE_PROFILES instead of an input file")
+    parser.add_argument('--no-index', action='store_true', help="Skip building the pre-ranking index")
+    args = parser.parse_args()
+
+    if args.demo:
+        from lambda_function import DEMO_CANDIDATE_PROFILES
+        candidates = DEMO_CANDIDATE_PROFILES
+    elif args.input:
+        candidates = read_candidates(args.input)
+    else:
+        parser.error("an input file is required unless --demo is given")
+
+    started = time.perf_counter()
+    count = write_candidate_store(candidates, args.output)
+    print(f"📦 Packed {count} candidates into {args.output} in {time.perf_counter() - started:.2f}s")
+
+    if not args.no_index:
+        started = time.perf_counter()
+        store = CandidateStore(args.output)
+        try:
+            index = CandidateIndex(candidate_document(candidate) for candidate in store)
+            attribute_index = AttributeIndex(store)
+        finally:
+            store.close()
+        index.save(index_path_for(args.output))
+        attribute_index.save(index_path_for(args.output))
+        print(f"🔍 Built pre-ranking and attribute indexes in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Offline bulk matching: score a JSONL file of user profiles against the candidate pool.
+
+Each input line is {"user_partner_profile": ..., "id": ...} ("id" is optional and
+echoed back). Profiles go through the same selection and simulation code as the
+handler (lambda_function.match_profile_item) on a bounded worker pool. Each result
+is appended to the output as soon as it finishes, one JSON line per input line:
+
+    {"line": 12, "id": "u-42", "success": true, "result": {...}, "elapsed_ms": 3412.5, "usage": {...}}
+
+    MODEL_BACKEND=fake python bulk_match.py users.jsonl results.jsonl --workers 8
+
+Progress is checkpointed to <output>.checkpoint. After a crash, running the same
+command resumes where it stopped. Completed items are not paid for again, and the
+output is truncated to its last checkpointed size, so it never holds an item twice.
+The input is read lazily, and at most --workers x 2 items are in flight, so memory
+stays flat however long the input is. A throughput and cost summary is printed at
+the end.
+"""
+import argparse
+import contextlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import lambda_function
+import metrics
+from metrics import USAGE_FIELDS
+from resilience import deadline_scope
+
+# On-demand USD prices per million tokens (Claude Haiku 4.5); override with flags
+DEFAULT_PRICES = {
+    'input_tokens': 1.00,
+    'output_tokens': 5.00,
+    'cache_read_input_tokens': 0.10,
+    'cache_write_input_tokens': 1.25,
+}
+
+
+def read_items(path):
+    """Yield (line_number, record) for every input line; record is None for blank lines.
+
+    A line that is not a JSON object yields its parse error as the record's "error".
+    """
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                yield line_number, None
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                record = {"error": f"Invalid JSON: {e}"}
+            if not isinstance(record, dict):
+                record = {"error": "Expected a JSON object"}
+            yield line_number, record
+
+
+class Checkpoint:
+    """Which input lines are finished, and how much of the output file they account for.
+
+    Lines below `watermark` are all finished; `done` holds finished lines above it
+    (at most the items that finished while an earlier one was still running).
+    """
+
+    def __init__(self, path, input_path):
+        self.path = path
+        self.input_path = os.path.abspath(input_path)
+        self.watermark = 1
+        self.done = set()
+        self.output_offset = 0
+        self.totals = new_totals()
+
+    @classmethod
+    def load(cls, path, input_path):
+        checkpoint = cls(path, input_path)
+        if not os.path.exists(path):
+            return checkpoint
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('input_path') != checkpoint.input_path:
+            raise ValueError(f"{path} belongs to {state.get('input_path')}; delete it to start over")
+        checkpoint.watermark = state['watermark']
+        checkpoint.done = set(state['done'])
+        checkpoint.output_offset = state['output_offset']
+        checkpoint.totals.update(state['totals'])
+        return checkpoint
+
+    def finished(self, line_number):
+        return line_number < self.watermark or line_number in self.done
+
+    def mark(self, line_number):
+        self.done.add(line_number)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+
+    def save(self, output_offset):
+        self.output_offset = output_offset
+        state = {
+            "input_path": self.input_path,
+            "watermark": self.watermark,
+            "done": sorted(self.done),
+            "output_offset": output_offset,
+            "totals": self.totals,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def new_totals():
+    totals = {"items": 0, "succeeded": 0, "failed": 0, "model_calls": 0, "elapsed_ms": 0.0}
+    totals.update({name: 0 for name in USAGE_FIELDS.values()})
+    return totals
+
+
+def match_item(line_number, record, args, item_timeout):
+    """Match one input record, collecting its token usage in a private metrics record."""
+    item_metrics, token = metrics.start_request('bulk')
+    started = time.perf_counter()
+    selection_mode = record.get('selection_mode') or args.selection_mode
+    try:
+        if 'error' in record:
+            outcome = {"success": False, "error": record['error']}
+        elif selection_mode not in lambda_function.SELECTION_MODES:
+            outcome = {"success": False,
+                       "error": f"Invalid selection_mode. Expected one of: {', '.join(lambda_function.SELECTION_MODES)}."}
+        else:
+            deadline = time.monotonic() + item_timeout
+            with deadline_scope(deadline):
+                outcome = lambda_function.match_profile_item(
+                    user_partner_profile=record.get('user_partner_profile', ''),
+                    model_id=lambda_function.MODEL_ID,
+                    selection_mode=selection_mode,
+                    use_cache=not args.no_cache,
+                    top_k=args.top_k,
+                    deadline=deadline
+                )
+    finally:
+        metrics.finish_request(item_metrics, token, 200, emit=False)
+    item = {"line": line_number}
+    if 'id' in record:
+        item['id'] = record['id']
+    item.update(outcome)
+    item['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    item['usage'] = dict(item_metrics.usage, model_calls=item_metrics.counters.get('model_calls', 0))
+    return item
+
+
+def add_to_totals(totals, item):
+    totals['items'] += 1
+    totals['succeeded' if item['success'] else 'failed'] += 1
+    totals['elapsed_ms'] += item['elapsed_ms']
+    for name, count in item['usage'].items():
+        totals[name] += count
+
+
+def cost_of(totals, prices):
+    return sum(totals[name] * price / 1_000_000 for name, price in prices.items())
+
+
+def run(args):
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+    checkpoint = Checkpoint.load(checkpoint_path, args.input)
+    previous_totals = dict(checkpoint.totals)
+    run_totals = new_totals()
+
+    # Rows written after the last checkpoint are redone, so drop them
+    if os.path.exists(args.output):
+        os.truncate(args.output, checkpoint.output_offset)
+    elif checkpoint.output_offset:
+        raise ValueError(f"{args.output} is missing but {checkpoint_path} expects it; delete the checkpoint to start over")
+
+    max_in_flight = args.workers * 2
+    pending = {}
+    skipped = 0
+    since_checkpoint = 0
+    started = time.perf_counter()
+
+    with open(args.output, 'a', encoding='utf-8') as output, \
+            ThreadPoolExecutor(max_workers=args.workers) as executor:
+
+        def collect(futures):
+            nonlocal since_checkpoint
+            for future in futures:
+                line_number = pending.pop(future)
+                item = future.result()
+                output.write(json.dumps(item, ensure_ascii=False) + '\n')
+                add_to_totals(run_totals, item)
+                add_to_totals(checkpoint.totals, item)
+                checkpoint.mark(line_number)
+                since_checkpoint += 1
+            if since_checkpoint >= args.checkpoint_every:
+                save_checkpoint()
+
+        def save_checkpoint():
+            nonlocal since_checkpoint
+            # The output must be on disk before the checkpoint that counts it
+            output.flush()
+            os.fsync(output.fileno())
+            checkpoint.save(output.tell())
+            since_checkpoint = 0
+
+        for line_number, record in read_items(args.input):
+            if args.limit and run_totals['items'] + len(pending) >= args.limit:
+                break
+            if checkpoint.finished(line_number):
+                skipped += record is not None
+                continue
+            if record is None:
+                checkpoint.mark(line_number)
+                continue
+            while len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(match_item, line_number, record, args, args.item_timeout)] = line_number
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+        save_checkpoint()
+
+    return run_totals, previous_totals, checkpoint.totals, skipped, time.perf_counter() - started
+
+
+def print_summary(run_totals, previous_totals, overall_totals, skipped, wall_time, prices):
+    items = run_totals['items']
+    print(f"\n📊 {items} profiles in {wall_time:.1f}s ({items / wall_time if wall_time else 0:.2f}/s), "
+          f"{run_totals['succeeded']} succeeded, {run_totals['failed']} failed"
+          + (f", {skipped} already done" if skipped else ""))
+    if items:
+        print(f"mean latency per profile: {run_totals['elapsed_ms'] / items:.0f} ms; "
+              f"model calls: {run_totals['model_calls']} ({run_totals['model_calls'] / items:.2f} per profile)")
+    print(f"input tokens: {run_totals['input_tokens']} uncached, {run_totals['cache_read_input_tokens']} cache read, "
+          f"{run_totals['cache_write_input_tokens']} cache write; output tokens: {run_totals['output_tokens']}")
+    cost = cost_of(run_totals, prices)
+    print(f"estimated cost: ${cost:.4f}" + (f" (${cost / items:.5f} per profile)" if items else ""))
+    if previous_totals['items']:
+        print(f"including earlier runs: {overall_totals['items']} profiles, ${cost_of(overall_totals, prices):.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="JSONL file of {\"user_partner_profile\": ..., \"id\": ...} lines")
+    parser.add_argument('output', help="JSONL file results are appended to")
+    parser.add_argument('--workers', type=int, default=lambda_function.BEDROCK_MAX_CONCURRENCY,
+                        help="profiles matched concurrently (default BEDROCK_MAX_CONCURRENCY)")
+    parser.add_argument('--selection-mode', choices=lambda_function.SELECTION_MODES,
+                        default=lambda_function.DEFAULT_SELECTION_MODE)
+    parser.add_argument('--top-k', type=int, default=1)
+    parser.add_argument('--no-cache', action='store_true', help="Bypass the result cache")
+    parser.add_argument('--item-timeout', type=float, default=120.0, help="seconds allowed per profile")
+    parser.add_argument('--limit', type=int, default=0, help="stop after this many profiles (0 for all)")
+    parser.add_argument('--checkpoint', help="checkpoint file (default <output>.checkpoint)")
+    parser.add_argument('--checkpoint-every', type=int, default=50, help="profiles between checkpoints")
+    for name, price in DEFAULT_PRICES.items():
+        parser.add_argument(f"--price-{name.replace('_', '-')}", type=float, default=price,
+                            help=f"USD per million {name.replace('_', ' ')} (default {price})")
+    parser.add_argument('--verbose', action='store_true', help="Show the handler's own logging")
+    args = parser.parse_args()
+    if not 1 <= args.top_k <= lambda_function.TOP_K_MAX:
+        parser.error(f"--top-k must be from 1 to {lambda_function.TOP_K_MAX}")
+
+    prices = {name: getattr(args, f"price_{name}") for name in DEFAULT_PRICES}
+    with open(os.devnull, 'w') as devnull, \
+            (contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)):
+        results = run(args)
+    print_summary(*results, prices)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Local candidate pre-ranking index.
+
+Every candidate profile is turned into a hashed word/bigram TF-IDF vector once
+per container (or ahead of time by build_candidate_store.py). Scoring a user profile against
+the whole pool is then a single sparse matrix-vector product, so the LLM only has
+to choose among a short list - or is skipped entirely in "fast" selection mode.
+"""
+import math
+import os
+import re
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # numpy is not part of the base Lambda runtime
+    np = None
+
+# Number of hashed feature buckets. Collisions are rare at this size for
+# dating-profile length text and the vectors stay small.
+N_FEATURES = 2 ** 18
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+STOP_WORDS = frozenset("""
+a about after all also am an and any are as at be because been but by can could
+do does doesn't don't during each for from had has have having he her here him his
+how i i'd i'll i'm i've if in into is it it's its just me more most my myself no
+nor not of off on once only or other our out over own same she should so some such
+than that that's the their them then there these they this those through to too
+under until up very was we were what when where which while who whom why will with
+would you you're your yourself someone something
+""".split())
+
+
+def tokenize(text):
+    """Lowercase the text and split it into content words."""
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def candidate_document(candidate):
+    """Text that represents a candidate in the index."""
+    return f"{candidate['name']}\n{candidate['profile']}"
+
+
+def hashed_features(text, n_features=N_FEATURES):
+    """Return {bucket: count} for the unigrams and bigrams of the text."""
+    tokens = tokenize(text)
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    counts = {}
+    for gram in grams:
+        bucket = zlib.crc32(gram.encode('utf-8')) % n_features
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
+
+
+class CandidateIndex:
+    """TF-IDF index over candidate profile texts, stored as a CSR matrix."""
+
+    def __init__(self, texts, n_features=N_FEATURES):
+        self.n_features = n_features
+        rows = [hashed_features(text, n_features) for text in texts]
+        self.size = len(rows)
+
+        # Smoothed inverse document frequency, as in scikit-learn. Buckets no
+        # candidate uses keep an idf of 0 so they carry no signal in queries.
+        doc_freq = {}
+        for row in rows:
+            for bucket in row:
+                doc_freq[bucket] = doc_freq.get(bucket, 0) + 1
+        idf = [0.0] * n_features
+        for bucket, df in doc_freq.items():
+            idf[bucket] = math.log((1 + self.size) / (1 + df)) + 1.0
+
+        indptr = [0]
+        indices = []
+        data = []
+        for row in rows:
+            weights = {
+                bucket: (1.0 + math.log(count)) * idf[bucket]
+                for bucket, count in row.items()
+            }
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for bucket in sorted(weights):
+                indices.append(bucket)
+                data.append(weights[bucket] / norm)
+            indptr.append(len(indices))
+
+        if np is not None:
+            self._set_arrays(
+                np.asarray(indptr, dtype=np.int64),
+                np.asarray(indices, dtype=np.int32),
+                np.asarray(data, dtype=np.float32),
+                np.asarray(idf, dtype=np.float32),
+            )
+        else:
+            self.indptr = indptr
+            self.indices = indices
+            self.data = data
+            self.idf = idf
+
+    def _set_arrays(self, indptr, indices, data, idf):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.idf = idf
+        self.size = len(indptr) - 1
+        self.n_features = len(idf)
+
+    def save(self, directory):
+        """Write the index arrays as .npy files so load() can memory-map them."""
+        if np is None:
+            raise RuntimeError("Saving a candidate index requires numpy")
+        os.makedirs(directory, exist_ok=True)
+        for name in ('indptr', 'indices', 'data', 'idf'):
+            np.save(os.path.join(directory, f"{name}.npy"), np.asarray(getattr(self, name)))
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map an index written by save(); pages are read on demand."""
+        if np is None:
+            raise RuntimeError("Loading a saved candidate index requires numpy")
+        index = cls.__new__(cls)
+        index._set_arrays(*(
+            np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+            for name in ('indptr', 'indices', 'data', 'idf')
+        ))
+        return index
+
+    def __len__(self):
+        return self.size
+
+    def _query_weights(self, text):
+        """Unit-length TF-IDF weights of the query; unseen buckets carry no signal."""
+        weights = {
+            bucket: (1.0 + math.log(count)) * float(self.idf[bucket])
+            for bucket, count in hashed_features(text, self.n_features).items()
+            if self.idf[bucket] > 0
+        }
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {bucket: w / norm for bucket, w in weights.items()}
+
+    def scores(self, text):
+        """Cosine similarity between the text and every candidate, in index order."""
+        weights = self._query_weights(text)
+
+        if np is None:
+            result = []
+            for row in range(self.size):
+                start, end = self.indptr[row], self.indptr[row + 1]
+                result.append(sum(
+                    self.data[i] * weights.get(self.indices[i], 0.0)
+                    for i in range(start, end)
+                ))
+            return result
+
+        if not weights:
+            return np.zeros(self.size, dtype=np.float32)
+        # Rather than a dense n_features query vector, put the query's few buckets in
+        # a small table addressed by their low bits, sized so that no two collide
+        buckets = np.fromiter(weights, dtype=self.indices.dtype, count=len(weights))
+        mask = (1 << (4 * len(buckets)).bit_length()) - 1
+        while len(np.unique(buckets & mask)) < len(buckets):
+            mask = mask << 1 | 1
+        keys = np.full(mask + 1, -1, dtype=self.indices.dtype)
+        values = np.zeros(mask + 1, dtype=np.float32)
+        keys[buckets & mask] = buckets
+        values[buckets & mask] = list(weights.values())
+
+        slots = self.indices & mask
+        hits = np.flatnonzero(keys[slots] == self.indices)
+        rows = np.searchsorted(self.indptr, hits, side='right') - 1
+        products = self.data[hits] * values[slots[hits]]
+        return np.bincount(rows, weights=products, minlength=self.size).astype(np.float32)
+
+    def top_k(self, text, k, allowed=None):
+        """Return [(position, score), ...] for the k best candidates, best first.
+
+        allowed is an optional bitset (bit i = position i) of the candidates that
+        may be returned, e.g. from attribute_filter.AttributeIndex.compatible.
+        """
+        k = max(0, min(k, self.size))
+        if k == 0:
+            return []
+        scores = self.scores(text)
+
+        if np is None:
+            positions = range(self.size)
+            if allowed is not None:
+                positions = [i for i in positions if allowed >> i & 1]
+            ranked = sorted(positions, key=lambda i: (-scores[i], i))[:k]
+            return [(i, float(scores[i])) for i in ranked]
+
+        if allowed is not None:
+            mask = np.unpackbits(
+                np.frombuffer(allowed.to_bytes((self.size + 7) // 8, 'little'), dtype=np.uint8),
+                count=self.size, bitorder='little'
+            ).astype(bool)
+            eligible = np.flatnonzero(mask)
+            k = min(k, len(eligible))
+            if k == 0:
+                return []
+            eligible_scores = scores[eligible]
+            if k < len(eligible):
+                candidates = eligible[np.argpartition(-eligible_scores, k - 1)[:k]]
+            else:
+                candidates = eligible
+        elif k < self.size:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(self.size)
+        ranked = sorted(candidates.tolist(), key=lambda i: (-scores[i], i))
+        return [(i, float(scores[i])) for i in ranked]
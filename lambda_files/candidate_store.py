@@ -0,0 +1,83 @@
+"""
+Packed on-disk candidate store.
+
+File layout (little-endian):
+
+    header   MAGIC | version (u32) | count (u32) | table offset (u64)
+    records  one compact JSON object per candidate, back to back
+    table    count x (record offset (u64), record length (u32))
+
+The file is memory-mapped, so opening a store with 100k+ candidates costs a
+header read; a candidate's record is only paged in when it is fetched by ID
+(its position in the store), which is a single table lookup.
+"""
+import json
+import mmap
+import os
+import struct
+
+MAGIC = b'PKCS'
+VERSION = 1
+HEADER = struct.Struct('<4sIIQ')
+TABLE_ENTRY = struct.Struct('<QI')
+
+
+def index_path_for(store_path):
+    """Directory holding the prebuilt pre-ranking index for a store file."""
+    return f"{store_path}.index"
+
+
+class CandidateStore:
+    """Read-only, memory-mapped view of a packed candidate file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._count, self._table_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {VERSION} candidate store")
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, candidate_id):
+        if not 0 <= candidate_id < self._count:
+            raise IndexError(f"candidate id {candidate_id} out of range")
+        offset, length = TABLE_ENTRY.unpack_from(
+            self._mmap, self._table_offset + candidate_id * TABLE_ENTRY.size
+        )
+        return json.loads(self._mmap[offset:offset + length])
+
+    def __iter__(self):
+        for candidate_id in range(self._count):
+            yield self[candidate_id]
+
+    def close(self):
+        self._mmap.close()
+
+
+def write_candidate_store(candidates, path):
+    """Pack an iterable of {"name", "profile", ...} dicts; returns the count.
+
+    Records are streamed to disk, so only the offset table is held in memory.
+    """
+    table = []
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+        for candidate in candidates:
+            if not candidate.get('name') or not candidate.get('profile'):
+                raise ValueError(f"Candidate #{len(table) + 1} needs a name and a profile")
+            record = json.dumps(candidate, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            table.append((f.tell(), len(record)))
+            f.write(record)
+
+        table_offset = f.tell()
+        for entry in table:
+            f.write(TABLE_ENTRY.pack(*entry))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(table), table_offset))
+    os.replace(tmp_path, path)
+    return len(table)
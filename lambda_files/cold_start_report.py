@@ -0,0 +1,68 @@
+"""
+Cold-start report for the Lambda handlers.
+
+Each scenario runs in a fresh Python process, like a new Lambda container, and
+reports the import/initialization phases it paid for and whether boto3 or numpy
+ended up loaded. OPTIONS preflights, health checks and validation errors should
+never load either.
+
+    python cold_start_report.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PROFILE = "I'm a 28-year-old software engineer living in San Francisco. I love hiking, indie music, and coffee shops."
+
+SCENARIOS = [
+    ("lambda_function", "OPTIONS preflight", {"httpMethod": "OPTIONS"}),
+    ("lambda_function", "health check", {"httpMethod": "GET", "path": "/health"}),
+    ("lambda_function", "validation error", {"httpMethod": "POST", "body": json.dumps({"user_partner_profile": ""})}),
+    ("lambda_function", "warm-up ping", {"source": "aws.events", "detail-type": "Scheduled Event"}),
+    ("lambda_function", "full match (fake backend)", {"httpMethod": "POST", "body": json.dumps({"user_partner_profile": PROFILE})}),
+    ("lambda_function_with_cors", "OPTIONS preflight", {"httpMethod": "OPTIONS"}),
+]
+
+# Runs inside the fresh process; prints one JSON line on the real stdout
+PROBE = """
+import contextlib, io, json, sys, time
+started = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    module = __import__(sys.argv[1])
+    imported = time.perf_counter()
+    result = module.lambda_handler(json.loads(sys.argv[2]), None)
+finished = time.perf_counter()
+print(json.dumps({
+    "status": result["statusCode"],
+    "import_ms": round((imported - started) * 1000, 3),
+    "first_invocation_ms": round((finished - imported) * 1000, 3),
+    "phases_ms": getattr(module, "STARTUP_TIMINGS", {}),
+    "boto3_loaded": "boto3" in sys.modules,
+    "numpy_loaded": "numpy" in sys.modules,
+}))
+"""
+
+
+def run_scenario(module_name, event):
+    env = dict(os.environ, MODEL_BACKEND=os.environ.get('MODEL_BACKEND', 'fake'), FAKE_BEDROCK_TIME_SCALE='0')
+    output = subprocess.check_output(
+        [sys.executable, '-c', PROBE, module_name, json.dumps(event)], cwd=HERE, env=env, text=True
+    )
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    print(f"{'handler':<28}{'scenario':<28}{'status':>7}{'import ms':>11}{'1st call ms':>13}  boto3  numpy")
+    for module_name, label, event in SCENARIOS:
+        report = run_scenario(module_name, event)
+        print(f"{module_name:<28}{label:<28}{report['status']:>7}{report['import_ms']:>11}{report['first_invocation_ms']:>13}"
+              f"  {'yes' if report['boto3_loaded'] else 'no':<5}  {'yes' if report['numpy_loaded'] else 'no'}")
+        if report['phases_ms']:
+            print(f"    phases (ms): {json.dumps(report['phases_ms'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Asynchronous match jobs: a SQLite-backed queue and result store plus a worker pool.
+
+Long requests (top-K simulations, retries against a throttled model) can outlive
+the API Gateway timeout, so clients may submit a job instead and poll for it:
+
+    job_id, deduplicated = store.submit(request, dedupe_key)
+    worker = JobWorker(store, run_job, workers=4).start()
+    store.get(job_id)   # {"status": "queued" | "running" | "succeeded" | "failed", ...}
+
+A submission identical to a job that is still queued or running (same dedupe key)
+returns that job's ID instead of queueing the work twice. Workers claim jobs
+atomically, so any number of worker threads or processes can share one database
+file. A job whose worker died is requeued after its lease expires, up to
+max_attempts times; each claim is numbered, and only the latest claim of a job
+may store its result, so a worker that outlived its lease cannot overwrite the
+result of the worker that took the job over.
+
+    python job_queue.py --workers 4      # run workers against JOB_STORE_PATH
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+PENDING_STATUSES = ('queued', 'running')
+
+
+class SQLiteJobStore:
+    """Job queue and result store in one SQLite file (local disk, /tmp or EFS)."""
+
+    def __init__(self, path, lease_seconds=600, result_ttl_seconds=3600, max_attempts=3):
+        import sqlite3
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, dedupe_key TEXT NOT NULL, request TEXT NOT NULL,"
+            " status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " status_code INTEGER, result TEXT,"
+            " created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedupe_key ON jobs (dedupe_key, status)")
+
+    def _transaction(self, work):
+        # BEGIN IMMEDIATE takes the write lock up front, so two processes can never
+        # claim (or submit) the same job
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work()
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def submit(self, request, dedupe_key):
+        """Queue a request; returns (job_id, deduplicated)."""
+        def work():
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN ('queued', 'running')"
+                " ORDER BY created_at LIMIT 1",
+                (dedupe_key,)
+            ).fetchone()
+            if row is not None:
+                return row[0], True
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO jobs (id, dedupe_key, request, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, dedupe_key, json.dumps(request, ensure_ascii=False), time.time())
+            )
+            return job_id, False
+        return self._transaction(work)
+
+    def claim(self):
+        """Mark the oldest queued job as running and return (job_id, request, attempt), or None."""
+        def work():
+            row = self._conn.execute(
+                "SELECT id, request, attempts FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ? WHERE id = ?",
+                (time.time(), row[0])
+            )
+            return row[0], json.loads(row[1]), row[2] + 1
+        return self._transaction(work)
+
+    def finish(self, job_id, attempt, status_code, result):
+        """Store the response of a claim; 2xx responses count as succeeded, anything else as failed.
+
+        Returns False, storing nothing, if the job was claimed again after this
+        attempt's lease expired (or has already finished).
+        """
+        status = 'succeeded' if 200 <= status_code < 300 else 'failed'
+        # A requeued job nobody has claimed again still belongs to this attempt
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET status = ?, status_code = ?, result = ?, finished_at = ?"
+                " WHERE id = ? AND attempts = ? AND status IN ('queued', 'running')",
+                (status, status_code, json.dumps(result, ensure_ascii=False), time.time(), job_id, attempt)
+            ).rowcount == 1
+
+    def get(self, job_id):
+        """{"job_id", "status", ...} for a job, or None if it is unknown or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, status_code, result, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, status_code, result, created_at, started_at, finished_at = row
+        job = {"job_id": job_id, "status": status, "created_at": created_at}
+        if started_at is not None:
+            job["started_at"] = started_at
+        if status not in PENDING_STATUSES:
+            job.update(status_code=status_code, result=json.loads(result), finished_at=finished_at)
+        return job
+
+    def requeue_stale(self):
+        """Requeue running jobs whose lease expired; give up after max_attempts. Returns the count."""
+        def work():
+            cutoff = time.time() - self.lease_seconds
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', status_code = 500, finished_at = ?,"
+                " result = '{\"success\": false, \"error\": \"Job failed repeatedly. Please try again.\"}'"
+                " WHERE status = 'running' AND started_at < ? AND attempts >= ?",
+                (time.time(), cutoff, self.max_attempts)
+            )
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND started_at < ?", (cutoff,)
+            ).rowcount
+        return self._transaction(work)
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND finished_at < ?",
+                (time.time() - self.result_ttl_seconds,)
+            )
+
+
+class JobWorker:
+    """Threads that drain a job store, running each request through run_job.
+
+    run_job(request) returns (status_code, result); exceptions are stored as 500s.
+    """
+
+    def __init__(self, store, run_job, workers=4, poll_interval=0.2, maintenance_interval=60):
+        self.store = store
+        self.run_job = run_job
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.maintenance_interval = maintenance_interval
+        self._stop = threading.Event()
+        self._threads = []
+        self._last_maintenance = 0.0
+        self._maintenance_lock = threading.Lock()
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        """Stop claiming jobs and wait for the running ones to finish."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _maintain(self):
+        with self._maintenance_lock:
+            if time.monotonic() - self._last_maintenance < self.maintenance_interval:
+                return
+            self._last_maintenance = time.monotonic()
+        try:
+            requeued = self.store.requeue_stale()
+            if requeued:
+                print(f"♻️ Requeued {requeued} job(s) whose worker stopped responding")
+            self.store.purge_expired()
+        except Exception as e:
+            print(f"⚠️ Job store maintenance failed: {str(e)}")
+
+    def run_one(self):
+        """Claim and run one job; returns False if the queue was empty."""
+        self._maintain()
+        claimed = self.store.claim()
+        if claimed is None:
+            return False
+        job_id, request, attempt = claimed
+        try:
+            status_code, result = self.run_job(request)
+        except Exception as e:
+            print(f"⚠️ Job {job_id} failed: {str(e)}")
+            status_code, result = 500, {"success": False, "error": f"Internal server error: {str(e)[:500]}"}
+        if not self.store.finish(job_id, attempt, status_code, result):
+            print(f"⚠️ Dropped the result of job {job_id} attempt {attempt}: its lease expired and it was claimed again")
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if not self.run_one():
+                    self._stop.wait(self.poll_interval)
+            except Exception as e:
+                # Keep the worker alive through store hiccups (e.g. a locked database)
+                print(f"⚠️ Job worker error: {str(e)}")
+                self._stop.wait(self.poll_interval)
+
+
+def main():
+    import argparse
+    import lambda_function
+
+    parser = argparse.ArgumentParser(description="Run match job workers against the job store")
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('JOB_WORKERS', '4')))
+    args = parser.parse_args()
+
+    worker = lambda_function.start_job_workers(args.workers)
+    print(f"👷 Running {args.workers} job worker(s) against {lambda_function.JOB_STORE_PATH}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    main()
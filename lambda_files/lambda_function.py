@@ -1,10 +1,344 @@
+import time
+
+# Cold-start accounting starts before anything else is imported
+_MODULE_LOAD_STARTED = time.perf_counter()
+
 import json
-import boto3
 import os
 import re
+import copy
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import lru_cache
+
+# numpy (via candidate_index) and boto3 (via model_backend) are imported lazily,
+# so validation errors and other early exits never pay for them.
+import metrics
+from candidate_store import CandidateStore, index_path_for
+from metrics import log_debug
+from resilience import ModelUnavailableError, ResilientClient, deadline_scope
+from result_cache import LRUCache, SQLiteCache, TwoLevelCache, cache_key
+from simulation_schema import (SIMULATION_SCHEMA, merge_fields, missing_fields, normalize_simulation,
+                               schema_for_fields, tool_config, with_fields)
+from streaming_json import IncrementalJSONParser, repair_json
+from token_budget import compact_profile
+
+# ==========================================
+# COLD-START PROFILING
+# ==========================================
+# Milliseconds spent in each initialization phase of this container
+STARTUP_TIMINGS = {'imports': round((time.perf_counter() - _MODULE_LOAD_STARTED) * 1000, 3)}
+_cold_start_reported = False
+
+@contextmanager
+def startup_phase(name):
+    """Record how long a one-off initialization step takes."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMINGS[name] = round((time.perf_counter() - started) * 1000, 3)
+
+def report_cold_start():
+    """Log the startup timings once per container, on the first invocation."""
+    global _cold_start_reported
+    if not _cold_start_reported:
+        _cold_start_reported = True
+        print(f"🧊 Cold start phases (ms): {json.dumps(STARTUP_TIMINGS)}")
+
+# ==========================================
+# MODEL CLIENT
+# ==========================================
+# Created on first use and reused across warm invocations: the Bedrock Runtime
+# client by default, or the local fake with MODEL_BACKEND=fake (see model_backend.py),
+# wrapped in the retry / hedging / circuit breaker layer from resilience.py
+_model_client = None
+_model_client_lock = threading.Lock()
+
+def get_model_client():
+    """Return the client used for every model call, creating it on first use."""
+    global _model_client
+    if _model_client is None:
+        with _model_client_lock:
+            if _model_client is None:
+                with startup_phase('model_client'):
+                    from model_backend import create_backend
+                    _model_client = ResilientClient.from_env(create_backend(os.environ.get('MODEL_BACKEND', 'bedrock')))
+    return _model_client
+
+def set_model_client(client):
+    """Swap in a different backend, e.g. a FakeBedrockBackend in tests and benchmarks.
+    
+    It is always wrapped in a ResilientClient: model calls pass it a kind= keyword.
+    """
+    global _model_client
+    _model_client = ResilientClient.from_env(client)
+
+# Use the cross-region Inference Profile ID for Claude 4.5 Haiku
+MODEL_ID = "us.anthropic.claude-haiku-4-5-20251001-v1:0"
+
+# Simulation fields reported as soon as they are complete when streaming
+STREAMED_FIELDS = {
+    ('score',): 'score',
+    ('meta', 'compatibility_factors'): 'compatibility_factors',
+    ('meta', 'potential_concerns'): 'potential_concerns',
+}
+
+# ==========================================
+# PROMPTS
+# ==========================================
+# Built once at import; requests only substitute the per-user parts.
+# Every prompt is ordered from most to least stable: instructions (system prompt),
+# then candidate profiles, then the user's profile last, so Bedrock prompt caching
+# can reuse the prefill of everything before the user's profile.
+SELECTION_SYSTEM_PROMPT = """You are a matchmaking expert. Your task is to analyze a user's profile and select the MOST COMPATIBLE candidate from the numbered list of available candidates.
+
+Based on the user's profile, interests, lifestyle, and preferences, select the candidate that would be the BEST MATCH for this user. Consider:
+- Shared interests and hobbies
+- Lifestyle compatibility
+- Personality alignment
+- Values and priorities
+- Complementary traits
+
+Respond with only a number: the candidate number and nothing else."""
+
+SELECTION_CANDIDATES_TEMPLATE = """AVAILABLE CANDIDATES:
+{candidates_list}"""
+
+SELECTION_USER_PROMPT_TEMPLATE = """USER'S PROFILE:
+{user_profile}
+
+Respond with ONLY the candidate number (1-{count}) and nothing else."""
+
+SIMULATION_SYSTEM_PROMPT = """You are an AI Date Simulator running a matchmaking simulation. 
+Your task is to take a user's ideal partner profile and a candidate AI model's profile, and simulate a first date between them. 
+Analyze their compatibility, simulate their conversation and chemistry, and output the result.
+
+IMPORTANT: Both profiles will be provided below. Use ALL the information from both profiles to create a realistic date simulation.
+
+You must respond strictly in JSON format with the following structure:
+{
+  "score": <integer from 1 to 100>,
+  "summary": "<2-3 paragraph summary of the date>",
+  "meta": {
+    "compatibility_factors": {
+      "shared_interests": "<comma-separated list of shared interests>",
+      "humor_alignment": "<description of how well their humor styles match>",
+      "lifestyle_match": "<description of lifestyle compatibility>",
+      "conversation_ease": "<description of how easily they conversed>"
+    },
+    "potential_concerns": "<any concerns or friction points, or empty string if none>"
+  }
+}
+
+The compatibility_factors should be brief, descriptive strings. The summary should be detailed and engaging. Base your analysis on the actual profile information provided."""
+
+SIMULATION_CANDIDATE_TEMPLATE = """Here are the profiles for the date simulation:
+
+Candidate Profile:
+{candidate_profile}"""
+
+SIMULATION_USER_PROMPT_TEMPLATE = """User's Profile:
+{user_profile}
+
+Simulate the date and return the JSON response."""
+
+# Fused mode: one call picks a candidate from the list AND simulates the date
+FUSED_SYSTEM_PROMPT = """You are a matchmaking expert and AI Date Simulator. You are given a numbered list of available candidates and a user's ideal partner profile. First select the MOST COMPATIBLE candidate for the user, considering shared interests and hobbies, lifestyle compatibility, personality alignment, values and priorities, and complementary traits. Then simulate a first date between the user and the candidate you selected, analyzing their compatibility, conversation and chemistry.
+
+Use ALL the information from the user's profile and the selected candidate's profile to create a realistic date simulation.
+
+You must respond strictly in JSON format with the following structure:
+{
+  "candidate_id": <the number of the selected candidate from the list>,
+  "candidate_name": "<the name of the selected candidate>",
+  "score": <integer from 1 to 100>,
+  "summary": "<2-3 paragraph summary of the date>",
+  "meta": {
+    "compatibility_factors": {
+      "shared_interests": "<comma-separated list of shared interests>",
+      "humor_alignment": "<description of how well their humor styles match>",
+      "lifestyle_match": "<description of lifestyle compatibility>",
+      "conversation_ease": "<description of how easily they conversed>"
+    },
+    "potential_concerns": "<any concerns or friction points, or empty string if none>"
+  }
+}
+
+The compatibility_factors should be brief, descriptive strings. The summary should be detailed and engaging. Base your analysis on the actual profile information provided."""
+
+FUSED_USER_PROMPT_TEMPLATE = """USER'S PROFILE:
+{user_profile}
+
+Select the best candidate (1-{count}), simulate the date and return the JSON response."""
+
+# Sent (with the same profiles) when an answer came back without some required fields
+MISSING_FIELDS_PROMPT_TEMPLATE = """Your previous answer was cut off or incomplete. This is what it contained:
+{partial}
+
+Provide ONLY the missing fields ({fields}), consistent with the answer above."""
+
+# Simulations are returned as forced tool input matching simulation_schema.py;
+# the fused call's tool adds the chosen candidate
+SIMULATION_TOOL_CONFIG = tool_config()
+FUSED_TOOL_CONFIG = tool_config(
+    with_fields(SIMULATION_SCHEMA, {
+        "candidate_id": {"type": "integer", "description": "Number of the selected candidate in the list"},
+        "candidate_name": {"type": "string", "description": "Name of the selected candidate"}
+    }, required=["candidate_id", "candidate_name"]),
+    name='record_match',
+    description="Record the selected candidate and the result of the simulated first date."
+)
+
+# A cachePoint block ends a prompt prefix that Bedrock may cache and reuse: after
+# the system prompts, and after the candidate list, which repeats whenever
+# shortlists do. Prefixes shorter than the model's minimum (4096 tokens for Claude
+# Haiku 4.5) are not cached: the system prompts alone never qualify, and the
+# candidate list only does with a shortlist of roughly 30 or more candidates.
+PROMPT_CACHE_ENABLED = os.environ.get('PROMPT_CACHE_ENABLED', 'true').lower() != 'false'
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+def cached_prefix(*blocks):
+    """Content blocks followed by a prompt-cache checkpoint (if enabled)."""
+    return list(blocks) + [CACHE_POINT] if PROMPT_CACHE_ENABLED else list(blocks)
+
+# ==========================================
+# RESULT CACHE
+# ==========================================
+# Bump whenever a prompt changes so stale cached results are never served
+PROMPT_VERSION = "5"
+
+# The in-process layer survives warm invocations; set RESULT_CACHE_PATH (e.g. a
+# file under /tmp or on EFS) to add a shared SQLite layer behind it.
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get('RESULT_CACHE_TTL_SECONDS', '3600'))
+RESULT_CACHE = TwoLevelCache(
+    local=LRUCache(
+        max_entries=int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', '1024')),
+        ttl_seconds=RESULT_CACHE_TTL_SECONDS
+    ),
+    shared=SQLiteCache(os.environ['RESULT_CACHE_PATH'], ttl_seconds=RESULT_CACHE_TTL_SECONDS)
+    if os.environ.get('RESULT_CACHE_PATH') else None
+)
+
+# With NEAR_DUPLICATE_MODE=selection, resubmissions that are nearly the same as an
+# earlier profile (MinHash similarity at or above NEAR_DUPLICATE_THRESHOLD) reuse its
+# cached candidate selection, and with NEAR_DUPLICATE_MODE=simulation its cached date
+# simulation too. Off by default. Set NEAR_DUPLICATE_PATH to persist the index in a
+# SQLite file.
+NEAR_DUPLICATE_MODES = ('off', 'selection', 'simulation')
+NEAR_DUPLICATE_MODE = os.environ.get('NEAR_DUPLICATE_MODE', 'off')
+if NEAR_DUPLICATE_MODE not in NEAR_DUPLICATE_MODES:
+    raise ValueError(f"NEAR_DUPLICATE_MODE must be one of {', '.join(NEAR_DUPLICATE_MODES)}")
+_near_duplicate_index = None
+_near_duplicate_lock = threading.Lock()
+
+def get_near_duplicate_index():
+    """Return the near-duplicate profile index (None when disabled), creating it on first use."""
+    global _near_duplicate_index
+    if NEAR_DUPLICATE_MODE == 'off':
+        return None
+    if _near_duplicate_index is None:
+        with _near_duplicate_lock:
+            if _near_duplicate_index is None:
+                with startup_phase('near_duplicate_index'):
+                    from near_duplicate import LSHStore, NearDuplicateIndex, SQLiteLSHStore
+                    path = os.environ.get('NEAR_DUPLICATE_PATH')
+                    _near_duplicate_index = NearDuplicateIndex(
+                        local=LSHStore(max_entries=int(os.environ.get('NEAR_DUPLICATE_MAX_ENTRIES', '10000'))),
+                        shared=SQLiteLSHStore(path) if path else None,
+                        threshold=float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', '0.8'))
+                    )
+    return _near_duplicate_index
+
+# Expired rows in the shared SQLite layers (RESULT_CACHE_PATH, NEAR_DUPLICATE_PATH)
+# are deleted on warm-up and, at most this often, by a request that passed validation
+STORE_PURGE_INTERVAL_SECONDS = float(os.environ.get('STORE_PURGE_INTERVAL_SECONDS', '600'))
+_last_store_purge = time.monotonic()
+_store_purge_lock = threading.Lock()
+
+def purge_expired_entries(force=False):
+    """Delete expired entries from the shared cache and near-duplicate stores."""
+    global _last_store_purge
+    with _store_purge_lock:
+        if not force and time.monotonic() - _last_store_purge < STORE_PURGE_INTERVAL_SECONDS:
+            return
+        _last_store_purge = time.monotonic()
+    stores = [RESULT_CACHE.shared, _near_duplicate_index.shared if _near_duplicate_index is not None else None]
+    for store in stores:
+        if store is None:
+            continue
+        try:
+            with metrics.timed('store_purge'):
+                store.purge_expired()
+        except Exception as e:
+            print(f"⚠️ Purging expired entries failed: {str(e)}")
+
+# ==========================================
+# PROFILE TOKEN BUDGET
+# ==========================================
+# Profiles are sent to both selection and simulation, so they are compacted first:
+# voice filler and repeated sentences are removed, and profiles still longer than
+# PROFILE_TOKEN_BUDGET estimated tokens are trimmed to it, keeping structured facts
+# before stated values before other free text (see token_budget.py; 0 disables trimming)
+PROFILE_TOKEN_BUDGET = int(os.environ.get('PROFILE_TOKEN_BUDGET', '1000'))
+
+def budget_profile(user_partner_profile):
+    """Compact a profile to PROFILE_TOKEN_BUDGET tokens, recording what was removed."""
+    with metrics.timed('token_budget'):
+        compacted, report = compact_profile(user_partner_profile, PROFILE_TOKEN_BUDGET)
+    if not compacted.strip():
+        # Nothing but filler; let the model see what the user actually said
+        return user_partner_profile
+    metrics.increment('profile_tokens', report['tokens_after'])
+    removed = report['tokens_before'] - report['tokens_after']
+    if removed > 0:
+        metrics.increment('profile_tokens_removed', removed)
+        metrics.increment('profile_fillers_removed', report['fillers_removed'])
+        metrics.increment('profile_duplicates_removed', report['duplicates_removed'])
+        metrics.increment('profile_sentences_dropped', report['sentences_dropped'])
+        log_debug(f"✂️ Compacted profile from ~{report['tokens_before']} to ~{report['tokens_after']} tokens "
+                  f"({report['fillers_removed']} fillers, {report['duplicates_removed']} repeated and "
+                  f"{report['sentences_dropped']} trimmed sentences)")
+    return compacted
 
-# Initialize the Bedrock Runtime client
-bedrock_client = boto3.client('bedrock-runtime', region_name='us-east-1')
+# ==========================================
+# BATCH MATCHING
+# ==========================================
+# Upper bound on concurrent Bedrock calls per invocation; keep it within the
+# account's on-demand throttling quota for the model.
+BEDROCK_MAX_CONCURRENCY = int(os.environ.get('BEDROCK_MAX_CONCURRENCY', '4'))
+# Slots a batch hands to its items, so top-K simulations across the whole batch
+# stay within its max_concurrency
+_model_call_slots = contextvars.ContextVar('model_call_slots', default=None)
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', '50'))
+
+# ==========================================
+# TOP-K SIMULATION
+# ==========================================
+# "top_k" in the body simulates dates with that many candidates in parallel
+TOP_K_MAX = int(os.environ.get('TOP_K_MAX', '5'))
+# Shared deadline for all K simulations, further capped by the Lambda's remaining time
+TOP_K_DEADLINE_SECONDS = float(os.environ.get('TOP_K_DEADLINE_SECONDS', '20'))
+# Time kept back from the Lambda timeout to build and return the response
+RESPONSE_MARGIN_SECONDS = 1.0
+
+# ==========================================
+# ASYNC JOBS
+# ==========================================
+# "async": true in the body queues the request and returns a job ID at once;
+# {"job_id": ...} returns the job's status and, once finished, its result. Jobs are
+# run by job_queue.JobWorker threads (local_server.py, or python job_queue.py)
+# sharing the SQLite store at JOB_STORE_PATH (put it on EFS to share across hosts).
+# Nothing drains the queue on Lambda, so async requests are rejected unless this
+# process runs job workers (start_job_workers) or ASYNC_JOBS=true says another
+# process does.
+ASYNC_JOBS = os.environ.get('ASYNC_JOBS', 'false').lower() == 'true'
+JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', '/tmp/pink_knights_jobs.sqlite3')
+# Time a job may run before its model calls give up (the Lambda timeout does not apply)
+JOB_TIMEOUT_SECONDS = float(os.environ.get('JOB_TIMEOUT_SECONDS', '300'))
+JOB_RESULT_TTL_SECONDS = int(os.environ.get('JOB_RESULT_TTL_SECONDS', '3600'))
 
 # ==========================================
 # HARDCODED CANDIDATE PROFILES FOR DEMO
@@ -54,42 +388,170 @@ DEMO_CANDIDATE_PROFILES = [
     }
 ]
 
-def get_compatible_candidate_profile(user_profile, bedrock_client, model_id):
-    """Use AI to select the most compatible candidate profile based on user's input."""
-    
-    # Build a list of all candidate profiles for the AI to evaluate
-    candidates_list = "\n\n".join([
-        f"CANDIDATE {i+1} ({profile['name']}):\n{profile['profile']}"
-        for i, profile in enumerate(DEMO_CANDIDATE_PROFILES)
-    ])
+# ==========================================
+# CANDIDATE POOL AND LOCAL PRE-RANKING INDEX
+# ==========================================
+# Set CANDIDATE_STORE_PATH to a file built by build_candidate_store.py to use a
+# packed, memory-mapped candidate pool instead of the demo profiles above.
+CANDIDATE_STORE_PATH = os.environ.get('CANDIDATE_STORE_PATH', '')
+
+# How many of the best locally-ranked candidates the LLM gets to choose from
+CANDIDATE_SHORTLIST_SIZE = int(os.environ.get('CANDIDATE_SHORTLIST_SIZE', '5'))
+
+# "llm" asks the model to pick from the shortlist, "fast" takes the top local match,
+# "fused" picks and simulates in a single model call (falling back to "llm" if the
+# answer cannot be used)
+SELECTION_MODES = ('llm', 'fast', 'fused')
+DEFAULT_SELECTION_MODE = os.environ.get('CANDIDATE_SELECTION_MODE', 'llm')
+
+# Candidates that break a stated dealbreaker (gender, children, smoking, religion,
+# location; see attribute_filter.py) never reach the shortlist
+ATTRIBUTE_FILTER_ENABLED = os.environ.get('ATTRIBUTE_FILTER_ENABLED', 'true').lower() != 'false'
+
+# All three are loaded on first use and reused for the lifetime of the container
+_candidate_pool = None
+_candidate_index = None
+_attribute_index = None
+_candidate_lock = threading.Lock()
+
+def get_candidate_pool():
+    """Return the candidate pool: the packed store if configured, else the demo list."""
+    global _candidate_pool
+    if _candidate_pool is None:
+        with _candidate_lock:
+            if _candidate_pool is None:
+                with startup_phase('candidate_pool'):
+                    if CANDIDATE_STORE_PATH:
+                        _candidate_pool = CandidateStore(CANDIDATE_STORE_PATH)
+                        print(f"📦 Opened candidate store with {len(_candidate_pool)} candidates")
+                    else:
+                        _candidate_pool = DEMO_CANDIDATE_PROFILES
+    return _candidate_pool
+
+def get_candidate_index():
+    """Return the pre-ranking index, loading the prebuilt one that ships with the store."""
+    global _candidate_index
+    if _candidate_index is None:
+        pool = get_candidate_pool()
+        with _candidate_lock:
+            if _candidate_index is None:
+                with startup_phase('candidate_index'):
+                    from candidate_index import CandidateIndex, candidate_document
+                    index_path = index_path_for(CANDIDATE_STORE_PATH) if CANDIDATE_STORE_PATH else ''
+                    if index_path and os.path.isdir(index_path):
+                        _candidate_index = CandidateIndex.load(index_path)
+                    else:
+                        _candidate_index = CandidateIndex(candidate_document(candidate) for candidate in pool)
+    return _candidate_index
+
+def get_attribute_index():
+    """Return the attribute filter index, loading the prebuilt one that ships with the store."""
+    global _attribute_index
+    if _attribute_index is None:
+        pool = get_candidate_pool()
+        with _candidate_lock:
+            if _attribute_index is None:
+                with startup_phase('attribute_index'):
+                    from attribute_filter import AttributeIndex
+                    index_path = index_path_for(CANDIDATE_STORE_PATH) if CANDIDATE_STORE_PATH else ''
+                    if index_path and os.path.exists(os.path.join(index_path, 'attributes.json')):
+                        _attribute_index = AttributeIndex.load(index_path)
+                    else:
+                        _attribute_index = AttributeIndex(pool)
+    return _attribute_index
+
+def compatible_candidates(user_profile, record=True):
+    """Bitset of the candidates that break none of the user's dealbreakers, or None for all.
     
-    selection_prompt = f"""You are a matchmaking AI. Your task is to analyze a user's profile and select the MOST COMPATIBLE candidate from the list below.
+    record=False skips the metrics, for checks that do not build a shortlist.
+    """
+    if not ATTRIBUTE_FILTER_ENABLED:
+        return None
+    attribute_index = get_attribute_index()
+    with metrics.timed('attribute_filter'):
+        from attribute_filter import extract_attributes
+        allowed = attribute_index.compatible(extract_attributes(user_profile))
+    excluded = attribute_index.size - bin(allowed).count('1')
+    if not excluded:
+        return None
+    if record:
+        metrics.increment('candidates_excluded', excluded)
+    if not allowed:
+        # Better an imperfect match than none at all
+        if record:
+            print(f"⚠️ Every candidate breaks a stated dealbreaker; ranking the whole pool")
+            metrics.increment('attribute_filter_fallbacks')
+        return None
+    return allowed
 
-USER'S PROFILE:
-{user_profile}
+def is_compatible_candidate(user_profile, position):
+    """Whether the candidate at a pool position passes the user's dealbreaker filter."""
+    allowed = compatible_candidates(user_profile, record=False)
+    return allowed is None or bool(allowed >> position & 1)
 
-AVAILABLE CANDIDATES:
-{candidates_list}
+def get_candidate_shortlist_positions(user_profile, size=CANDIDATE_SHORTLIST_SIZE):
+    """Positions in the pool of the best `size` compatible local matches, best first."""
+    index = get_candidate_index()
+    allowed = compatible_candidates(user_profile)
+    with metrics.timed('shortlist'):
+        return tuple(position for position, _ in index.top_k(user_profile, size, allowed))
 
-Based on the user's profile, interests, lifestyle, and preferences, select the candidate number (1-{len(DEMO_CANDIDATE_PROFILES)}) that would be the BEST MATCH for this user. Consider:
-- Shared interests and hobbies
-- Lifestyle compatibility
-- Personality alignment
-- Values and priorities
-- Complementary traits
+def get_candidate_shortlist(user_profile, size=CANDIDATE_SHORTLIST_SIZE):
+    """Rank the candidate pool locally and return the best `size` candidates."""
+    pool = get_candidate_pool()
+    return [pool[position] for position in get_candidate_shortlist_positions(user_profile, size)]
 
-Respond with ONLY the candidate number (1-{len(DEMO_CANDIDATE_PROFILES)}) and nothing else."""
+@lru_cache(maxsize=256)
+def build_candidates_block(positions):
+    """Numbered candidate list for the selection prompt, built once per shortlist.
+    
+    The text must be byte-identical every time for its prompt-cache prefix to hit.
+    """
+    pool = get_candidate_pool()
+    return SELECTION_CANDIDATES_TEMPLATE.format(candidates_list="\n\n".join([
+        f"CANDIDATE {i+1} ({pool[position]['name']}):\n{pool[position]['profile']}"
+        for i, position in enumerate(positions)
+    ]))
+
+def build_selection_request(user_profile, positions):
+    """Return the (system, messages) blocks for the candidate selection call."""
+    user_prompt = SELECTION_USER_PROMPT_TEMPLATE.format(user_profile=user_profile, count=len(positions))
+    system = cached_prefix({"text": SELECTION_SYSTEM_PROMPT})
+    content = cached_prefix({"text": build_candidates_block(positions)}) + [{"text": user_prompt}]
+    return system, [{"role": "user", "content": content}]
+
+def select_candidate(user_profile, bedrock_client, model_id, selection_mode='llm'):
+    """Select a candidate; returns (pool position, source).
+    
+    source is "model" for an AI pick, "local" when the local ranking was asked for
+    (fast mode or a single candidate) and "fallback" when the AI pick failed and the
+    best local match was used instead. Fallbacks are counted and never cached.
+    """
+    
+    positions = get_candidate_shortlist_positions(user_profile)
+    pool = get_candidate_pool()
+    shortlist = [pool[position] for position in positions]
+    best_local_match = shortlist[0]
+    
+    if selection_mode == 'fast' or len(shortlist) == 1:
+        log_debug(f"🎭 Fast selection picked candidate: {best_local_match['name']}")
+        return positions[0], 'local'
+    
+    selection_system, selection_messages = build_selection_request(user_profile, positions)
 
     try:
-        response = bedrock_client.converse(
-            modelId=model_id,
-            messages=[{"role": "user", "content": [{"text": selection_prompt}]}],
-            system=[{"text": "You are a matchmaking expert. Analyze compatibility and select the best match. Respond with only a number."}],
-            inferenceConfig={
-                "maxTokens": 50,
-                "temperature": 0.3  # Lower temperature for more consistent selection
-            }
-        )
+        with metrics.timed('selection_call'):
+            response = bedrock_client.converse(
+                kind="selection",
+                modelId=model_id,
+                messages=selection_messages,
+                system=selection_system,
+                inferenceConfig={
+                    "maxTokens": 50,
+                    "temperature": 0.3  # Lower temperature for more consistent selection
+                }
+            )
+        metrics.record_usage(response)
         
         # Extract the candidate number from the response
         response_text = response['output']['message']['content'][0]['text'].strip()
@@ -99,26 +561,884 @@ Respond with ONLY the candidate number (1-{len(DEMO_CANDIDATE_PROFILES)}) and no
         if numbers:
             candidate_index = int(numbers[0]) - 1  # Convert to 0-based index
             # Ensure index is valid
-            if 0 <= candidate_index < len(DEMO_CANDIDATE_PROFILES):
-                selected = DEMO_CANDIDATE_PROFILES[candidate_index]
-                print(f"🎭 AI selected candidate: {selected['name']} (index {candidate_index + 1})")
-                return selected['profile']
+            if 0 <= candidate_index < len(shortlist):
+                selected = shortlist[candidate_index]
+                log_debug(f"🎭 AI selected candidate: {selected['name']} (shortlist position {candidate_index + 1})")
+                return positions[candidate_index], 'model'
         
-        # Fallback: if parsing fails, log and use first candidate
-        print(f"⚠️ Could not parse candidate selection from AI response: {response_text}")
-        print(f"⚠️ Falling back to first candidate")
-        selected = DEMO_CANDIDATE_PROFILES[0]
-        print(f"🎭 Using fallback candidate: {selected['name']}")
-        return selected['profile']
+        # Fallback: if parsing fails, log and use the best local match
+        print(f"⚠️ Could not parse candidate selection from AI response: {response_text[:200]}")
+        reason = 'unparseable'
         
+    except (ModelUnavailableError, TimeoutError) as e:
+        # Throttled past the retry budget, too slow, or the circuit is open:
+        # the local ranking is a reasonable pick and keeps the request alive
+        print(f"⚠️ AI candidate selection unavailable: {str(e)[:200]}")
+        reason = 'unavailable'
+    
+    metrics.increment('selection_fallbacks')
+    metrics.set_property('selection_fallback', reason)
+    print(f"🎭 Falling back to best local match: {best_local_match['name']}")
+    return positions[0], 'fallback'
+
+class SimulationParseError(ValueError):
+    """The date simulation response could not be parsed as JSON."""
+
+class SimulationTimeoutError(TimeoutError):
+    """No date simulation finished before the request deadline."""
+
+def build_simulation_request(user_profile, candidate_profile):
+    """Return the (system, messages) blocks for the date simulation call."""
+    
+    system = cached_prefix({"text": SIMULATION_SYSTEM_PROMPT})
+    content = [
+        {"text": SIMULATION_CANDIDATE_TEMPLATE.format(candidate_profile=candidate_profile)},
+        {"text": SIMULATION_USER_PROMPT_TEMPLATE.format(user_profile=user_profile)}
+    ]
+    return system, [{"role": "user", "content": content}]
+
+def finalize_simulation_data(final_simulation_data, candidate_profile):
+    """Fill in the meta fields the frontend relies on."""
+    
+    # Ensure meta structure exists
+    if 'meta' not in final_simulation_data:
+        final_simulation_data['meta'] = {}
+    
+    # Add candidate_profile to meta
+    final_simulation_data['meta']['candidate_profile'] = candidate_profile
+    
+    # Ensure compatibility_factors exists
+    if 'compatibility_factors' not in final_simulation_data['meta']:
+        final_simulation_data['meta']['compatibility_factors'] = {}
+    
+    # Ensure potential_concerns exists
+    if 'potential_concerns' not in final_simulation_data['meta']:
+        final_simulation_data['meta']['potential_concerns'] = ""
+    
+    return final_simulation_data
+
+def simulate_date(user_profile, candidate_profile, bedrock_client, model_id):
+    """Use AI to simulate a first date and return the parsed result payload."""
+    
+    m2_system, m2_messages = build_simulation_request(user_profile, candidate_profile)
+    
+    # Debug: Log what we're sending to Model 2
+    log_debug(lambda: f"📤 Model 2 Prompt (first 500 chars): {m2_messages[0]['content'][0]['text'][:500]}")
+    log_debug(f"📤 User profile length: {len(user_profile)} characters")
+    log_debug(f"📤 Candidate profile length: {len(candidate_profile)} characters")
+
+    with metrics.timed('simulation_call'):
+        m2_response = bedrock_client.converse(
+            kind="simulation",
+            modelId=model_id,
+            messages=m2_messages,
+            system=m2_system,
+            inferenceConfig={
+                "maxTokens": 1000,
+                "temperature": 0.7 
+            },
+            toolConfig=SIMULATION_TOOL_CONFIG
+        )
+    metrics.record_usage(m2_response)
+    
+    with metrics.timed('json_extraction'):
+        final_simulation_data = extract_simulation_data(m2_response)
+    final_simulation_data = complete_simulation_data(
+        final_simulation_data, user_profile, candidate_profile, bedrock_client, model_id
+    )
+    return finalize_simulation_data(final_simulation_data, candidate_profile)
+
+def extract_simulation_data(m2_response):
+    """Recover as much of the simulation as the response holds, normalized to the schema."""
+    try:
+        return normalize_simulation(*parse_response_json(m2_response))
+    except SimulationParseError:
+        # Nothing usable; every required field will be requested again
+        return {}
+
+def complete_simulation_data(simulation_data, user_profile, candidate_profile, bedrock_client, model_id):
+    """Re-request only the required fields a simulation is missing and merge them in.
+    
+    Raises SimulationParseError if the score or summary is still missing afterwards;
+    other fields fall back to the defaults of finalize_simulation_data.
+    """
+    missing = missing_fields(simulation_data)
+    if not missing:
+        return simulation_data
+    
+    fields = ', '.join('.'.join(path) for path in missing)
+    print(f"⚠️ Simulation output incomplete; re-requesting {fields}")
+    metrics.increment('field_rerequests')
+    m2_system, m2_messages = build_simulation_request(user_profile, candidate_profile)
+    m2_messages[0]['content'].append({"text": MISSING_FIELDS_PROMPT_TEMPLATE.format(
+        partial=json.dumps(simulation_data, ensure_ascii=False), fields=fields
+    )})
+    with metrics.timed('rerequest_call'):
+        response = bedrock_client.converse(
+            kind="simulation",
+            modelId=model_id,
+            messages=m2_messages,
+            system=m2_system,
+            inferenceConfig={
+                "maxTokens": 1000,
+                "temperature": 0.7
+            },
+            toolConfig=tool_config(schema_for_fields(missing))
+        )
+    metrics.record_usage(response)
+    
+    merge_fields(simulation_data, extract_simulation_data(response), missing)
+    still_missing = [path for path in missing_fields(simulation_data) if path in (('score',), ('summary',))]
+    if still_missing:
+        raise SimulationParseError(
+            f"AI response is missing {', '.join('.'.join(path) for path in still_missing)} after a re-request"
+        )
+    return simulation_data
+
+def last_string_path(value, path=()):
+    """Path of the last string value in a parsed document, in generation order."""
+    if isinstance(value, str):
+        return path
+    items = value.items() if isinstance(value, dict) else enumerate(value) if isinstance(value, list) else ()
+    for key, child in reversed(list(items)):
+        child_path = last_string_path(child, path + (key,))
+        if child_path is not None:
+            return child_path
+    return None
+
+def parse_response_json(m2_response):
+    """Return (data, truncated_path) from a converse response.
+    
+    Tool output is used as is. Text is parsed as JSON, tolerating fences and extra
+    text; if that fails, a local repair pass recovers near-valid JSON (trailing
+    commas, output cut off by maxTokens) and truncated_path names the string value
+    that was cut off, if any.
+    """
+    content = m2_response['output']['message']['content']
+    for block in content:
+        if 'toolUse' in block:
+            tool_input = block['toolUse'].get('input')
+            if isinstance(tool_input, dict):
+                # Input cut off by maxTokens ends in the string being generated at the time
+                truncated = m2_response.get('stopReason') == 'max_tokens'
+                return tool_input, last_string_path(tool_input) if truncated else None
+            raise SimulationParseError(f"Expected a JSON object as tool input, got {type(tool_input).__name__}")
+    
+    # Extract and clean Model 2's JSON response
+    response_text = ''.join(block.get('text', '') for block in content)
+    response_text = response_text.replace('```json', '').replace('```', '').strip()
+    
+    # Try to extract just the JSON part (handle cases where AI adds extra text)
+    # Find the first { and last } to extract valid JSON
+    first_brace = response_text.find('{')
+    last_brace = response_text.rfind('}')
+    
+    if first_brace != -1 and last_brace != -1 and last_brace > first_brace:
+        response_text = response_text[first_brace:last_brace + 1]
+    
+    # Parse the JSON so we can inject the generated profile into the final return payload
+    truncated_path = None
+    try:
+        final_simulation_data = json.loads(response_text)
+    except json.JSONDecodeError as json_error:
+        try:
+            final_simulation_data, truncated_path = repair_json(response_text)
+            metrics.increment('json_repairs')
+        except ValueError:
+            # If JSON parsing fails, log the error and let the caller respond
+            error_msg = f"Failed to parse AI response as JSON: {str(json_error)}. Response text (first 500 chars): {response_text[:500]}"
+            print(error_msg)
+            raise SimulationParseError(error_msg) from json_error
+    
+    if not isinstance(final_simulation_data, dict):
+        raise SimulationParseError(f"Expected a JSON object from the AI, got {type(final_simulation_data).__name__}")
+    return final_simulation_data, truncated_path
+
+def build_fused_request(user_profile, positions):
+    """Return the (system, messages) blocks for the fused select-and-simulate call."""
+    user_prompt = FUSED_USER_PROMPT_TEMPLATE.format(user_profile=user_profile, count=len(positions))
+    system = cached_prefix({"text": FUSED_SYSTEM_PROMPT})
+    content = cached_prefix({"text": build_candidates_block(positions)}) + [{"text": user_prompt}]
+    return system, [{"role": "user", "content": content}]
+
+FIRST_NAME = re.compile(r"[^\W\d_]+(?:['-][^\W\d_]+)*")
+
+def first_name(name):
+    """Lowercased first word of a candidate name: "Casey - The Musician (Female)" -> "casey"."""
+    match = FIRST_NAME.search(str(name))
+    return match.group(0).lower() if match else ''
+
+def fused_candidate_position(data, positions):
+    """Pool position of the candidate a fused answer picked, or None if it is not valid.
+    
+    candidate_id must number a shortlisted candidate, and candidate_name (if given)
+    must start with that candidate's first name, so a mixed-up answer is never
+    attributed to the wrong person. Models often shorten the listed name
+    ("Casey" for "Casey - The Musician (Female)"), which is accepted.
+    """
+    pool = get_candidate_pool()
+    try:
+        candidate_number = int(data.get('candidate_id'))
+    except (TypeError, ValueError):
+        return None
+    if not 1 <= candidate_number <= len(positions):
+        return None
+    position = positions[candidate_number - 1]
+    name = data.get('candidate_name')
+    if name and first_name(name) != first_name(pool[position]['name']):
+        return None
+    return position
+
+def match_profile_fused(user_partner_profile, model_id, use_cache):
+    """Select a candidate and simulate the date in one model call.
+    
+    The answer must name a shortlisted candidate; otherwise the request falls back
+    to the two-call path (model selection, then simulation). Required simulation
+    fields missing from a valid answer are re-requested for the chosen candidate.
+    """
+    selection_key = cache_key('candidate', model_id, f"{PROMPT_VERSION}:fused", user_partner_profile)
+    cached_entry = cached_selection(user_partner_profile, selection_key) if use_cache else None
+    if use_cache:
+        metrics.increment('cache_hits' if cached_entry is not None else 'cache_misses')
+        if cached_entry is None:
+            cached_entry = near_duplicate_result(
+                user_partner_profile,
+                lambda profile: cache_key('candidate', model_id, f"{PROMPT_VERSION}:fused", profile),
+                'selection',
+                accept=lambda entry: usable_selection(user_partner_profile, entry)
+            )
+    if cached_entry is not None:
+        # The fused answer was cached as a selection plus a simulation; reuse both
+        return simulate_date_cached(user_partner_profile, cached_entry['profile'], model_id, use_cache)
+    
+    positions = get_candidate_shortlist_positions(user_partner_profile)
+    fused_system, fused_messages = build_fused_request(user_partner_profile, positions)
+    with metrics.timed('fused_call'):
+        response = get_model_client().converse(
+            kind="fused",
+            modelId=model_id,
+            messages=fused_messages,
+            system=fused_system,
+            inferenceConfig={
+                "maxTokens": 1100,
+                "temperature": 0.7
+            },
+            toolConfig=FUSED_TOOL_CONFIG
+        )
+    metrics.record_usage(response)
+    
+    try:
+        with metrics.timed('json_extraction'):
+            data, truncated_path = parse_response_json(response)
+        position = fused_candidate_position(data, positions)
+    except SimulationParseError:
+        position = None
+    if position is None:
+        print(f"⚠️ Fused answer unusable; falling back to separate selection and simulation")
+        metrics.increment('fused_fallbacks')
+        candidate_model_profile = select_candidate_cached(user_partner_profile, model_id, 'llm', use_cache)
+        return simulate_date_cached(user_partner_profile, candidate_model_profile, model_id, use_cache)
+    
+    data.pop('candidate_id', None)
+    data.pop('candidate_name', None)
+    candidate_model_profile = get_candidate_pool()[position]['profile']
+    data = complete_simulation_data(
+        normalize_simulation(data, truncated_path), user_partner_profile, candidate_model_profile,
+        get_model_client(), model_id
+    )
+    final_simulation_data = finalize_simulation_data(data, candidate_model_profile)
+    log_debug(lambda: f"🎭 Fused call selected candidate: {get_candidate_pool()[position]['name']}")
+    if use_cache:
+        RESULT_CACHE.set(selection_key, selection_entry(position))
+        simulation_key = cache_key('simulation', model_id, PROMPT_VERSION, user_partner_profile, candidate_model_profile)
+        RESULT_CACHE.set(simulation_key, final_simulation_data)
+        remember_profile(user_partner_profile)
+    return final_simulation_data
+
+def near_duplicate_result(user_partner_profile, key_for, kind, accept=None):
+    """Cached result of a near-duplicate of the profile, or None.
+    
+    key_for maps a profile to the result cache key to look up; similar profiles are
+    tried from most to least similar, skipping results that accept() rejects.
+    """
+    index = get_near_duplicate_index()
+    if index is None or (kind == 'simulation' and NEAR_DUPLICATE_MODE != 'simulation'):
+        return None
+    with metrics.timed('near_duplicate_lookup'):
+        matches = index.query(user_partner_profile)
+    for similar_profile, similarity in matches:
+        value = RESULT_CACHE.get(key_for(similar_profile))
+        if value is not None and (accept is None or accept(value)):
+            log_debug(f"⚡ Reusing the {kind} of a near-duplicate profile (similarity {similarity:.2f})")
+            metrics.increment(f"near_duplicate_{kind}_hits")
+            metrics.set_property('near_duplicate_similarity', round(similarity, 3))
+            return value
+    return None
+
+def selection_entry(position):
+    """Result cache entry for a selected candidate: its pool position and profile text."""
+    return {"position": position, "profile": get_candidate_pool()[position]['profile']}
+
+def usable_selection(user_partner_profile, entry):
+    """Whether a cached selection still names a pool candidate the user's filter allows.
+    
+    Cached selections were made for the exact profile or a near-duplicate of it, and
+    a near-duplicate can differ in exactly the facts the filter uses. The profile text
+    is compared too, so a rebuilt candidate store never serves a different person.
+    """
+    pool = get_candidate_pool()
+    position = entry.get('position') if isinstance(entry, dict) else None
+    if not isinstance(position, int) or not 0 <= position < len(pool) or pool[position]['profile'] != entry.get('profile'):
+        return False
+    if not is_compatible_candidate(user_partner_profile, position):
+        metrics.increment('incompatible_cached_selections')
+        return False
+    return True
+
+def cached_selection(user_partner_profile, selection_key):
+    """Cached selection entry for a selection key, unless it is no longer usable."""
+    entry = RESULT_CACHE.get(selection_key)
+    return entry if entry is not None and usable_selection(user_partner_profile, entry) else None
+
+def remember_profile(user_partner_profile):
+    """Add a profile whose results were cached to the near-duplicate index."""
+    index = get_near_duplicate_index()
+    if index is not None:
+        index.add(user_partner_profile)
+
+def select_candidate_cached(user_partner_profile, model_id, selection_mode, use_cache):
+    """Pick a candidate profile, reusing a cached selection when allowed."""
+    
+    # Shortlist candidates with the local index, then let the AI pick the
+    # most compatible one (or take the top local match in fast mode)
+    selection_key = cache_key('candidate', model_id, f"{PROMPT_VERSION}:{selection_mode}", user_partner_profile)
+    cached_entry = cached_selection(user_partner_profile, selection_key) if use_cache else None
+    if use_cache:
+        metrics.increment('cache_hits' if cached_entry is not None else 'cache_misses')
+        if cached_entry is None:
+            cached_entry = near_duplicate_result(
+                user_partner_profile,
+                lambda profile: cache_key('candidate', model_id, f"{PROMPT_VERSION}:{selection_mode}", profile),
+                'selection',
+                accept=lambda entry: usable_selection(user_partner_profile, entry)
+            )
+    if cached_entry is not None:
+        log_debug(f"⚡ Reusing cached candidate selection")
+        candidate_model_profile = cached_entry['profile']
+    else:
+        position, source = select_candidate(
+            user_profile=user_partner_profile,
+            bedrock_client=get_model_client(),
+            model_id=model_id,
+            selection_mode=selection_mode
+        )
+        candidate_model_profile = get_candidate_pool()[position]['profile']
+        # A fallback pick is only good enough for this request
+        if use_cache and source != 'fallback':
+            RESULT_CACHE.set(selection_key, selection_entry(position))
+            remember_profile(user_partner_profile)
+    
+    # Debug: Log the selected candidate profile
+    log_debug(lambda: f"🎭 Selected candidate profile (first 200 chars): {candidate_model_profile[:200]}")
+    log_debug(f"🎭 Selected candidate profile (full length): {len(candidate_model_profile)} characters")
+    
+    return candidate_model_profile
+
+def simulate_date_cached(user_partner_profile, candidate_model_profile, model_id, use_cache):
+    """Simulate a date, reusing a cached simulation of the same pair when allowed."""
+    
+    simulation_key = cache_key('simulation', model_id, PROMPT_VERSION, user_partner_profile, candidate_model_profile)
+    final_simulation_data = RESULT_CACHE.get(simulation_key) if use_cache else None
+    if use_cache:
+        metrics.increment('cache_hits' if final_simulation_data is not None else 'cache_misses')
+        if final_simulation_data is None:
+            final_simulation_data = near_duplicate_result(
+                user_partner_profile,
+                lambda profile: cache_key('simulation', model_id, PROMPT_VERSION, profile, candidate_model_profile),
+                'simulation'
+            )
+    if final_simulation_data is not None:
+        log_debug(f"⚡ Reusing cached date simulation")
+    else:
+        final_simulation_data = simulate_date(
+            user_profile=user_partner_profile,
+            candidate_profile=candidate_model_profile,
+            bedrock_client=get_model_client(),
+            model_id=model_id
+        )
+        if use_cache:
+            RESULT_CACHE.set(simulation_key, final_simulation_data)
+            remember_profile(user_partner_profile)
+    
+    return final_simulation_data
+
+def score_of(simulation_data):
+    """Numeric score of a simulation result; unparseable scores rank last."""
+    try:
+        return float(simulation_data.get('score', 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+def match_profile_top_k(user_partner_profile, model_id, top_k, use_cache, deadline):
+    """Simulate dates with the top K local matches concurrently and rank them by score.
+    
+    All simulations share one deadline (a time.monotonic() value); whatever has not
+    finished by then is dropped, so latency stays close to a single simulation.
+    """
+    shortlist = get_candidate_shortlist(user_partner_profile, top_k)
+    log_debug(lambda: f"🎯 Simulating dates with top {len(shortlist)} candidates: {[c['name'] for c in shortlist]}")
+    
+    slots = _model_call_slots.get()
+    
+    def simulate(candidate_profile):
+        if slots is None:
+            return simulate_date_cached(user_partner_profile, candidate_profile, model_id, use_cache)
+        # Inside a batch, wait for one of the batch's slots (but not past the deadline)
+        if not slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise SimulationTimeoutError("No model call slot freed up before the deadline")
+        try:
+            return simulate_date_cached(user_partner_profile, candidate_profile, model_id, use_cache)
+        finally:
+            slots.release()
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, min(len(shortlist), BEDROCK_MAX_CONCURRENCY)))
+    # Model calls inherit the deadline, so stragglers give up instead of running on
+    with deadline_scope(deadline):
+        futures = {
+            metrics.submit_with_context(executor, simulate, candidate['profile']): candidate
+            for candidate in shortlist
+        }
+    done, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+    # Don't block the response on stragglers; queued simulations are cancelled
+    executor.shutdown(wait=False, cancel_futures=True)
+    if not_done:
+        print(f"⏱️ {len(not_done)} simulation(s) missed the deadline and were dropped")
+    
+    ranked = []
+    for future in done:
+        candidate = futures[future]
+        try:
+            ranked.append((candidate, future.result()))
+        except Exception as e:
+            print(f"⚠️ Simulation with {candidate['name']} failed: {str(e)}")
+    
+    if not ranked:
+        if not_done:
+            raise SimulationTimeoutError("No date simulation finished before the deadline")
+        # Surface the most actionable failure: unavailable and timed out beat parse errors
+        errors = [future.exception() for future in done]
+        for error_type in (ModelUnavailableError, TimeoutError):
+            for error in errors:
+                if isinstance(error, error_type):
+                    raise error
+        raise SimulationParseError("Every date simulation failed")
+    
+    ranked.sort(key=lambda item: score_of(item[1]), reverse=True)
+    
+    # The best match fills the top-level fields so existing clients keep working
+    best_simulation_data = copy.deepcopy(ranked[0][1])
+    best_simulation_data['meta']['ranked_matches'] = [
+        {
+            "rank": rank,
+            "candidate_name": candidate['name'],
+            "score": simulation_data.get('score'),
+            "summary": simulation_data.get('summary', ''),
+            "meta": simulation_data['meta']
+        }
+        for rank, (candidate, simulation_data) in enumerate(ranked, start=1)
+    ]
+    return best_simulation_data
+
+def match_profile(user_partner_profile, model_id, selection_mode, use_cache, top_k=1, deadline=None):
+    """Select a candidate for one user profile and simulate their date, using the cache."""
+    
+    user_partner_profile = budget_profile(user_partner_profile)
+    if top_k > 1:
+        return match_profile_top_k(
+            user_partner_profile=user_partner_profile,
+            model_id=model_id,
+            top_k=top_k,
+            use_cache=use_cache,
+            deadline=deadline if deadline is not None else time.monotonic() + TOP_K_DEADLINE_SECONDS
+        )
+    
+    if selection_mode == 'fused':
+        return match_profile_fused(user_partner_profile, model_id, use_cache)
+    
+    # ==========================================
+    # SELECT COMPATIBLE CANDIDATE PROFILE
+    # ==========================================
+    candidate_model_profile = select_candidate_cached(user_partner_profile, model_id, selection_mode, use_cache)
+    
+    # ==========================================
+    # MODEL 2: SIMULATE THE DATE
+    # ==========================================
+    return simulate_date_cached(user_partner_profile, candidate_model_profile, model_id, use_cache)
+
+def stream_date_simulation(user_profile, candidate_profile, bedrock_client, model_id):
+    """Simulate a date with converse_stream, yielding events as fields complete.
+    
+    Yields {"event": "score"}, {"event": "compatibility_factors"} and
+    {"event": "potential_concerns"} as soon as each value is fully generated,
+    {"event": "summary_delta", "text": ...} while the summary is being written,
+    and finally {"event": "result", "result": <same payload as simulate_date>}.
+    
+    Output cut off mid-stream is repaired locally and any missing required fields
+    are fetched with one non-streamed re-request before the result event.
+    """
+    m2_system, m2_messages = build_simulation_request(user_profile, candidate_profile)
+    
+    response = bedrock_client.converse_stream(
+        kind="simulation",
+        modelId=model_id,
+        messages=m2_messages,
+        system=m2_system,
+        inferenceConfig={
+            "maxTokens": 1000,
+            "temperature": 0.7
+        },
+        toolConfig=SIMULATION_TOOL_CONFIG
+    )
+    
+    parser = IncrementalJSONParser(stream_paths=[('summary',)])
+    for stream_event in response['stream']:
+        if 'metadata' in stream_event:
+            metrics.record_usage(stream_event['metadata'].get('usage'))
+        delta = stream_event.get('contentBlockDelta', {}).get('delta', {})
+        # Tool input arrives as JSON text in toolUse deltas
+        text = delta.get('text') or delta.get('toolUse', {}).get('input')
+        if not text or parser is None:
+            continue
+        try:
+            for kind, path, value in parser.feed(text):
+                if kind == 'delta':
+                    yield {"event": "summary_delta", "text": value}
+                elif path in STREAMED_FIELDS:
+                    yield {"event": STREAMED_FIELDS[path], STREAMED_FIELDS[path]: value}
+        except ValueError as parse_error:
+            # Keep draining the stream for its usage metadata; fields are re-requested below
+            print(f"⚠️ Failed to parse streamed AI response: {str(parse_error)}")
+            parser = None
+    
+    simulation_data = {}
+    if parser is not None:
+        try:
+            simulation_data = normalize_simulation(*parser.close())
+            if not parser.done:
+                metrics.increment('json_repairs')
+        except ValueError:
+            pass
+    missing = missing_fields(simulation_data)
+    simulation_data = complete_simulation_data(simulation_data, user_profile, candidate_profile, bedrock_client, model_id)
+    # Fields still missing after the re-request get their defaults, as in simulate_date
+    final_simulation_data = finalize_simulation_data(simulation_data, candidate_profile)
+    for path in missing:
+        if path in STREAMED_FIELDS:
+            value = final_simulation_data['meta'][path[-1]] if len(path) > 1 else final_simulation_data[path[0]]
+            yield {"event": STREAMED_FIELDS[path], STREAMED_FIELDS[path]: value}
+    
+    yield {"event": "result", "result": final_simulation_data}
+
+def stream_match(user_partner_profile, model_id, selection_mode, use_cache):
+    """Streaming counterpart of match_profile: selection first, then a streamed simulation.
+    
+    Fused mode streams through the two-call path, since the candidate has to be known
+    before its simulation starts.
+    """
+    
+    user_partner_profile = budget_profile(user_partner_profile)
+    candidate_model_profile = select_candidate_cached(user_partner_profile, model_id, selection_mode, use_cache)
+    yield {"event": "candidate", "candidate_profile": candidate_model_profile}
+    
+    simulation_key = cache_key('simulation', model_id, PROMPT_VERSION, user_partner_profile, candidate_model_profile)
+    cached_simulation_data = RESULT_CACHE.get(simulation_key) if use_cache else None
+    if use_cache:
+        metrics.increment('cache_hits' if cached_simulation_data is not None else 'cache_misses')
+    if cached_simulation_data is not None:
+        log_debug(f"⚡ Reusing cached date simulation")
+        yield {"event": "result", "result": cached_simulation_data}
+        return
+    
+    for event in stream_date_simulation(user_partner_profile, candidate_model_profile, get_model_client(), model_id):
+        if event['event'] == 'result' and use_cache:
+            RESULT_CACHE.set(simulation_key, event['result'])
+        yield event
+
+def is_valid_profile(user_partner_profile):
+    """Profiles must be non-empty strings with some meaningful content."""
+    # Lower threshold to 10 characters to be more lenient
+    return isinstance(user_partner_profile, str) and len(user_partner_profile.strip()) >= 10
+
+def match_profile_item(user_partner_profile, model_id, selection_mode, use_cache, top_k=1, deadline=None):
+    """Match one profile of a batch; failures become {"success": False, "error": ...}."""
+    if not is_valid_profile(user_partner_profile):
+        return {"success": False, "error": "Profile is empty or too short."}
+    try:
+        result = match_profile(
+            user_partner_profile=user_partner_profile,
+            model_id=model_id,
+            selection_mode=selection_mode,
+            use_cache=use_cache,
+            top_k=top_k,
+            deadline=deadline
+        )
+        return {"success": True, "result": result}
+    except SimulationParseError:
+        return {"success": False, "error": "Failed to parse AI response. Please try again."}
+    except TimeoutError:
+        return {"success": False, "error": "Date simulation timed out. Please try again."}
+    except ModelUnavailableError:
+        return {"success": False, "error": "The matchmaking service is busy. Please try again shortly."}
     except Exception as e:
-        print(f"⚠️ Error selecting candidate with AI: {str(e)}")
-        print(f"⚠️ Falling back to first candidate")
-        selected = DEMO_CANDIDATE_PROFILES[0]
-        print(f"🎭 Using fallback candidate: {selected['name']}")
-        return selected['profile'] 
+        print(f"⚠️ Matching a profile failed: {str(e)}")
+        return {"success": False, "error": f"Internal server error: {str(e)[:500]}"}
+
+def match_profiles_batch(user_partner_profiles, model_id, selection_mode, use_cache, max_concurrency, top_k=1, deadline=None):
+    """Match many profiles concurrently; each item succeeds or fails on its own.
+    
+    At most max_concurrency model calls run at once across the whole batch: items
+    run on that many threads, and top-K items share that many simulation slots.
+    """
+    
+    def run_item(index, user_partner_profile):
+        return dict(
+            {"index": index},
+            **match_profile_item(user_partner_profile, model_id, selection_mode, use_cache, top_k, deadline)
+        )
+    
+    workers = max(1, min(max_concurrency, len(user_partner_profiles)))
+    # Items copy this context when submitted, so they all see the same slots
+    slots_token = _model_call_slots.set(threading.BoundedSemaphore(workers) if top_k > 1 else None)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                metrics.submit_with_context(executor, run_item, index, user_partner_profile)
+                for index, user_partner_profile in enumerate(user_partner_profiles)
+            ]
+            # Results stay in request order regardless of completion order
+            return [future.result() for future in futures]
+    finally:
+        _model_call_slots.reset(slots_token)
+
+_job_store = None
+_job_store_lock = threading.Lock()
+
+def get_job_store():
+    """Return the async job store, opening it on first use."""
+    global _job_store
+    if _job_store is None:
+        with _job_store_lock:
+            if _job_store is None:
+                from job_queue import SQLiteJobStore
+                _job_store = SQLiteJobStore(
+                    JOB_STORE_PATH,
+                    # A job still running well past its timeout lost its worker
+                    lease_seconds=JOB_TIMEOUT_SECONDS * 2,
+                    result_ttl_seconds=JOB_RESULT_TTL_SECONDS
+                )
+    return _job_store
+
+def async_jobs_disabled():
+    """400 response for job requests when no worker drains the job store."""
+    return {
+        "statusCode": 400,
+        "headers": {"Content-Type": "application/json"},
+        "body": json.dumps({"success": False, "error": "Async jobs are not enabled on this deployment."})
+    }
+
+def submit_job(body):
+    """Queue a validated request body and return the 202 response with its job ID.
+    
+    An identical request that is still queued or running is not queued again; its
+    job ID is returned instead.
+    """
+    if not ASYNC_JOBS:
+        return async_jobs_disabled()
+    request = {key: value for key, value in body.items() if key != 'async'}
+    dedupe_key = cache_key('job', MODEL_ID, PROMPT_VERSION, json.dumps(request, sort_keys=True, ensure_ascii=False))
+    metrics.set_property('Mode', 'job_submit')
+    job_id, deduplicated = get_job_store().submit(request, dedupe_key)
+    metrics.increment('jobs_deduplicated' if deduplicated else 'jobs_submitted')
+    log_debug(f"📥 {'Joined in-flight' if deduplicated else 'Queued'} job {job_id}")
+    return {
+        "statusCode": 202,
+        "headers": {
+            "Content-Type": "application/json"
+        },
+        "body": json.dumps({"success": True, "job_id": job_id, "status": "queued", "deduplicated": deduplicated})
+    }
+
+def job_status(job_id):
+    """Response for a job status poll: the status, plus the result once finished."""
+    if not ASYNC_JOBS:
+        return async_jobs_disabled()
+    job = get_job_store().get(job_id) if isinstance(job_id, str) else None
+    if job is None:
+        return {
+            "statusCode": 404,
+            "headers": {"Content-Type": "application/json"},
+            "body": json.dumps({"success": False, "error": "Unknown or expired job_id."})
+        }
+    job['success'] = job['status'] != 'failed'
+    return {
+        "statusCode": 200,
+        "headers": {
+            "Content-Type": "application/json"
+        },
+        "body": json.dumps(job, ensure_ascii=False)
+    }
+
+class JobContext:
+    """Stands in for the Lambda context so a job's model calls share its timeout.
+    
+    top_k_deadline_seconds replaces TOP_K_DEADLINE_SECONDS for top-K requests.
+    """
+    
+    def __init__(self, timeout_seconds, top_k_deadline_seconds=None):
+        self._deadline = time.monotonic() + timeout_seconds
+        self.top_k_deadline_seconds = top_k_deadline_seconds
+    
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+def run_job(request):
+    """Run a queued request body through the handler; returns (status_code, result)."""
+    # A job's top-K simulations may use its whole timeout
+    context = JobContext(JOB_TIMEOUT_SECONDS, top_k_deadline_seconds=JOB_TIMEOUT_SECONDS)
+    response = lambda_handler({'body': request}, context)
+    return response['statusCode'], json.loads(response['body'])
+
+def start_job_workers(workers):
+    """Start job worker threads in this process and accept "async": true requests."""
+    global ASYNC_JOBS
+    from job_queue import JobWorker
+    worker = JobWorker(get_job_store(), run_job, workers=workers).start()
+    ASYNC_JOBS = True
+    return worker
+
+# ==========================================
+# ROUTING
+# ==========================================
+# Every response carries these; set CORS_ALLOW_ORIGIN to the frontend's origin in production
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": os.environ.get('CORS_ALLOW_ORIGIN', '*'),
+    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type",
+}
+# Browsers reuse a preflight answer for this long instead of repeating it before
+# every POST (Chromium caps it at 7200 seconds, Firefox at 86400)
+CORS_MAX_AGE_SECONDS = int(os.environ.get('CORS_MAX_AGE_SECONDS', '7200'))
+
+# A warm-up ping also sends one tiny model request, so the TLS connection to
+# Bedrock is open before the first real request; set to false to skip it
+WARMUP_MODEL_CALL = os.environ.get('WARMUP_MODEL_CALL', 'true').lower() != 'false'
+
+def request_method(event):
+    """HTTP method of an API Gateway (REST or HTTP API) or function URL event, if any."""
+    method = event.get('httpMethod') or (event.get('requestContext') or {}).get('http', {}).get('method')
+    return method.upper() if isinstance(method, str) else None
+
+def is_warmup_event(event):
+    """EventBridge schedules (keep-warm rules) and direct {"warmup": true} invocations."""
+    return event.get('source') == 'aws.events' or event.get('warmup') is True
+
+def route_event(event):
+    """Which handler serves an event: "preflight", "health", "warmup" or "match"."""
+    if is_warmup_event(event):
+        return 'warmup'
+    method = request_method(event)
+    if method == 'OPTIONS':
+        return 'preflight'
+    path = event.get('rawPath') or event.get('path') or ''
+    if method in ('GET', 'HEAD') and path.rstrip('/').endswith('/health'):
+        return 'health'
+    return 'match'
+
+def handle_preflight(event, context):
+    """Answer a CORS preflight without touching the model or the request body."""
+    return {
+        "statusCode": 204,
+        "headers": {"Access-Control-Max-Age": str(CORS_MAX_AGE_SECONDS)},
+        "body": ""
+    }
+
+def handle_health(event, context):
+    """Liveness check; reports what is initialized without initializing anything."""
+    health = {"status": "ok", "model_client_ready": _model_client is not None}
+    breaker = getattr(_model_client, 'breaker', None) if _model_client is not None else None
+    if breaker is not None:
+        health["circuit"] = breaker.state
+    return {
+        "statusCode": 200,
+        "headers": {"Content-Type": "application/json", "Cache-Control": "no-store"},
+        "body": json.dumps(health)
+    }
+
+def handle_warmup(event, context):
+    """Create the model client and load the candidate indexes ahead of real traffic."""
+    client = get_model_client()
+    get_candidate_index()
+    if ATTRIBUTE_FILTER_ENABLED:
+        get_attribute_index()
+    get_near_duplicate_index()
+    purge_expired_entries(force=True)
+    connected = False
+    if WARMUP_MODEL_CALL:
+        # Straight to the backend: a one-token ping must not count towards retries,
+        # the circuit breaker or the hedging latency samples
+        backend = getattr(client, 'client', client)
+        try:
+            with metrics.timed('warmup_call'):
+                backend.converse(
+                    modelId=MODEL_ID,
+                    messages=[{"role": "user", "content": [{"text": "ping"}]}],
+                    inferenceConfig={"maxTokens": 1}
+                )
+            connected = True
+        except Exception as e:
+            print(f"⚠️ Warm-up model call failed: {str(e)[:200]}")
+    print(f"🔥 Warmed up (model connection {'open' if connected else 'not opened'})")
+    return {
+        "statusCode": 200,
+        "headers": {"Content-Type": "application/json"},
+        "body": json.dumps({"status": "warm", "model_connected": connected, "startup_ms": STARTUP_TIMINGS})
+    }
+
+ROUTES = {
+    'preflight': handle_preflight,
+    'health': handle_health,
+    'warmup': handle_warmup,
+    # handle_request is defined below
+    'match': lambda event, context: handle_request(event, context),
+}
+
+def with_cors_headers(response):
+    """Add the configured CORS headers; they replace any a handler set itself."""
+    response['headers'] = dict(response.get('headers') or {}, **CORS_HEADERS)
+    return response
+
+# Everything above runs once per container
+STARTUP_TIMINGS['module_init'] = round((time.perf_counter() - _MODULE_LOAD_STARTED) * 1000, 3)
 
 def lambda_handler(event, context):
+    """Entry point: route the request and emit one structured metrics record for it.
+    
+    Preflights and health checks never touch the model client, and neither do
+    requests that fail validation in handle_request.
+    """
+    report_cold_start()
+    route = route_event(event)
+    request_metrics, metrics_token = metrics.start_request('single' if route == 'match' else route)
+    status_code = 500
+    try:
+        response = with_cors_headers(ROUTES[route](event, context))
+        status_code = response.get('statusCode', 500)
+        return response
+    finally:
+        metrics.finish_request(request_metrics, metrics_token, status_code)
+
+def handle_request(event, context):
+    parse_started = time.perf_counter()
     try:
         # 1. Extract the single profile from the frontend payload
         # Handle cases where body might be None, empty, or not a string
@@ -142,7 +1462,7 @@ def lambda_handler(event, context):
                 body = json.loads(event_body)
             except json.JSONDecodeError as e:
                 print(f"Failed to parse body as JSON: {e}")
-                print(f"Body received: {event_body[:500]}")  # Log first 500 chars
+                log_debug(lambda: f"Body received: {event_body[:500]}")  # Log first 500 chars
                 return {
                     "statusCode": 400,
                     "headers": {"Content-Type": "application/json"},
@@ -151,142 +1471,183 @@ def lambda_handler(event, context):
         else:
             body = event_body
         
-        # Extract user_partner_profile
-        user_partner_profile = body.get('user_partner_profile', '') if isinstance(body, dict) else ''
-        
-        # Log what we received for debugging
-        print(f"Event body type: {type(event_body)}")
-        print(f"Parsed body type: {type(body)}")
-        print(f"Body keys: {list(body.keys()) if isinstance(body, dict) else 'Not a dict'}")
-        print(f"user_partner_profile length: {len(user_partner_profile) if user_partner_profile else 0}")
-        print(f"user_partner_profile (first 200 chars): {user_partner_profile[:200] if user_partner_profile else 'EMPTY'}")
-        print(f"user_partner_profile (full): {user_partner_profile if user_partner_profile else 'EMPTY'}")
-        
-        # Validate profile is not empty and has meaningful content
-        # Lower threshold to 10 characters to be more lenient
-        if not user_partner_profile or len(user_partner_profile.strip()) < 10:
-            print(f"❌ Profile validation failed: length={len(user_partner_profile) if user_partner_profile else 0}")
-            print(f"❌ Profile preview: {user_partner_profile[:200] if user_partner_profile else 'EMPTY'}")
+        if not isinstance(body, dict):
+            body = {}
+
+        # Polling for the status or result of an async job
+        if 'job_id' in body:
+            metrics.set_property('Mode', 'job_status')
+            return job_status(body['job_id'])
+
+        selection_mode = body.get('selection_mode') or DEFAULT_SELECTION_MODE
+        if selection_mode not in SELECTION_MODES:
             return {
                 "statusCode": 400,
                 "headers": {"Content-Type": "application/json"},
                 "body": json.dumps({
                     "success": False,
-                    "error": "Please provide more information. Fill out more form fields or speak longer during the voice conversation."
+                    "error": f"Invalid selection_mode. Expected one of: {', '.join(SELECTION_MODES)}."
                 })
             }
 
-        # Use the cross-region Inference Profile ID for Claude 4.5 Haiku
-        model_id = "us.anthropic.claude-haiku-4-5-20251001-v1:0"
-
-        # ==========================================
-        # SELECT COMPATIBLE CANDIDATE PROFILE
-        # ==========================================
-        # Use AI to analyze the user's profile and select the most compatible
-        # candidate from our curated list of demo profiles
-        print(f"\n🔍 Analyzing user profile for compatibility matching...")
-        candidate_model_profile = get_compatible_candidate_profile(
-            user_profile=user_partner_profile,
-            bedrock_client=bedrock_client,
-            model_id=model_id
-        )
-        
-        # Debug: Log the selected candidate profile
-        print(f"\n🎭 Selected candidate profile (first 200 chars): {candidate_model_profile[:200]}")
-        print(f"🎭 Selected candidate profile (full length): {len(candidate_model_profile)} characters")
-
-
-        # ==========================================
-        # MODEL 2: SIMULATE THE DATE
-        # ==========================================
-        m2_system_prompt = """You are an AI Date Simulator running a matchmaking simulation. 
-Your task is to take a user's ideal partner profile and a candidate AI model's profile, and simulate a first date between them. 
-Analyze their compatibility, simulate their conversation and chemistry, and output the result.
-
-IMPORTANT: Both profiles will be provided below. Use ALL the information from both profiles to create a realistic date simulation.
-
-You must respond strictly in JSON format with the following structure:
-{
-  "score": <integer from 1 to 100>,
-  "summary": "<2-3 paragraph summary of the date>",
-  "meta": {
-    "compatibility_factors": {
-      "shared_interests": "<comma-separated list of shared interests>",
-      "humor_alignment": "<description of how well their humor styles match>",
-      "lifestyle_match": "<description of lifestyle compatibility>",
-      "conversation_ease": "<description of how easily they conversed>"
-    },
-    "potential_concerns": "<any concerns or friction points, or empty string if none>"
-  }
-}
-
-The compatibility_factors should be brief, descriptive strings. The summary should be detailed and engaging. Base your analysis on the actual profile information provided."""
+        # Callers can opt out of cached results, e.g. to force a fresh simulation
+        no_cache = body.get('no_cache', False)
+        if not isinstance(no_cache, bool):
+            return {
+                "statusCode": 400,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps({
+                    "success": False,
+                    "error": "Invalid no_cache. Expected true or false."
+                })
+            }
+        use_cache = no_cache is not True
 
-        m2_user_prompt = f"""
-Here are the profiles for the date simulation:
+        # top_k > 1 simulates dates with several candidates in parallel and ranks them
+        try:
+            top_k = int(body.get('top_k', 1))
+        except (TypeError, ValueError):
+            top_k = 0
+        if not 1 <= top_k <= TOP_K_MAX:
+            return {
+                "statusCode": 400,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps({"success": False, "error": f"top_k must be an integer from 1 to {TOP_K_MAX}."})
+            }
 
-User's Profile:
-{user_partner_profile}
+        # Model calls (and their retries) never run past the Lambda timeout, less
+        # enough time to respond; top-K simulations share a tighter deadline
+        request_deadline = None
+        if hasattr(context, 'get_remaining_time_in_millis'):
+            remaining_seconds = context.get_remaining_time_in_millis() / 1000.0 - RESPONSE_MARGIN_SECONDS
+            request_deadline = time.monotonic() + max(0.0, remaining_seconds)
+        top_k_deadline_seconds = getattr(context, 'top_k_deadline_seconds', None) or TOP_K_DEADLINE_SECONDS
+        deadline = time.monotonic() + top_k_deadline_seconds
+        if request_deadline is not None:
+            deadline = min(deadline, request_deadline)
 
-Candidate Profile:
-{candidate_model_profile}
+        model_id = MODEL_ID
 
-Simulate the date and return the JSON response."""
-        
-        # Debug: Log what we're sending to Model 2
-        print(f"\n📤 Model 2 Prompt (first 500 chars): {m2_user_prompt[:500]}")
-        print(f"📤 Model 2 Prompt (full length): {len(m2_user_prompt)} characters")
-        print(f"📤 Candidate profile length: {len(candidate_model_profile)} characters")
+        metrics.set_property('selection_mode', selection_mode)
+        metrics.set_property('top_k', top_k)
 
-        m2_response = bedrock_client.converse(
-            modelId=model_id,
-            messages=[{"role": "user", "content": [{"text": m2_user_prompt}]}],
-            system=[{"text": m2_system_prompt}],
-            inferenceConfig={
-                "maxTokens": 1000,
-                "temperature": 0.7 
+        # Batch requests carry a list of profiles and get per-item results back
+        if 'user_partner_profiles' in body:
+            metrics.add_stage('parse_body', time.perf_counter() - parse_started)
+            metrics.set_property('Mode', 'batch')
+            user_partner_profiles = body['user_partner_profiles']
+            if not isinstance(user_partner_profiles, list) or not user_partner_profiles:
+                return {
+                    "statusCode": 400,
+                    "headers": {"Content-Type": "application/json"},
+                    "body": json.dumps({"success": False, "error": "user_partner_profiles must be a non-empty list."})
+                }
+            if len(user_partner_profiles) > BATCH_MAX_SIZE:
+                return {
+                    "statusCode": 400,
+                    "headers": {"Content-Type": "application/json"},
+                    "body": json.dumps({"success": False, "error": f"Batches are limited to {BATCH_MAX_SIZE} profiles."})
+                }
+            
+            # Callers may lower the concurrency cap but never raise it past the throttling budget
+            try:
+                max_concurrency = min(int(body.get('max_concurrency', BEDROCK_MAX_CONCURRENCY)), BEDROCK_MAX_CONCURRENCY)
+            except (TypeError, ValueError):
+                max_concurrency = BEDROCK_MAX_CONCURRENCY
+            
+            if body.get('async'):
+                return submit_job(body)
+            purge_expired_entries()
+            
+            log_debug(f"📦 Matching batch of {len(user_partner_profiles)} profiles with concurrency {max_concurrency}")
+            with deadline_scope(request_deadline):
+                results = match_profiles_batch(
+                    user_partner_profiles=user_partner_profiles,
+                    model_id=model_id,
+                    selection_mode=selection_mode,
+                    use_cache=use_cache,
+                    max_concurrency=max_concurrency,
+                    top_k=top_k,
+                    deadline=deadline
+                )
+            succeeded = sum(1 for item in results if item['success'])
+            log_debug(lambda: f"📊 Result cache stats: {RESULT_CACHE.stats()}")
+            return {
+                "statusCode": 200,
+                "headers": {
+                    "Content-Type": "application/json"
+                },
+                "body": json.dumps({
+                    "success": True,
+                    "succeeded": succeeded,
+                    "failed": len(results) - succeeded,
+                    "results": results
+                }, ensure_ascii=False)
             }
-        )
-        
-        # Extract and clean Model 2's JSON response
-        response_text = m2_response['output']['message']['content'][0]['text']
-        response_text = response_text.replace('```json', '').replace('```', '').strip()
-        
-        # Try to extract just the JSON part (handle cases where AI adds extra text)
-        # Find the first { and last } to extract valid JSON
-        first_brace = response_text.find('{')
-        last_brace = response_text.rfind('}')
+
+        # Extract user_partner_profile
+        user_partner_profile = body.get('user_partner_profile', '')
         
-        if first_brace != -1 and last_brace != -1 and last_brace > first_brace:
-            response_text = response_text[first_brace:last_brace + 1]
+        # Log what we received for debugging
+        log_debug(f"Event body type: {type(event_body)}")
+        log_debug(f"Parsed body type: {type(body)}")
+        log_debug(f"Body keys: {list(body.keys()) if isinstance(body, dict) else 'Not a dict'}")
+        log_debug(f"user_partner_profile length: {len(user_partner_profile) if user_partner_profile else 0}")
+        log_debug(lambda: f"user_partner_profile (first 200 chars): {user_partner_profile[:200] if user_partner_profile else 'EMPTY'}")
+        log_debug(lambda: f"user_partner_profile (full): {user_partner_profile if user_partner_profile else 'EMPTY'}")
         
-        # Parse the JSON so we can inject the generated profile into the final return payload
+        # Validate profile is not empty and has meaningful content
+        if not is_valid_profile(user_partner_profile):
+            print(f"❌ Profile validation failed: length={len(user_partner_profile) if user_partner_profile else 0}")
+            log_debug(lambda: f"❌ Profile preview: {user_partner_profile[:200] if user_partner_profile else 'EMPTY'}")
+            return {
+                "statusCode": 400,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps({
+                    "success": False,
+                    "error": "Please provide more information. Fill out more form fields or speak longer during the voice conversation."
+                })
+            }
+
+        metrics.add_stage('parse_body', time.perf_counter() - parse_started)
+        metrics.set_property('Mode', 'top_k' if top_k > 1 else 'single')
+        if body.get('async'):
+            return submit_job(body)
+        purge_expired_entries()
+        log_debug(f"🔍 Analyzing user profile for compatibility matching...")
         try:
-            final_simulation_data = json.loads(response_text)
-        except json.JSONDecodeError as json_error:
-            # If JSON parsing fails, log the error and return a helpful error message
-            error_msg = f"Failed to parse AI response as JSON: {str(json_error)}. Response text (first 500 chars): {response_text[:500]}"
-            print(error_msg)
+            with deadline_scope(request_deadline):
+                final_simulation_data = match_profile(
+                    user_partner_profile=user_partner_profile,
+                    model_id=model_id,
+                    selection_mode=selection_mode,
+                    use_cache=use_cache,
+                    top_k=top_k,
+                    deadline=deadline
+                )
+        except SimulationParseError:
             return {
                 "statusCode": 500,
                 "headers": {"Content-Type": "application/json"},
                 "body": json.dumps({"success": False, "error": "Failed to parse AI response. Please try again."})
             }
-        
-        # Ensure meta structure exists
-        if 'meta' not in final_simulation_data:
-            final_simulation_data['meta'] = {}
-        
-        # Add candidate_profile to meta
-        final_simulation_data['meta']['candidate_profile'] = candidate_model_profile
-        
-        # Ensure compatibility_factors exists
-        if 'compatibility_factors' not in final_simulation_data['meta']:
-            final_simulation_data['meta']['compatibility_factors'] = {}
-        
-        # Ensure potential_concerns exists
-        if 'potential_concerns' not in final_simulation_data['meta']:
-            final_simulation_data['meta']['potential_concerns'] = ""
+        except TimeoutError:
+            return {
+                "statusCode": 504,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps({"success": False, "error": "Date simulation timed out. Please try again."})
+            }
+        except ModelUnavailableError as unavailable:
+            # Fail fast while Bedrock is throttling or the circuit is open
+            return {
+                "statusCode": 503,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Retry-After": str(max(1, int(round(unavailable.retry_after or 1))))
+                },
+                "body": json.dumps({"success": False, "error": "The matchmaking service is busy. Please try again shortly."})
+            }
+        log_debug(lambda: f"📊 Result cache stats: {RESULT_CACHE.stats()}")
 
         # Return the combined data back to the frontend
         # Ensure the body is clean JSON with no extra data
@@ -295,8 +1656,7 @@ Simulate the date and return the JSON response."""
         return {
             "statusCode": 200,
             "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*"
+                "Content-Type": "application/json"
             },
             "body": response_body
         }
@@ -0,0 +1,170 @@
+"""
+Local HTTP adapter for the Lambda handler, with a streaming endpoint.
+
+The Python Lambda runtime cannot stream responses, so streamed simulations are
+served from here (or any container running it):
+
+    python local_server.py --port 8080
+
+    POST /          same contract as the API Gateway endpoint (lambda_handler)
+    POST /stream    same request body; the response is chunked NDJSON, one event
+                    per line: candidate, score, compatibility_factors,
+                    potential_concerns, summary_delta..., then result (or error)
+    POST /jobs      same request body, queued as an async job; returns 202 and a job_id
+    GET /jobs/<id>  the job's status, and its result once finished
+    GET /health     liveness check; never touches the model client
+
+Async jobs are run by --job-workers worker threads in this process.
+"""
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import lambda_function
+import metrics
+
+
+class LambdaRequestHandler(BaseHTTPRequestHandler):
+    # Chunked transfer encoding needs HTTP/1.1
+    protocol_version = 'HTTP/1.1'
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length).decode('utf-8') if length else ''
+
+    def _send_lambda_response(self, result):
+        body = (result.get('body') or '').encode('utf-8')
+        self.send_response(result.get('statusCode', 200))
+        for name, value in (result.get('headers') or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _invoke(self, method):
+        event = {'httpMethod': method, 'path': self.path, 'body': self._read_body()}
+        self._send_lambda_response(lambda_function.lambda_handler(event, None))
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self):
+        raw_body = self._read_body()
+        try:
+            body = json.loads(raw_body or '{}')
+        except json.JSONDecodeError:
+            body = None
+        if not isinstance(body, dict):
+            body = {}
+
+        user_partner_profile = body.get('user_partner_profile', '')
+        selection_mode = body.get('selection_mode') or lambda_function.DEFAULT_SELECTION_MODE
+        no_cache = body.get('no_cache', False)
+        if (not lambda_function.is_valid_profile(user_partner_profile)
+                or selection_mode not in lambda_function.SELECTION_MODES
+                or not isinstance(no_cache, bool)):
+            # Same validation errors as the non-streaming endpoint
+            self._send_lambda_response(lambda_function.lambda_handler({'httpMethod': 'POST', 'body': raw_body}, None))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        for name, value in lambda_function.CORS_HEADERS.items():
+            self.send_header(name, value)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        request_metrics, metrics_token = metrics.start_request('stream')
+        status = 200
+        events = lambda_function.stream_match(
+            user_partner_profile=user_partner_profile,
+            model_id=lambda_function.MODEL_ID,
+            selection_mode=selection_mode,
+            use_cache=no_cache is not True
+        )
+        try:
+            for event in events:
+                self._write_chunk((json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8'))
+        except lambda_function.SimulationParseError:
+            status = 500
+            self._write_chunk(b'{"event": "error", "error": "Failed to parse AI response. Please try again."}\n')
+        except lambda_function.ModelUnavailableError:
+            status = 503
+            self._write_chunk(b'{"event": "error", "error": "The matchmaking service is busy. Please try again shortly."}\n')
+        except TimeoutError:
+            status = 504
+            self._write_chunk(b'{"event": "error", "error": "Date simulation timed out. Please try again."}\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away; stop generating
+            status = 499
+            return
+        except Exception as e:
+            status = 500
+            print(f"Error occurred during streaming: {str(e)}")
+            self._write_chunk((json.dumps({"event": "error", "error": f"Internal server error: {str(e)[:500]}"}) + '\n').encode('utf-8'))
+        finally:
+            metrics.finish_request(request_metrics, metrics_token, status)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _submit_job(self):
+        raw_body = self._read_body()
+        try:
+            body = json.loads(raw_body or '{}')
+        except json.JSONDecodeError:
+            body = None
+        if isinstance(body, dict):
+            body['async'] = True
+            raw_body = json.dumps(body)
+        # Anything else fails validation in the handler, as on the synchronous endpoint
+        self._send_lambda_response(lambda_function.lambda_handler({'httpMethod': 'POST', 'body': raw_body}, None))
+
+    def do_POST(self):
+        path = self.path.rstrip('/')
+        if path.endswith('/stream'):
+            self._stream()
+        elif path.endswith('/jobs'):
+            self._submit_job()
+        else:
+            self._invoke('POST')
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/health'):
+            self._invoke('GET')
+            return
+        _, separator, job_id = self.path.rstrip('/').rpartition('/jobs/')
+        if not separator or not job_id:
+            self._send_lambda_response({'statusCode': 404, 'body': json.dumps({"success": False, "error": "Not found."})})
+            return
+        event = {'httpMethod': 'GET', 'path': self.path, 'body': json.dumps({"job_id": job_id})}
+        self._send_lambda_response(lambda_function.lambda_handler(event, None))
+
+    def do_OPTIONS(self):
+        self._invoke('OPTIONS')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve lambda_handler over local HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--job-workers', type=int, default=2, help="threads running async jobs (0 to disable)")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), LambdaRequestHandler)
+    worker = None
+    if args.job_workers > 0:
+        worker = lambda_function.start_job_workers(args.job_workers)
+    print(f"🚀 Serving lambda_handler on http://{args.host}:{args.port} (streaming at /stream, jobs at /jobs)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if worker is not None:
+            worker.stop()
+
+
+if __name__ == "__main__":
+    main()
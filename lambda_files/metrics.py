@@ -0,0 +1,153 @@
+"""
+Per-request instrumentation for the matchmaking handler.
+
+Each request gets a RequestMetrics record holding stage timings, model token usage
+and counters. Code anywhere below the handler records into the current request via
+the module-level helpers (timed, record_usage, increment), including from worker
+threads started with submit_with_context. When the request finishes, the record is
+emitted as a single CloudWatch Embedded Metric Format (EMF) log line.
+
+Verbose per-request logging goes through log_debug and only prints when
+LOG_LEVEL=DEBUG.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+DEBUG_ENABLED = LOG_LEVEL == 'DEBUG'
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'PinkKnights/Matchmaking')
+
+# Converse usage fields, reported under snake_case names
+USAGE_FIELDS = {
+    'inputTokens': 'input_tokens',
+    'outputTokens': 'output_tokens',
+    'cacheReadInputTokens': 'cache_read_input_tokens',
+    'cacheWriteInputTokens': 'cache_write_input_tokens',
+}
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def log_debug(message):
+    """Print only when LOG_LEVEL=DEBUG; pass a lambda to skip building costly messages."""
+    if DEBUG_ENABLED:
+        print(message() if callable(message) else message)
+
+
+class RequestMetrics:
+    """Stage timings (ms), token usage and counters for one request."""
+
+    def __init__(self, mode='single'):
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.usage = {name: 0 for name in USAGE_FIELDS.values()}
+        self.counters = {}
+        self.properties = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds):
+        # Stages that run more than once (or concurrently) accumulate
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds * 1000
+
+    def record_usage(self, usage):
+        with self._lock:
+            self.counters['model_calls'] = self.counters.get('model_calls', 0) + 1
+            for field, name in USAGE_FIELDS.items():
+                self.usage[name] += int(usage.get(field) or 0)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def to_emf(self, status_code):
+        """Build the EMF record: metric values at the top level, declared under _aws."""
+        values = {f"{name}_ms": round(ms, 3) for name, ms in self.stages.items()}
+        values['total_ms'] = round((time.perf_counter() - self.started) * 1000, 3)
+        values.update(self.usage)
+        values.update(self.counters)
+
+        metric_definitions = [
+            {"Name": name, "Unit": "Milliseconds" if name.endswith('_ms') else "Count"}
+            for name in values
+        ]
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [["Mode"]],
+                    "Metrics": metric_definitions
+                }]
+            },
+            "Mode": self.mode,
+            "status_code": status_code,
+        }
+        record.update(self.properties)
+        record.update(values)
+        return record
+
+
+def start_request(mode='single'):
+    """Begin collecting metrics for a request in the current context."""
+    metrics = RequestMetrics(mode)
+    return metrics, _current.set(metrics)
+
+
+def finish_request(metrics, token, status_code, emit=True):
+    """Emit the request's single EMF line (unless emit is False) and detach it from the context."""
+    _current.reset(token)
+    if emit:
+        print(json.dumps(metrics.to_emf(status_code), separators=(',', ':')))
+
+
+@contextmanager
+def timed(stage):
+    """Time a block into the current request's stage timings."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.add_stage(stage, time.perf_counter() - started)
+
+
+def record_usage(response_or_usage):
+    """Add a converse response's (or a stream metadata event's) token usage."""
+    metrics = _current.get()
+    if metrics is None or not response_or_usage:
+        return
+    usage = response_or_usage.get('usage', response_or_usage)
+    metrics.record_usage(usage)
+
+
+def add_stage(name, seconds):
+    """Record a stage timed by the caller."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_stage(name, seconds)
+
+
+def increment(name, amount=1):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.increment(name, amount)
+
+
+def set_property(name, value):
+    """Attach a non-metric field (e.g. selection mode) to the request record."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.properties[name] = value
+
+
+def submit_with_context(executor, fn, *args, **kwargs):
+    """executor.submit that keeps recording into the submitting request's metrics."""
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args, **kwargs)
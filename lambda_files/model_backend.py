@@ -0,0 +1,318 @@
+"""
+Model backends for the matchmaking handler.
+
+A backend is anything with Bedrock Runtime's converse(**request) and
+converse_stream(**request) methods, taking and returning the Converse API shapes.
+The real one is a boto3 bedrock-runtime client; FakeBedrockBackend is a
+deterministic local stand-in with configurable latency, throttling and malformed
+output (and prompt-cache accounting for cachePoint blocks), so the handler can be
+exercised and benchmarked without AWS.
+
+    MODEL_BACKEND=fake python test_lambda_locally.py
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+
+def create_bedrock_client(region_name='us-east-1'):
+    """Create the real Bedrock Runtime client; boto3 is only imported here.
+
+    botocore's own retries are turned off: resilience.ResilientClient retries with
+    the request deadline in mind, and stacking both would multiply attempts.
+
+    The client's connection pool is shared by every thread making model calls.
+    botocore keeps only 10 connections by default, so with more concurrent calls
+    than that, extra connections are opened and torn down per request. The pool is
+    sized to BEDROCK_MAX_POOL_CONNECTIONS (default: one per model-call worker, see
+    BEDROCK_MAX_WORKERS), and TCP keep-alive holds idle connections open between bursts.
+    """
+    import boto3
+    from botocore.config import Config
+    pool_size = int(os.environ.get('BEDROCK_MAX_POOL_CONNECTIONS', os.environ.get('BEDROCK_MAX_WORKERS', '32')))
+    config = Config(
+        retries={'mode': 'standard', 'total_max_attempts': 1},
+        max_pool_connections=pool_size,
+        tcp_keepalive=True
+    )
+    return boto3.client('bedrock-runtime', region_name=region_name, config=config)
+
+
+def create_backend(name):
+    """Build the backend named by MODEL_BACKEND: "bedrock" (default) or "fake"."""
+    if name == 'bedrock':
+        return create_bedrock_client()
+    if name == 'fake':
+        return FakeBedrockBackend.from_env()
+    raise ValueError(f"Unknown model backend: {name}")
+
+
+def request_text(request):
+    """All system and user text of a Converse request, concatenated."""
+    parts = [block.get('text', '') for block in request.get('system', [])]
+    for message in request.get('messages', []):
+        parts.extend(block.get('text', '') for block in message.get('content', []))
+    return '\n'.join(parts)
+
+
+def request_kind(request):
+    """Classify a request as "selection" (answered with a number), "fused" (selection
+    and simulation in one answer) or "simulation"."""
+    system_text = ' '.join(block.get('text', '') for block in request.get('system', []))
+    if 'Respond with only a number' in system_text:
+        return 'selection'
+    return 'fused' if '"candidate_id"' in system_text else 'simulation'
+
+
+def throttling_error(operation_name):
+    """The error Bedrock raises when the account's request rate is exceeded."""
+    error = {'Error': {'Code': 'ThrottlingException', 'Message': 'Too many requests, please wait before trying again.'}}
+    try:
+        from botocore.exceptions import ClientError
+    except ImportError:  # keep the fake usable without boto3 installed
+        return RuntimeError(f"ThrottlingException: {error['Error']['Message']}")
+    return ClientError(error, operation_name)
+
+
+# Shortest prefix Bedrock will cache for Claude Haiku 4.5; checkpoints before that
+# many tokens are accepted but cache nothing
+MIN_CACHE_TOKENS = 4096
+
+
+class FakeBedrockBackend:
+    """Deterministic local stand-in for the Bedrock Runtime client.
+
+    Latencies are log-normal around the given medians (sigma controls the tail);
+    time_scale shrinks every sleep, e.g. 0.01 to run a benchmark 100x faster.
+    Responses depend only on the request text and the seed, so runs are repeatable.
+    """
+
+    def __init__(self, selection_latency_ms=400, simulation_latency_ms=3000, latency_sigma=0.35,
+                 throttle_rate=0.0, malformed_rate=0.0, time_scale=1.0, seed=0,
+                 min_cache_tokens=MIN_CACHE_TOKENS):
+        self.selection_latency_ms = selection_latency_ms
+        self.simulation_latency_ms = simulation_latency_ms
+        self.latency_sigma = latency_sigma
+        self.throttle_rate = throttle_rate
+        self.malformed_rate = malformed_rate
+        self.time_scale = time_scale
+        self.min_cache_tokens = min_cache_tokens
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._prompt_cache = set()
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls):
+        """Configure from FAKE_BEDROCK_* environment variables."""
+        env = os.environ.get
+        return cls(
+            selection_latency_ms=float(env('FAKE_BEDROCK_SELECTION_LATENCY_MS', '400')),
+            simulation_latency_ms=float(env('FAKE_BEDROCK_SIMULATION_LATENCY_MS', '3000')),
+            latency_sigma=float(env('FAKE_BEDROCK_LATENCY_SIGMA', '0.35')),
+            throttle_rate=float(env('FAKE_BEDROCK_THROTTLE_RATE', '0')),
+            malformed_rate=float(env('FAKE_BEDROCK_MALFORMED_RATE', '0')),
+            time_scale=float(env('FAKE_BEDROCK_TIME_SCALE', '1')),
+            seed=int(env('FAKE_BEDROCK_SEED', '0')),
+            min_cache_tokens=int(env('FAKE_BEDROCK_MIN_CACHE_TOKENS', str(MIN_CACHE_TOKENS))),
+        )
+
+    def _draw(self, kind):
+        """Sample (latency seconds, throttled, malformed) for one call."""
+        median_ms = self.selection_latency_ms if kind == 'selection' else self.simulation_latency_ms
+        with self._lock:
+            self.calls += 1
+            latency_ms = median_ms * math.exp(self.latency_sigma * self._random.gauss(0.0, 1.0))
+            throttled = self._random.random() < self.throttle_rate
+            malformed = self._random.random() < self.malformed_rate
+        return latency_ms / 1000.0 * self.time_scale, throttled, malformed
+
+    @staticmethod
+    def _tool_name(request):
+        """Name of the tool the request forces, if it uses tool output."""
+        tools = request.get('toolConfig', {}).get('tools', [])
+        return tools[0]['toolSpec']['name'] if tools else None
+
+    def _simulation_data(self, request, kind):
+        text = request_text(request)
+        digest = int(hashlib.sha256(text.encode('utf-8')).hexdigest(), 16)
+        simulation = {}
+        if kind == 'fused':
+            # Pick one of the numbered candidates in the prompt, as the real model would
+            candidates = re.findall(r'^CANDIDATE (\d+) \((.*)\):$', text, re.MULTILINE) or [('1', '')]
+            number, name = candidates[digest % len(candidates)]
+            simulation.update(candidate_id=int(number), candidate_name=name)
+        simulation.update({
+            "score": digest % 60 + 40,
+            "summary": "They met for coffee and the conversation flowed easily from travel stories "
+                       "to favourite books. By the end of the evening they were already planning "
+                       "a second date at a local jazz club.",
+            "meta": {
+                "compatibility_factors": {
+                    "shared_interests": "coffee, travel, music",
+                    "humor_alignment": "Both enjoy dry, observational humor",
+                    "lifestyle_match": "Similar weekend routines and social energy",
+                    "conversation_ease": "Easy and unhurried"
+                },
+                "potential_concerns": ""
+            }
+        })
+        return simulation
+
+    def _response_text(self, request, kind, malformed):
+        """The answer as text: a number for selections, else fenced JSON (or, for
+        tool-output requests, the tool input JSON as it would be streamed)."""
+        if kind == 'selection':
+            text = request_text(request)
+            return str(int(hashlib.sha256(text.encode('utf-8')).hexdigest(), 16) % 3 + 1)
+        body = json.dumps(self._simulation_data(request, kind), indent=2)
+        if malformed:
+            # Mimic a response cut off by maxTokens
+            body = body[:len(body) // 2]
+        return body if self._tool_name(request) else f"```json\n{body}\n```"
+
+    def _tool_input(self, request, kind, malformed):
+        data = self._simulation_data(request, kind)
+        if malformed:
+            # Cut off by maxTokens: the summary is unfinished and nothing after it arrived
+            data.pop('meta')
+            data['summary'] = data['summary'][:len(data['summary']) // 2]
+        return data
+
+    def _cached_tokens(self, request):
+        """Mimic Bedrock prompt caching for (read, written) input tokens: the prefix
+        ending at each cachePoint is written the first time it is seen and read after.
+        As on Bedrock, a checkpoint whose prefix is below min_cache_tokens is ignored."""
+        digest = hashlib.sha256()
+        length = 0
+        checkpoints = []
+        blocks = list(request.get('system', []))
+        for message in request.get('messages', []):
+            blocks.extend(message.get('content', []))
+        for block in blocks:
+            if 'cachePoint' in block:
+                if length // 4 >= self.min_cache_tokens:
+                    checkpoints.append((digest.hexdigest(), length // 4))
+            else:
+                text = block.get('text', '')
+                digest.update(text.encode('utf-8'))
+                length += len(text)
+        if not checkpoints:
+            return 0, 0
+        with self._lock:
+            read = max((tokens for key, tokens in checkpoints if key in self._prompt_cache), default=0)
+            last_key, last_tokens = checkpoints[-1]
+            written = 0 if last_key in self._prompt_cache else last_tokens - read
+            self._prompt_cache.update(key for key, _ in checkpoints)
+        return read, written
+
+    def _usage(self, request, output_text):
+        cache_read, cache_write = self._cached_tokens(request)
+        input_tokens = len(request_text(request)) // 4 - cache_read - cache_write
+        output_tokens = len(output_text) // 4
+        return {
+            "inputTokens": input_tokens, "outputTokens": output_tokens,
+            "cacheReadInputTokens": cache_read, "cacheWriteInputTokens": cache_write,
+            "totalTokens": input_tokens + cache_read + cache_write + output_tokens
+        }
+
+    def converse(self, **request):
+        kind = request_kind(request)
+        latency, throttled, malformed = self._draw(kind)
+        if throttled:
+            time.sleep(latency * 0.05)
+            raise throttling_error('Converse')
+        time.sleep(latency)
+        tool_name = self._tool_name(request)
+        if tool_name and kind != 'selection':
+            tool_input = self._tool_input(request, kind, malformed)
+            text = json.dumps(tool_input)
+            content = [{"toolUse": {"toolUseId": f"tooluse_{self.calls}", "name": tool_name, "input": tool_input}}]
+        else:
+            text = self._response_text(request, kind, malformed)
+            content = [{"text": text}]
+        return {
+            "output": {"message": {"role": "assistant", "content": content}},
+            "stopReason": "max_tokens" if malformed else ("tool_use" if tool_name else "end_turn"),
+            "usage": self._usage(request, text),
+            "metrics": {"latencyMs": int(latency * 1000)}
+        }
+
+    def converse_stream(self, **request):
+        kind = request_kind(request)
+        latency, throttled, malformed = self._draw(kind)
+        if throttled:
+            time.sleep(latency * 0.05)
+            raise throttling_error('ConverseStream')
+        text = self._response_text(request, kind, malformed)
+        usage = self._usage(request, text)
+        tool_name = self._tool_name(request) if kind != 'selection' else None
+        chunk_size = 16
+        # First token after ~10% of the total latency, the rest spread evenly
+        first_token_delay = latency * 0.1
+        per_chunk_delay = (latency - first_token_delay) / max(1, math.ceil(len(text) / chunk_size))
+
+        def events():
+            yield {"messageStart": {"role": "assistant"}}
+            if tool_name:
+                yield {"contentBlockStart": {"contentBlockIndex": 0, "start": {"toolUse": {"toolUseId": f"tooluse_{self.calls}", "name": tool_name}}}}
+            time.sleep(first_token_delay)
+            for start in range(0, len(text), chunk_size):
+                chunk = text[start:start + chunk_size]
+                delta = {"toolUse": {"input": chunk}} if tool_name else {"text": chunk}
+                yield {"contentBlockDelta": {"contentBlockIndex": 0, "delta": delta}}
+                time.sleep(per_chunk_delay)
+            yield {"contentBlockStop": {"contentBlockIndex": 0}}
+            yield {"messageStop": {"stopReason": "max_tokens" if malformed else ("tool_use" if tool_name else "end_turn")}}
+            yield {"metadata": {"usage": usage, "metrics": {"latencyMs": int(latency * 1000)}}}
+
+        return {"stream": events()}
+
+
+class InstrumentedBackend:
+    """Wraps a backend and records the wall time of every call by request kind,
+    plus the token usage reported by converse calls."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.timings = {}
+        self.errors = {}
+        self.usage = {}
+
+    def _record(self, kind, elapsed, failed):
+        with self._lock:
+            self.timings.setdefault(kind, []).append(elapsed)
+            if failed:
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def converse(self, **request):
+        kind = request_kind(request)
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = self.backend.converse(**request)
+            failed = False
+        finally:
+            self._record(kind, time.perf_counter() - started, failed)
+        with self._lock:
+            for field, count in response.get('usage', {}).items():
+                self.usage[field] = self.usage.get(field, 0) + count
+        return response
+
+    def converse_stream(self, **request):
+        # Only the time to open the stream is recorded here
+        kind = request_kind(request)
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = self.backend.converse_stream(**request)
+            failed = False
+            return response
+        finally:
+            self._record(f"{kind}_stream_open", time.perf_counter() - started, failed)
@@ -0,0 +1,262 @@
+"""
+Near-duplicate index for user profiles, using MinHash signatures and LSH banding.
+
+Users often refine their profile in the voice flow and resubmit nearly the same
+text. The exact-key result cache misses these. This index finds previously
+processed profiles whose word-bigram Jaccard similarity is above a threshold, so
+their cached results can be reused.
+
+Each profile is reduced to a MinHash signature of NUM_PERM values. The signature is
+split into bands of rows, and every band is hashed into a bucket. Profiles that
+share any bucket are candidates, and their similarity is estimated from the full
+signatures. A lookup touches only the profiles in the query's buckets, never the
+whole store. With 32 bands of 4 rows, a pair at similarity 0.7 shares a bucket
+more than 99.9% of the time, and a pair at 0.2 about 5% of the time.
+
+The in-process store lives in module globals. The optional SQLite store persists
+profiles across containers (on local disk, /tmp or EFS), and its hits are promoted
+into the in-process store.
+"""
+import random
+import re
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+
+from result_cache import normalize_profile
+
+try:
+    import numpy as np
+except ImportError:  # numpy is not part of the base Lambda runtime
+    np = None
+
+NUM_PERM = 128
+BANDS = 32
+SHINGLE_SIZE = 2
+
+# Universal hashing h(x) = (a * x + b) mod p with a Mersenne prime. Values stay
+# below 2 ** 31, so the numpy path cannot overflow uint64.
+MERSENNE_PRIME = (1 << 31) - 1
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Hashes of the overlapping word n-grams of a normalized profile."""
+    words = WORD_PATTERN.findall(normalize_profile(text))
+    if len(words) <= size:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))} if words else set()
+    return {
+        zlib.crc32(' '.join(words[i:i + size]).encode('utf-8'))
+        for i in range(len(words) - size + 1)
+    }
+
+
+class MinHasher:
+    """Computes fixed-length MinHash signatures; the seed fixes the permutations."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.a = [rng.randrange(1, MERSENNE_PRIME) for _ in range(num_perm)]
+        self.b = [rng.randrange(0, MERSENNE_PRIME) for _ in range(num_perm)]
+        if np is not None:
+            self._a = np.asarray(self.a, dtype=np.uint64)[:, None]
+            self._b = np.asarray(self.b, dtype=np.uint64)[:, None]
+
+    def signature(self, text):
+        """MinHash signature of the text as a tuple, or None if it has no words."""
+        hashes = shingles(text)
+        if not hashes:
+            return None
+        if np is not None:
+            values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes)) & np.uint64(MERSENNE_PRIME)
+            return tuple(((self._a * values + self._b) % np.uint64(MERSENNE_PRIME)).min(axis=1).tolist())
+        values = [value & MERSENNE_PRIME for value in hashes]
+        return tuple(
+            min((a * value + b) % MERSENNE_PRIME for value in values)
+            for a, b in zip(self.a, self.b)
+        )
+
+
+def band_buckets(signature, bands=BANDS):
+    """One bucket key per band; each key also encodes its band number."""
+    rows = len(signature) // bands
+    return [
+        (band << 32) | zlib.crc32(array('I', signature[band * rows:(band + 1) * rows]).tobytes())
+        for band in range(bands)
+    ]
+
+
+def estimated_similarity(signature_a, signature_b):
+    """Fraction of matching MinHash values, an estimate of the Jaccard similarity."""
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / len(signature_a)
+
+
+class LSHStore:
+    """In-memory LSH buckets over at most max_entries profiles; the oldest are evicted."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # profile -> (signature, buckets)
+        self._buckets = {}  # bucket -> set of profiles
+        self._lock = threading.Lock()
+
+    def add(self, profile, signature, buckets):
+        with self._lock:
+            if profile in self._entries:
+                self._entries.move_to_end(profile)
+                return
+            self._entries[profile] = (signature, buckets)
+            for bucket in buckets:
+                self._buckets.setdefault(bucket, set()).add(profile)
+            while len(self._entries) > self.max_entries:
+                old_profile, (_, old_buckets) = self._entries.popitem(last=False)
+                for bucket in old_buckets:
+                    members = self._buckets.get(bucket)
+                    if members is not None:
+                        members.discard(old_profile)
+                        if not members:
+                            del self._buckets[bucket]
+
+    def candidates(self, buckets):
+        """[(profile, signature)] for every profile sharing a bucket with the query."""
+        with self._lock:
+            profiles = set()
+            for bucket in buckets:
+                profiles.update(self._buckets.get(bucket, ()))
+            return [(profile, self._entries[profile][0]) for profile in profiles]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteLSHStore:
+    """Persistent LSH store in a SQLite file; the bucket column is indexed."""
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600):
+        import sqlite3
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lsh_profiles ("
+            " id INTEGER PRIMARY KEY, profile TEXT NOT NULL UNIQUE,"
+            " signature BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lsh_buckets (bucket INTEGER NOT NULL, profile_id INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS lsh_buckets_bucket ON lsh_buckets (bucket)")
+
+    def add(self, profile, signature, buckets):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                row = self._conn.execute("SELECT id FROM lsh_profiles WHERE profile = ?", (profile,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE lsh_profiles SET expires_at = ? WHERE id = ?", (expires_at, row[0]))
+                else:
+                    cursor = self._conn.execute(
+                        "INSERT INTO lsh_profiles (profile, signature, expires_at) VALUES (?, ?, ?)",
+                        (profile, array('I', signature).tobytes(), expires_at)
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO lsh_buckets (bucket, profile_id) VALUES (?, ?)",
+                        [(bucket, cursor.lastrowid) for bucket in buckets]
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def candidates(self, buckets):
+        placeholders = ','.join('?' * len(buckets))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT profile, signature FROM lsh_profiles WHERE expires_at >= ? AND id IN"
+                f" (SELECT profile_id FROM lsh_buckets WHERE bucket IN ({placeholders}))",
+                [time.time()] + list(buckets)
+            ).fetchall()
+        return [(profile, tuple(array('I', signature))) for profile, signature in rows]
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM lsh_buckets WHERE profile_id IN (SELECT id FROM lsh_profiles WHERE expires_at < ?)",
+                (time.time(),)
+            )
+            self._conn.execute("DELETE FROM lsh_profiles WHERE expires_at < ?", (time.time(),))
+
+
+class NearDuplicateIndex:
+    """Finds previously added profiles similar to a query profile.
+
+    Lookups check the in-process store first and then the optional shared store.
+    Failures in the shared store are logged and ignored, as with the result cache.
+    """
+
+    def __init__(self, local, shared=None, threshold=0.8, num_perm=NUM_PERM, bands=BANDS):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.local = local
+        self.shared = shared
+        self.threshold = threshold
+        self.bands = bands
+        self.hasher = MinHasher(num_perm)
+        # A profile is usually queried and then added in the same request
+        self._signature = lru_cache(maxsize=256)(self._compute_signature)
+
+    def _compute_signature(self, profile):
+        normalized = normalize_profile(profile)
+        return normalized, self.hasher.signature(normalized)
+
+    def add(self, profile):
+        normalized, signature = self._signature(profile)
+        if signature is None:
+            return
+        buckets = band_buckets(signature, self.bands)
+        self.local.add(normalized, signature, buckets)
+        if self.shared is not None:
+            try:
+                self.shared.add(normalized, signature, buckets)
+            except Exception as e:
+                print(f"⚠️ Near-duplicate store write failed: {str(e)}")
+
+    def query(self, profile):
+        """[(profile, similarity)] of stored profiles at or above the threshold, best first.
+
+        The query profile itself is never returned.
+        """
+        normalized, signature = self._signature(profile)
+        if signature is None:
+            return []
+        buckets = band_buckets(signature, self.bands)
+        candidates = self.local.candidates(buckets)
+        if self.shared is not None:
+            try:
+                shared_candidates = self.shared.candidates(buckets)
+            except Exception as e:
+                print(f"⚠️ Near-duplicate store read failed: {str(e)}")
+                shared_candidates = []
+            known = set(candidate for candidate, _ in candidates)
+            for candidate, candidate_signature in shared_candidates:
+                if candidate not in known:
+                    self.local.add(candidate, candidate_signature, band_buckets(candidate_signature, self.bands))
+                    candidates.append((candidate, candidate_signature))
+
+        matches = []
+        for candidate, candidate_signature in candidates:
+            if candidate == normalized:
+                continue
+            similarity = estimated_similarity(signature, candidate_signature)
+            if similarity >= self.threshold:
+                matches.append((candidate, similarity))
+        matches.sort(key=lambda match: -match[1])
+        return matches
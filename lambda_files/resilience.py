@@ -0,0 +1,352 @@
+"""
+Resilience layer around model calls.
+
+ResilientClient wraps any backend (see model_backend.py) and keeps its converse /
+converse_stream interface, with one extra keyword: the caller names the kind of
+request (kind="selection", "simulation" or "fused"), which keys the latency
+percentiles used for hedging and retry budgets. It adds:
+
+- retries with exponential backoff and full jitter on throttling and transient errors,
+  budgeted against the request deadline so a retry is never started that cannot finish
+- hedging: if a converse call is slower than a latency percentile of recent calls of
+  the same kind, a second identical call is started and the first answer wins
+- a deadline: every call gives up when the request's deadline (set with
+  deadline_scope, e.g. from context.get_remaining_time_in_millis()) or its own call
+  timeout passes, instead of holding the invocation until Lambda kills it
+- a circuit breaker that opens after repeated failures and rejects calls immediately
+  with CircuitOpenError until a probe call succeeds again
+
+Callers decide what to serve when the model is unavailable (ModelUnavailableError)
+or too slow (ModelDeadlineError).
+"""
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import metrics
+
+# Bedrock error codes worth retrying; everything else (validation, access) is not
+THROTTLING_CODES = {'ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException'}
+TRANSIENT_CODES = {'ServiceUnavailableException', 'InternalServerException', 'ModelNotReadyException',
+                   'ModelTimeoutException', 'RequestTimeout'}
+# botocore connection-level failures, matched by name so botocore is never imported here
+TRANSIENT_EXCEPTIONS = {'ReadTimeoutError', 'ConnectTimeoutError', 'EndpointConnectionError', 'ConnectionClosedError'}
+
+_deadline = contextvars.ContextVar('model_deadline', default=None)
+
+
+class ModelUnavailableError(RuntimeError):
+    """The model could not be reached: retries were exhausted or the circuit is open."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(ModelUnavailableError):
+    """Calls are being rejected without trying because the model is degraded."""
+
+
+class ModelDeadlineError(TimeoutError):
+    """A model call did not finish before the request deadline."""
+
+
+def error_code(error):
+    """The AWS error code of a botocore ClientError (or our fake's stand-in), if any."""
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code')
+    # model_backend.throttling_error falls back to "<Code>: <message>" without botocore
+    code = str(error).split(':', 1)[0]
+    return code if code in THROTTLING_CODES | TRANSIENT_CODES else None
+
+
+def is_throttling_error(error):
+    return error_code(error) in THROTTLING_CODES
+
+
+def is_retryable_error(error):
+    """Throttling, transient service errors and connection timeouts are retried."""
+    return error_code(error) in THROTTLING_CODES | TRANSIENT_CODES or type(error).__name__ in TRANSIENT_EXCEPTIONS
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """Bound every model call in this context (and tasks submitted with its context) by a
+    time.monotonic() deadline; nested scopes can only tighten it."""
+    current = _deadline.get()
+    if deadline is not None and current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline if deadline is not None else current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline():
+    return _deadline.get()
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies (seconds) for one kind of request."""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, percent):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = min(len(samples) - 1, int(round(percent / 100.0 * (len(samples) - 1))))
+        return samples[rank]
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failed calls (a call fails once its
+    retries are used up) and stays open for `reset_timeout` seconds; then one probe
+    call is let through (half-open) and its first outcome closes or re-opens it."""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go ahead now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def retry_after(self):
+        """Seconds until the circuit will next let a call through."""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def healthy(self):
+        """Closed with no recent failures; used to avoid hedging into a struggling service."""
+        return self.state == self.CLOSED and self.failures == 0
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """The call let through proved nothing either way; let another one probe."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_attempt_failure(self):
+        """A single attempt failed; only decisive while probing a half-open circuit."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._count_failure()
+
+    def record_failure(self):
+        with self._lock:
+            self._count_failure()
+
+    def _count_failure(self):
+        # Callers hold self._lock
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                print(f"⚠️ Model circuit breaker opened after {self.failures} failure(s)")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class ResilientClient:
+    """Backend wrapper adding deadline-aware retries, hedging and a circuit breaker."""
+
+    def __init__(self, client, max_attempts=4, backoff_base=0.2, backoff_cap=4.0, call_timeout=30.0,
+                 hedge_percentile=95.0, hedge_min_samples=20, hedge_min_delay=0.25,
+                 failure_threshold=5, reset_timeout=30.0, max_workers=32, seed=None):
+        self.client = client
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.call_timeout = call_timeout
+        # A percentile of 0 (or below) turns hedging off
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.max_workers = max_workers
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latencies = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @classmethod
+    def from_env(cls, client):
+        """Configure from BEDROCK_* environment variables."""
+        env = os.environ.get
+        return cls(
+            client,
+            max_attempts=int(env('BEDROCK_MAX_ATTEMPTS', '4')),
+            backoff_base=float(env('BEDROCK_BACKOFF_BASE_SECONDS', '0.2')),
+            backoff_cap=float(env('BEDROCK_BACKOFF_CAP_SECONDS', '4')),
+            call_timeout=float(env('BEDROCK_CALL_TIMEOUT_SECONDS', '30')),
+            hedge_percentile=float(env('BEDROCK_HEDGE_PERCENTILE', '95')),
+            hedge_min_samples=int(env('BEDROCK_HEDGE_MIN_SAMPLES', '20')),
+            hedge_min_delay=float(env('BEDROCK_HEDGE_MIN_DELAY_SECONDS', '0.25')),
+            failure_threshold=int(env('BEDROCK_CIRCUIT_FAILURE_THRESHOLD', '5')),
+            reset_timeout=float(env('BEDROCK_CIRCUIT_RESET_SECONDS', '30')),
+            max_workers=int(env('BEDROCK_MAX_WORKERS', '32')),
+        )
+
+    def __getattr__(self, name):
+        # Anything else (e.g. FakeBedrockBackend.calls) comes from the wrapped backend
+        if name == 'client':
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='model-call')
+        return self._executor
+
+    def _tracker(self, kind):
+        tracker = self.latencies.get(kind)
+        if tracker is None:
+            with self._lock:
+                tracker = self.latencies.setdefault(kind, LatencyTracker())
+        return tracker
+
+    def _call_deadline(self):
+        """(deadline, own_timeout): own_timeout is True when call_timeout, not the
+        caller's deadline, is the limit that applies."""
+        deadline = time.monotonic() + self.call_timeout
+        request_deadline = _deadline.get()
+        if request_deadline is not None and request_deadline < deadline:
+            return request_deadline, False
+        return deadline, True
+
+    def _backoff(self, attempt):
+        """Full jitter: uniform in [0, min(cap, base * 2^attempt)]."""
+        with self._lock:
+            return self._random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def _hedge_delay(self, kind):
+        tracker = self._tracker(kind)
+        if self.hedge_percentile <= 0 or len(tracker) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, tracker.percentile(self.hedge_percentile))
+
+    def _timed(self, kind, method, request):
+        started = time.monotonic()
+        response = method(**request)
+        self._tracker(kind).add(time.monotonic() - started)
+        return response
+
+    def _call(self, kind, method, request, deadline, hedge):
+        """One attempt, run on the worker pool so the deadline holds even if the call hangs."""
+        executor = self._get_executor()
+        primary = metrics.submit_with_context(executor, self._timed, kind, method, request)
+        pending = {primary}
+
+        hedge_delay = self._hedge_delay(kind) if hedge else None
+        if hedge_delay is not None:
+            done, _ = wait(pending, timeout=max(0.0, min(hedge_delay, deadline - time.monotonic())))
+            if not done and time.monotonic() < deadline and self.breaker.healthy():
+                metrics.increment('model_hedges')
+                pending.add(metrics.submit_with_context(executor, self._timed, kind, method, request))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                # Abandoned calls finish on the pool; their results are discarded
+                metrics.increment('model_deadline_exceeded')
+                raise ModelDeadlineError(f"Model call ({kind}) did not finish before the deadline")
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        metrics.increment('model_hedge_wins')
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _invoke(self, kind, method, request, hedge):
+        deadline, own_timeout = self._call_deadline()
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                metrics.increment('model_circuit_rejections')
+                raise CircuitOpenError("Model is temporarily unavailable", retry_after=self.breaker.retry_after())
+            try:
+                response = self._call(kind, method, request, deadline, hedge)
+            except ModelDeadlineError:
+                # Only a call outliving its own timeout says the service is unhealthy; a
+                # caller's tight deadline (e.g. a top-K budget) says nothing about Bedrock
+                if own_timeout:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release_probe()
+                raise
+            except Exception as error:
+                if not is_retryable_error(error):
+                    # The request itself was bad (validation, access); that says
+                    # nothing about the service's health either way
+                    self.breaker.release_probe()
+                    raise
+                self.breaker.record_attempt_failure()
+                metrics.increment('model_throttles' if is_throttling_error(error) else 'model_transient_errors')
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    self.breaker.record_failure()
+                    raise ModelUnavailableError(f"Model call ({kind}) failed after {attempt} attempts: {error}") from error
+                delay = self._backoff(attempt)
+                # Only retry if the backoff plus a typical call still fits before the deadline
+                typical = self._tracker(kind).percentile(50) or 0.0
+                if time.monotonic() + delay + typical > deadline:
+                    self.breaker.record_failure()
+                    metrics.increment('model_retry_budget_exhausted')
+                    raise ModelUnavailableError(f"Model call ({kind}) failed and no time is left to retry: {error}") from error
+                metrics.increment('model_retries')
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return response
+
+    def converse(self, *, kind, **request):
+        return self._invoke(kind, self.client.converse, request, hedge=True)
+
+    def converse_stream(self, *, kind, **request):
+        # Retries and the deadline cover opening the stream; a started stream is not hedged
+        return self._invoke(f"{kind}_stream", self.client.converse_stream, request, hedge=False)
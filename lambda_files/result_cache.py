@@ -0,0 +1,156 @@
+"""
+Two-level LRU + TTL cache for match results.
+
+The in-process layer lives in module globals, so it survives warm invocations of
+the same container. The optional shared layer is pluggable (anything with get/set)
+and ships with a SQLite implementation that works on local disk or /tmp. Entries
+found in the shared layer are promoted into the in-process layer.
+"""
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_profile(profile):
+    """Collapse case and whitespace so trivially different resubmissions share a key."""
+    return WHITESPACE.sub(' ', profile).strip().lower()
+
+
+def cache_key(kind, model_id, prompt_version, *parts):
+    """Stable key for a cached result of `kind` computed from the given profile texts."""
+    digest = hashlib.sha256()
+    for part in (kind, model_id, prompt_version) + tuple(normalize_profile(p) for p in parts):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return f"{kind}:{digest.hexdigest()}"
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache whose entries expire after ttl_seconds."""
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        expires_at = time.time() + (ttl_seconds or self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """Shared cache layer backed by a SQLite file; values are stored as JSON."""
+
+    def __init__(self, path, ttl_seconds=3600):
+        import sqlite3
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+                return None
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl_seconds=None):
+        expires_at = time.time() + (ttl_seconds or self.ttl_seconds)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at)
+            )
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM result_cache WHERE expires_at < ?", (time.time(),))
+
+
+class TwoLevelCache:
+    """In-process LRU in front of an optional shared layer, with hit/miss counters."""
+
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+        self._lock = threading.Lock()
+        self.counters = {"local_hits": 0, "shared_hits": 0, "misses": 0, "sets": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, key):
+        """Return a private copy of the cached value, or None on a miss."""
+        value = self.local.get(key)
+        if value is not None:
+            self._count("local_hits")
+            return copy.deepcopy(value)
+
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                # The shared layer is best effort; never fail a request because of it
+                print(f"⚠️ Shared cache read failed: {str(e)}")
+                self._count("errors")
+                value = None
+            if value is not None:
+                self._count("shared_hits")
+                self.local.set(key, value)
+                return copy.deepcopy(value)
+
+        self._count("misses")
+        return None
+
+    def set(self, key, value):
+        value = copy.deepcopy(value)
+        self.local.set(key, value)
+        self._count("sets")
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value)
+            except Exception as e:
+                print(f"⚠️ Shared cache write failed: {str(e)}")
+                self._count("errors")
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, local_entries=len(self.local))
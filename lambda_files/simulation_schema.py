@@ -0,0 +1,140 @@
+"""
+Output contract of the date simulation, as a Converse tool schema.
+
+The simulation call forces the model to "call" record_date_simulation, so Bedrock
+returns the result as structured tool input instead of free text. The same schema
+drives validation: normalize_simulation coerces what came back (or what the local
+repair pass recovered from text), missing_fields lists the required fields that
+are still absent, and schema_for_fields builds a reduced schema so only those
+fields are requested again.
+"""
+import re
+
+SIMULATION_TOOL_NAME = 'record_date_simulation'
+
+COMPATIBILITY_FACTORS = ('shared_interests', 'humor_alignment', 'lifestyle_match', 'conversation_ease')
+
+SIMULATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer", "minimum": 1, "maximum": 100,
+                  "description": "Overall compatibility from 1 to 100"},
+        "summary": {"type": "string", "description": "2-3 paragraph summary of the date"},
+        "meta": {
+            "type": "object",
+            "properties": {
+                "compatibility_factors": {
+                    "type": "object",
+                    "properties": {name: {"type": "string"} for name in COMPATIBILITY_FACTORS},
+                    "required": list(COMPATIBILITY_FACTORS)
+                },
+                "potential_concerns": {"type": "string",
+                                       "description": "Concerns or friction points, or an empty string"}
+            },
+            "required": ["compatibility_factors", "potential_concerns"]
+        }
+    },
+    "required": ["score", "summary", "meta"]
+}
+
+# Fields a usable simulation must have; potential_concerns defaults to ""
+REQUIRED_FIELDS = (('score',), ('summary',), ('meta', 'compatibility_factors'))
+
+# A summary cut off mid-sentence is trimmed back to its last complete sentence
+SENTENCE_END = re.compile(r'[.!?]["\')\]]*(?=\s|$)')
+
+
+def tool_config(schema=SIMULATION_SCHEMA, name=SIMULATION_TOOL_NAME,
+                description="Record the result of the simulated first date."):
+    """Converse toolConfig that forces the model to answer through one tool."""
+    return {
+        "tools": [{"toolSpec": {"name": name, "description": description, "inputSchema": {"json": schema}}}],
+        "toolChoice": {"tool": {"name": name}}
+    }
+
+
+def with_fields(schema, properties, required=()):
+    """A copy of an object schema with extra top-level properties."""
+    return dict(schema, properties=dict(schema['properties'], **properties),
+                required=list(schema['required']) + list(required))
+
+
+def normalize_simulation(data, truncated_path=None):
+    """Coerce a parsed simulation to the contract, dropping values that cannot be used.
+
+    truncated_path is the path of a string value that was cut off (see
+    streaming_json.repair_json); a truncated summary keeps its complete sentences.
+    """
+    if not isinstance(data, dict):
+        return {}
+
+    score = data.get('score')
+    try:
+        data['score'] = min(100, max(1, int(round(float(score)))))
+    except (TypeError, ValueError):
+        data.pop('score', None)
+
+    summary = data.get('summary')
+    if isinstance(summary, str) and truncated_path == ('summary',):
+        ends = list(SENTENCE_END.finditer(summary))
+        summary = summary[:ends[-1].end()] if ends else ''
+    if isinstance(summary, str) and summary.strip():
+        data['summary'] = summary.strip()
+    else:
+        data.pop('summary', None)
+
+    meta = data.get('meta')
+    if not isinstance(meta, dict):
+        data.pop('meta', None)
+    else:
+        factors = meta.get('compatibility_factors')
+        if not isinstance(factors, dict) or not factors:
+            meta.pop('compatibility_factors', None)
+        if not isinstance(meta.get('potential_concerns', ''), str):
+            meta.pop('potential_concerns', None)
+    return data
+
+
+def missing_fields(data):
+    """Required field paths absent from a normalized simulation."""
+    missing = []
+    for path in REQUIRED_FIELDS:
+        value = data
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is None:
+            missing.append(path)
+    return missing
+
+
+def schema_for_fields(paths):
+    """Reduced simulation schema asking only for the given field paths."""
+    properties = {}
+    required = []
+    for path in paths:
+        if len(path) == 1:
+            properties[path[0]] = SIMULATION_SCHEMA['properties'][path[0]]
+            required.append(path[0])
+        else:
+            meta_schema = SIMULATION_SCHEMA['properties']['meta']
+            meta = properties.setdefault('meta', {"type": "object", "properties": {}, "required": []})
+            meta['properties'][path[1]] = meta_schema['properties'][path[1]]
+            meta['required'].append(path[1])
+            if 'meta' not in required:
+                required.append('meta')
+    return {"type": "object", "properties": properties, "required": required}
+
+
+def merge_fields(data, extra, paths):
+    """Copy the given field paths from extra into data (where extra has them)."""
+    for path in paths:
+        value = extra
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is None:
+            continue
+        target = data
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        target[path[-1]] = value
+    return data
@@ -0,0 +1,232 @@
+"""
+Incremental JSON parser for streamed model output.
+
+Text is fed in arbitrary chunks (as it arrives from converse_stream) and the parser
+reports each value as soon as it is complete, plus the decoded text of selected
+string values while they are still being generated. Anything before the first
+'{' or '[' (e.g. a ```json fence) and anything after the top-level value is ignored.
+
+    parser = IncrementalJSONParser(stream_paths=[('summary',)])
+    for kind, path, value in parser.feed(chunk):
+        ...  # ('value', ('score',), 87), ('delta', ('summary',), 'They met at')
+
+The parser is lenient about trailing commas and raw control characters in strings,
+and close() completes a document that was cut off, which makes it double as a local
+repair pass for near-valid model output (see repair_json).
+"""
+import json
+
+WHITESPACE = ' \t\r\n'
+LITERAL_CHARS = set('-+.0123456789eEtruefalsn')
+# Models sometimes emit raw newlines inside strings; accept them
+_STRING_DECODER = json.JSONDecoder(strict=False)
+
+
+class _Frame:
+    """An open object or array and what the parser expects next inside it."""
+
+    __slots__ = ('container', 'path', 'key', 'expect')
+
+    def __init__(self, container, path):
+        self.container = container
+        self.path = path
+        self.key = None
+        # object: 'key' -> 'colon' -> 'value' -> 'comma'; array: 'value' -> 'comma'
+        self.expect = 'key' if isinstance(container, dict) else 'value'
+
+    def child_path(self):
+        if isinstance(self.container, dict):
+            return self.path + (self.key,)
+        return self.path + (len(self.container),)
+
+
+class IncrementalJSONParser:
+    """Push parser that turns text chunks into ('value' | 'delta', path, value) events."""
+
+    def __init__(self, stream_paths=()):
+        self.stream_paths = set(tuple(path) for path in stream_paths)
+        self.result = None
+        self.done = False
+        self._started = False
+        self._stack = []
+        self._literal = []
+        # State of the string being read, if any
+        self._string_raw = None
+        self._string_is_key = False
+        self._string_path = None
+        self._string_emitted = 0
+        self._escape_pos = None
+        self._hold_pos = None
+
+    def feed(self, chunk):
+        """Consume a chunk of text and return the events it completed."""
+        events = []
+        for char in chunk:
+            if self.done:
+                break
+            if self._string_raw is not None:
+                self._read_string_char(char, events)
+            elif not self._started:
+                if char in '{[':
+                    self._started = True
+                    self._open(char)
+            elif self._literal and char not in LITERAL_CHARS:
+                self._finish_literal(events)
+                if not self.done:
+                    self._read_structural(char, events)
+            else:
+                self._read_structural(char, events)
+
+        self._emit_string_delta(events)
+        return events
+
+    def close(self):
+        """Complete a truncated document and return (value, truncated_path).
+
+        An unfinished string value is kept up to where it stopped and its path is
+        returned as truncated_path (None if no value was cut off). Unfinished keys and
+        literals are dropped and every open container is closed.
+        """
+        if self.done:
+            return self.result, None
+        if not self._started:
+            raise ValueError("No JSON value found")
+        truncated_path = None
+        if self._string_raw is not None:
+            # Drop a half-received escape sequence or unpaired high surrogate
+            cut = [pos for pos in (self._escape_pos, self._hold_pos) if pos is not None]
+            if cut:
+                del self._string_raw[min(cut):]
+            if self._string_is_key:
+                self._string_raw = None
+            else:
+                truncated_path = self._string_path
+                self._finish_string([])
+        elif self._literal:
+            # Nothing followed it, so "8" may be the start of 87 and "tr" of true
+            self._literal = []
+        while not self.done:
+            frame = self._stack.pop()
+            self._complete_value(frame.container, frame.path, [])
+        return self.result, truncated_path
+
+    # -- structure ---------------------------------------------------------
+
+    def _read_structural(self, char, events):
+        if char in WHITESPACE:
+            return
+        frame = self._stack[-1]
+
+        if char == '"':
+            if frame.expect == 'key':
+                self._start_string(is_key=True, path=None)
+            elif frame.expect == 'value':
+                self._start_string(is_key=False, path=frame.child_path())
+            else:
+                raise ValueError(f"Unexpected string while expecting {frame.expect}")
+        elif char == ':' and frame.expect == 'colon':
+            frame.expect = 'value'
+        elif char == ',' and frame.expect == 'comma':
+            frame.expect = 'key' if isinstance(frame.container, dict) else 'value'
+        elif char in '}]':
+            if frame.expect not in ('comma', 'key' if char == '}' else 'value'):
+                raise ValueError(f"Unexpected {char!r} while expecting {frame.expect}")
+            if (char == '}') != isinstance(frame.container, dict):
+                raise ValueError(f"Mismatched {char!r}")
+            self._stack.pop()
+            self._complete_value(frame.container, frame.path, events)
+        elif frame.expect == 'value':
+            if char in '{[':
+                self._open(char)
+            elif char in LITERAL_CHARS:
+                self._literal.append(char)
+            else:
+                raise ValueError(f"Unexpected character {char!r}")
+        else:
+            raise ValueError(f"Unexpected character {char!r} while expecting {frame.expect}")
+
+    def _open(self, char):
+        path = self._stack[-1].child_path() if self._stack else ()
+        self._stack.append(_Frame({} if char == '{' else [], path))
+
+    def _finish_literal(self, events):
+        text = ''.join(self._literal)
+        self._literal = []
+        value = json.loads(text)
+        self._complete_value(value, self._stack[-1].child_path(), events)
+
+    def _complete_value(self, value, path, events):
+        if not self._stack:
+            self.result = value
+            self.done = True
+        else:
+            frame = self._stack[-1]
+            if isinstance(frame.container, dict):
+                frame.container[frame.key] = value
+            else:
+                frame.container.append(value)
+            frame.expect = 'comma'
+        events.append(('value', path, value))
+
+    # -- strings -----------------------------------------------------------
+
+    def _start_string(self, is_key, path):
+        self._string_raw = []
+        self._string_is_key = is_key
+        self._string_path = path
+        self._string_emitted = 0
+        self._escape_pos = None
+        self._hold_pos = None
+
+    def _read_string_char(self, char, events):
+        raw = self._string_raw
+        if self._escape_pos is not None:
+            raw.append(char)
+            escape = raw[self._escape_pos:]
+            if escape[1] != 'u' or len(escape) == 6:
+                # Hold back a high surrogate until its low half arrives
+                code = int(''.join(escape[2:]), 16) if escape[1] == 'u' else None
+                self._hold_pos = self._escape_pos if code is not None and 0xD800 <= code <= 0xDBFF else None
+                self._escape_pos = None
+        elif char == '\\':
+            self._escape_pos = len(raw)
+            raw.append(char)
+        elif char == '"':
+            self._finish_string(events)
+        else:
+            raw.append(char)
+            self._hold_pos = None
+
+    def _finish_string(self, events):
+        self._emit_string_delta(events, final=True)
+        value = _STRING_DECODER.decode('"' + ''.join(self._string_raw) + '"')
+        is_key, path = self._string_is_key, self._string_path
+        self._string_raw = None
+        if is_key:
+            frame = self._stack[-1]
+            frame.key = value
+            frame.expect = 'colon'
+        else:
+            self._complete_value(value, path, events)
+
+    def _emit_string_delta(self, events, final=False):
+        if self._string_raw is None or self._string_is_key or self._string_path not in self.stream_paths:
+            return
+        end = len(self._string_raw)
+        if not final:
+            pending = [pos for pos in (self._escape_pos, self._hold_pos) if pos is not None]
+            end = min(pending + [end])
+        if end > self._string_emitted:
+            text = _STRING_DECODER.decode('"' + ''.join(self._string_raw[self._string_emitted:end]) + '"')
+            self._string_emitted = end
+            events.append(('delta', self._string_path, text))
+
+
+def repair_json(text):
+    """Parse near-valid JSON (fenced, trailing commas, cut off) into (value, truncated_path).
+
+    Raises ValueError if no JSON value can be recovered.
+    """
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    return parser.close()
@@ -1,6 +1,9 @@
 """
 Test script to test Lambda function locally with sample input
 Run this to verify the Lambda function works correctly
+
+Set MODEL_BACKEND=fake to run against the local fake Bedrock backend instead of AWS
+(see model_backend.py), e.g. MODEL_BACKEND=fake python test_lambda_locally.py
 """
 
 import json
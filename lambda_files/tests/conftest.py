@@ -0,0 +1,10 @@
+"""Shared pytest setup: import the flat lambda_files modules against the fake backend."""
+import os
+import sys
+
+# Set before lambda_function is imported: no AWS calls, no simulated latency
+os.environ.setdefault('MODEL_BACKEND', 'fake')
+os.environ.setdefault('FAKE_BEDROCK_TIME_SCALE', '0')
+os.environ.setdefault('WARMUP_MODEL_CALL', 'false')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
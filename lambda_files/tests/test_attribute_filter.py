@@ -0,0 +1,94 @@
+"""Attribute extraction and the dealbreaker filter."""
+import pytest
+
+from attribute_filter import AttributeIndex, extract_attributes
+
+
+@pytest.mark.parametrize('text, location', [
+    ("28 years old, lives in San Francisco, CA.", 'san francisco'),
+    ("Lives in St. Louis, MO.", 'st. louis'),
+    ("Living in New York has taught me patience.", 'new york'),
+    ("I live in Brooklyn but work in Manhattan.", 'brooklyn'),
+    ("I live in Denver I love hiking", 'denver'),
+    ("I'm based in Winston-Salem and love it.", 'winston-salem'),
+])
+def test_location_stops_at_the_place_name(text, location):
+    assert extract_attributes(text)['location'] == location
+
+
+@pytest.mark.parametrize('text', [
+    "I live in the moment and love surprises.",
+    "I live in Bora Bora Bora, I mean the island.",
+])
+def test_no_location_without_a_place_name(text):
+    assert 'location' not in extract_attributes(text)
+
+
+@pytest.mark.parametrize('text, religion', [
+    ("I am an atheist.", 'atheist'),
+    ("I'm an agnostic, honestly.", 'agnostic'),
+    ("I'm a practicing catholic.", 'catholic'),
+])
+def test_first_person_religion(text, religion):
+    assert extract_attributes(text)['religion'] == religion
+
+
+@pytest.mark.parametrize('text', [
+    "My ideal partner: she lives in Denver, smokes sometimes.",
+    "I want someone who wants kids someday and is very religious (catholic).",
+    "My brother is gay and lives in Austin, TX.",
+    "My ex smokes daily and I'd love to never repeat that.",
+])
+def test_facts_about_other_people_are_ignored(text):
+    assert extract_attributes(text) == {}
+
+
+def test_facts_about_a_partner_do_not_hide_the_authors_own():
+    attributes = extract_attributes(
+        "I'm a woman looking for a man who smokes daily. 31 years old, lives in Denver, CO. wants children: yes."
+    )
+    assert attributes == {'gender': 'female', 'seeking': {'male'}, 'location': 'denver', 'wants_children': 'yes'}
+
+
+def test_formatter_phrases_are_extracted():
+    attributes = extract_attributes(
+        "I'm a woman looking for a man. Smokes sometimes. Wants children: no. "
+        "Very religious (muslim). Lives in Austin, TX."
+    )
+    assert attributes == {
+        'gender': 'female', 'seeking': {'male'}, 'smoking': 'sometimes', 'wants_children': 'no',
+        'religion': 'muslim', 'religion_very_important': True, 'location': 'austin',
+    }
+
+
+CANDIDATES = [
+    {"name": "Alex (Female)", "profile": "Looking for a man. Wants children: yes. Lives in Denver, CO."},
+    {"name": "Blake (Male)", "profile": "Looking for a woman. Smokes daily. I'm jewish. Lives in Denver, CO."},
+    {"name": "Casey (Male)", "profile": "Looking for a woman. Wants children: no. Lives in Boston, MA."},
+    {"name": "Drew (Male)", "profile": "Looking for a woman. Very religious (catholic). Lives in Denver, CO."},
+    {"name": "Emery (Male)", "profile": "Looking for a woman. I love the outdoors."},
+    {"name": "Finley (Male)", "profile": "Looking for a woman. Lives in Miami, FL. Open to long distance."},
+]
+
+
+def compatible_names(user_text):
+    index = AttributeIndex(CANDIDATES)
+    bits = index.compatible(extract_attributes(user_text))
+    return {CANDIDATES[position]['name'].split()[0] for position in range(index.size) if bits >> position & 1}
+
+
+@pytest.mark.parametrize('user_text, expected', [
+    # gender both ways; unknown attributes never exclude
+    ("I'm a woman looking for a man.", {'Blake', 'Casey', 'Drew', 'Emery', 'Finley'}),
+    ("I'm a woman looking for a man. Wants children: yes.", {'Blake', 'Drew', 'Emery', 'Finley'}),
+    ("I'm a woman looking for a man. No smokers, please.", {'Casey', 'Drew', 'Emery', 'Finley'}),
+    # a candidate's own religious requirement applies to the user too
+    ("I'm a woman looking for a man. Somewhat religious (jewish).", {'Blake', 'Casey', 'Emery', 'Finley'}),
+    ("I'm a woman looking for a man. Very religious (catholic).", {'Casey', 'Drew', 'Emery', 'Finley'}),
+    # other cities only when either side is open to long distance
+    ("I'm a woman looking for a man. Lives in Denver, CO.", {'Blake', 'Drew', 'Emery', 'Finley'}),
+    ("I'm a woman looking for a man. Lives in Denver, CO. Open to long distance.",
+     {'Blake', 'Casey', 'Drew', 'Emery', 'Finley'}),
+])
+def test_filter_rules(user_text, expected):
+    assert compatible_names(user_text) == expected
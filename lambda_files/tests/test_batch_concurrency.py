@@ -0,0 +1,31 @@
+"""A batch never runs more model calls at once than its max_concurrency."""
+import json
+import threading
+import time
+
+import lambda_function
+
+
+def test_top_k_batch_shares_concurrency_limit(monkeypatch):
+    lock = threading.Lock()
+    running = {"now": 0, "peak": 0}
+
+    def slow_simulation(user_profile, candidate_profile, model_id, use_cache):
+        with lock:
+            running['now'] += 1
+            running['peak'] = max(running['peak'], running['now'])
+        time.sleep(0.02)
+        with lock:
+            running['now'] -= 1
+        return {"score": 70, "summary": "", "meta": {"candidate_profile": candidate_profile}}
+
+    monkeypatch.setattr(lambda_function, 'simulate_date_cached', slow_simulation)
+    profiles = [f"Profile {index}: I love hiking, cooking and live music on weekends." for index in range(4)]
+    response = lambda_function.lambda_handler({"httpMethod": "POST", "body": json.dumps({
+        "user_partner_profiles": profiles, "top_k": 3, "max_concurrency": 2, "no_cache": True
+    })}, None)
+
+    results = json.loads(response['body'])['results']
+    assert all(item['success'] for item in results)
+    assert len(results[0]['result']['meta']['ranked_matches']) == 3
+    assert running['peak'] <= 2
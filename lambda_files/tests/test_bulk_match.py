@@ -0,0 +1,63 @@
+"""Bulk matching checkpoints: an interrupted run resumes without redoing or duplicating items."""
+import argparse
+import json
+
+import bulk_match
+from bulk_match import Checkpoint
+
+PROFILES = [
+    "I love hiking, cooking and live music on weekends.",
+    "Bookworm who loves travel, museums and quiet coffee shops.",
+    "Gym regular, dog owner and weekend baker looking for adventure.",
+    "Software engineer who plays guitar and volunteers at an animal shelter.",
+    "Marathon runner, amateur photographer and lover of spicy food.",
+]
+
+
+def test_watermark_advances_over_finished_lines(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'run.checkpoint'), str(tmp_path / 'users.jsonl'))
+    checkpoint.mark(2)
+    assert checkpoint.watermark == 1 and checkpoint.finished(2) and not checkpoint.finished(1)
+    checkpoint.mark(1)
+    assert checkpoint.watermark == 3 and checkpoint.done == set()
+    checkpoint.mark(5)
+    checkpoint.save(output_offset=123)
+
+    loaded = Checkpoint.load(checkpoint.path, checkpoint.input_path)
+    assert (loaded.watermark, loaded.done, loaded.output_offset) == (3, {5}, 123)
+    assert [loaded.finished(line) for line in range(1, 7)] == [True, True, False, False, True, False]
+
+
+def bulk_args(tmp_path, **overrides):
+    values = dict(input=str(tmp_path / 'users.jsonl'), output=str(tmp_path / 'results.jsonl'), workers=2,
+                  selection_mode='fast', top_k=1, no_cache=True, item_timeout=30.0, limit=0,
+                  checkpoint=None, checkpoint_every=1)
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def test_interrupted_run_resumes_where_it_stopped(tmp_path):
+    args = bulk_args(tmp_path)
+    with open(args.input, 'w', encoding='utf-8') as f:
+        for number, profile in enumerate(PROFILES):
+            f.write(json.dumps({"id": f"u-{number}", "user_partner_profile": profile}) + '\n')
+
+    first_run = bulk_match.run(bulk_args(tmp_path, limit=2))[0]
+    assert first_run['items'] == 2
+    # A row written after the last checkpoint is dropped and redone on resume
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write('{"line": 99, "partial": true}\n')
+
+    run_totals, previous_totals, overall_totals, skipped, _ = bulk_match.run(args)
+    assert (run_totals['items'], previous_totals['items'], overall_totals['items'], skipped) == (3, 2, 5, 2)
+    with open(args.output, encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f]
+    assert sorted(row['line'] for row in rows) == [1, 2, 3, 4, 5]
+    assert all(row['success'] for row in rows)
+
+
+def test_unknown_selection_mode_fails_the_item(tmp_path):
+    item = bulk_match.match_item(1, {"user_partner_profile": PROFILES[0], "selection_mode": "local"},
+                                 bulk_args(tmp_path), item_timeout=30.0)
+    assert not item['success'] and 'selection_mode' in item['error']
+    assert item['usage']['model_calls'] == 0
@@ -0,0 +1,64 @@
+"""Cached and near-duplicate selections must still respect the dealbreaker filter."""
+import json
+
+import pytest
+
+import lambda_function
+
+PROFILE = ("28 years old, lives in Denver, CO. I love hiking, indie music and coffee shops, "
+           "and I value honesty and a good sense of humor. {self_description}")
+
+
+def candidate_gender(candidate_profile):
+    name = next(c['name'] for c in lambda_function.get_candidate_pool() if c['profile'] == candidate_profile)
+    return 'female' if '(Female)' in name else 'male'
+
+
+def match(profile, selection_mode):
+    response = lambda_function.lambda_handler(
+        {"httpMethod": "POST", "body": json.dumps({"user_partner_profile": profile, "selection_mode": selection_mode})},
+        None
+    )
+    assert response['statusCode'] == 200
+    return json.loads(response['body'])['meta']['candidate_profile']
+
+
+@pytest.mark.parametrize('selection_mode', ['llm', 'fused'])
+def test_near_duplicate_selection_is_refiltered(monkeypatch, selection_mode):
+    monkeypatch.setattr(lambda_function, 'NEAR_DUPLICATE_MODE', 'selection')
+    woman = PROFILE.format(self_description="I'm a woman looking for a man.")
+    man = PROFILE.format(self_description="I'm a man looking for a woman.")
+
+    assert candidate_gender(match(woman, selection_mode)) == 'male'
+    # Nearly the same text, but the filter excludes every male candidate for this user
+    assert candidate_gender(match(man, selection_mode)) == 'female'
+
+
+def test_is_compatible_candidate():
+    pool = lambda_function.get_candidate_pool()
+    female = next(position for position, c in enumerate(pool) if '(Female)' in c['name'])
+    male = next(position for position, c in enumerate(pool) if '(Male)' in c['name'])
+    user = "I'm a man looking for a woman. I love hiking and cooking."
+    assert lambda_function.is_compatible_candidate(user, female)
+    assert not lambda_function.is_compatible_candidate(user, male)
+
+
+def test_stale_or_legacy_selection_entries_are_misses():
+    user = "I love hiking and cooking."
+    entry = lambda_function.selection_entry(0)
+    assert lambda_function.usable_selection(user, entry)
+    # A rebuilt store put someone else at this position
+    assert not lambda_function.usable_selection(user, dict(entry, profile="A profile that is not in the pool"))
+    assert not lambda_function.usable_selection(user, dict(entry, position=10 ** 6))
+    # Entries cached before positions were stored held just the profile text
+    assert not lambda_function.usable_selection(user, entry['profile'])
+
+
+def test_cached_hit_before_the_pool_is_loaded(monkeypatch):
+    """A cached selection must not need the candidate lock while loading the pool."""
+    selection_key = lambda_function.cache_key('candidate', 'm', 'v', 'profile')
+    lambda_function.RESULT_CACHE.set(selection_key, lambda_function.selection_entry(0))
+    monkeypatch.setattr(lambda_function, '_candidate_pool', None)
+    monkeypatch.setattr(lambda_function, '_attribute_index', None)
+    entry = lambda_function.cached_selection("I love hiking and cooking.", selection_key)
+    assert entry['position'] == 0
@@ -0,0 +1,34 @@
+"""Candidate index scores agree with a plain dot product of the sparse vectors."""
+import pytest
+
+from candidate_index import CandidateIndex
+
+TEXTS = [
+    "I love hiking, cooking and live music on weekends.",
+    "",
+    "Bookworm who loves travel, museums and quiet coffee shops.",
+    "the and of",
+    "Hiking, jazz and coffee with my dog. Cooking for friends.",
+]
+
+
+def dot_product_scores(index, text):
+    weights = index._query_weights(text)
+    return [
+        sum(float(index.data[i]) * weights.get(int(index.indices[i]), 0.0)
+            for i in range(index.indptr[row], index.indptr[row + 1]))
+        for row in range(index.size)
+    ]
+
+
+@pytest.mark.parametrize('text', [
+    "hiking cooking coffee jazz",
+    "I love hiking and cooking, hiking and more cooking.",
+    "zebra xylophone",
+    "",
+])
+def test_scores_match_dot_product(tmp_path, text):
+    index = CandidateIndex(TEXTS)
+    index.save(str(tmp_path))
+    for loaded in (index, CandidateIndex.load(str(tmp_path))):
+        assert list(loaded.scores(text)) == pytest.approx(dot_product_scores(index, text), abs=1e-6)
@@ -0,0 +1,33 @@
+"""Every response carries the configured CORS origin, not a hard-coded wildcard."""
+import json
+
+import pytest
+
+import lambda_function
+
+ORIGIN = 'https://app.example.com'
+
+
+@pytest.fixture(autouse=True)
+def configured_origin(monkeypatch):
+    monkeypatch.setitem(lambda_function.CORS_HEADERS, 'Access-Control-Allow-Origin', ORIGIN)
+
+
+def post(request):
+    return lambda_function.lambda_handler({"httpMethod": "POST", "body": json.dumps(request)}, None)
+
+
+@pytest.mark.parametrize('request_body', [
+    {"user_partner_profile": "32 years old, lives in Austin, TX. I love live music and cooking."},
+    {"user_partner_profiles": ["I love hiking and cooking.", "I love reading and travel."]},
+    {},
+])
+def test_responses_use_configured_origin(request_body):
+    response = post(request_body)
+    assert response['headers']['Access-Control-Allow-Origin'] == ORIGIN
+
+
+def test_preflight_keeps_max_age():
+    response = lambda_function.lambda_handler({"httpMethod": "OPTIONS"}, None)
+    assert response['headers']['Access-Control-Allow-Origin'] == ORIGIN
+    assert response['headers']['Access-Control-Max-Age'] == str(lambda_function.CORS_MAX_AGE_SECONDS)
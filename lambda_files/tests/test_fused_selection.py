@@ -0,0 +1,29 @@
+"""A fused answer is attributed to a shortlisted candidate only when its name agrees."""
+import pytest
+
+import lambda_function
+
+
+@pytest.fixture
+def shortlist():
+    pool = lambda_function.get_candidate_pool()
+    return [0, 1], [pool[0]['name'], pool[1]['name']]
+
+
+def answer(candidate_id, candidate_name):
+    return {"candidate_id": candidate_id, "candidate_name": candidate_name}
+
+
+def test_full_and_first_name_are_accepted(shortlist):
+    positions, names = shortlist
+    assert lambda_function.fused_candidate_position(answer(2, names[1]), positions) == 1
+    first = names[1].split()[0]
+    assert lambda_function.fused_candidate_position(answer(2, first.lower()), positions) == 1
+    assert lambda_function.fused_candidate_position(answer("2", None), positions) == 1
+
+
+def test_mismatched_or_unlisted_answers_are_rejected(shortlist):
+    positions, names = shortlist
+    assert lambda_function.fused_candidate_position(answer(2, names[0]), positions) is None
+    assert lambda_function.fused_candidate_position(answer(3, names[0]), positions) is None
+    assert lambda_function.fused_candidate_position(answer("two", names[1]), positions) is None
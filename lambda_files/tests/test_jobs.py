@@ -0,0 +1,79 @@
+"""Async jobs are only accepted where a worker drains the queue, use the job's timeout, and keep
+the result of their latest claim."""
+import json
+import time
+
+import lambda_function
+from job_queue import SQLiteJobStore
+
+PROFILE = "30 years old, lives in Seattle, WA. I love climbing, board games and cooking for friends."
+
+
+def post(request, context=None):
+    return lambda_function.lambda_handler({"httpMethod": "POST", "body": json.dumps(request)}, context)
+
+
+def test_async_rejected_without_job_workers(monkeypatch):
+    monkeypatch.setattr(lambda_function, 'ASYNC_JOBS', False)
+    for request in ({"user_partner_profile": PROFILE, "async": True}, {"job_id": "3f2c"}):
+        response = post(request)
+        assert response['statusCode'] == 400
+        assert 'not enabled' in json.loads(response['body'])['error']
+
+
+def test_job_runs_when_enabled(monkeypatch, tmp_path):
+    monkeypatch.setattr(lambda_function, 'ASYNC_JOBS', True)
+    monkeypatch.setattr(lambda_function, 'JOB_STORE_PATH', str(tmp_path / 'jobs.sqlite3'))
+    monkeypatch.setattr(lambda_function, '_job_store', None)
+
+    response = post({"user_partner_profile": PROFILE, "async": True, "no_cache": True})
+    assert response['statusCode'] == 202
+    job_id = json.loads(response['body'])['job_id']
+
+    claimed_id, request, _ = lambda_function.get_job_store().claim()
+    assert claimed_id == job_id
+    status_code, result = lambda_function.run_job(request)
+    assert status_code == 200 and 'score' in result
+
+
+def test_job_top_k_deadline_uses_job_timeout(monkeypatch):
+    deadlines = []
+
+    def fake_top_k(user_partner_profile, model_id, top_k, use_cache, deadline):
+        deadlines.append(deadline - time.monotonic())
+        return {"score": 80, "summary": "", "meta": {}}
+
+    monkeypatch.setattr(lambda_function, 'TOP_K_DEADLINE_SECONDS', 20)
+    monkeypatch.setattr(lambda_function, 'JOB_TIMEOUT_SECONDS', 300)
+    monkeypatch.setattr(lambda_function, 'match_profile_top_k', fake_top_k)
+
+    lambda_function.run_job({"user_partner_profile": PROFILE, "top_k": 3, "no_cache": True})
+    post({"user_partner_profile": PROFILE, "top_k": 3, "no_cache": True}, lambda_function.JobContext(29))
+
+    job_deadline, request_deadline = deadlines
+    assert job_deadline > 200
+    assert request_deadline <= 20
+
+
+def test_only_the_latest_claim_stores_a_result(tmp_path):
+    # A negative lease makes every running job stale at once
+    store = SQLiteJobStore(str(tmp_path / 'jobs.sqlite3'), lease_seconds=-1)
+    job_id, _ = store.submit({"user_partner_profile": PROFILE}, 'key')
+    _, _, first = store.claim()
+    assert store.requeue_stale() == 1
+    _, _, second = store.claim()
+
+    assert store.finish(job_id, second, 200, {"worker": "second"})
+    assert not store.finish(job_id, first, 200, {"worker": "first"})
+    assert store.get(job_id)['result'] == {"worker": "second"}
+
+
+def test_requeued_job_not_yet_reclaimed_keeps_its_result(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / 'jobs.sqlite3'), lease_seconds=-1)
+    job_id, _ = store.submit({"user_partner_profile": PROFILE}, 'key')
+    _, _, attempt = store.claim()
+    store.requeue_stale()
+
+    assert store.finish(job_id, attempt, 200, {"worker": "first"})
+    assert store.get(job_id)['status'] == 'succeeded'
+    assert store.claim() is None
@@ -0,0 +1,32 @@
+"""no_cache only opts out of the result cache when it is the boolean true."""
+import json
+
+import pytest
+
+import lambda_function
+
+PROFILE = "34 years old, lives in Denver, CO. I love trail running, jazz and trying new restaurants."
+
+
+def post(request):
+    return lambda_function.lambda_handler({"httpMethod": "POST", "body": json.dumps(request)}, None)
+
+
+@pytest.mark.parametrize('no_cache', ["false", "true", 0, 1, None])
+def test_non_boolean_no_cache_is_rejected(no_cache):
+    response = post({"user_partner_profile": PROFILE, "no_cache": no_cache})
+    assert response['statusCode'] == 400
+    assert 'no_cache' in json.loads(response['body'])['error']
+
+
+@pytest.mark.parametrize('no_cache, use_cache', [(True, False), (False, True)])
+def test_boolean_no_cache_sets_cache_use(monkeypatch, no_cache, use_cache):
+    calls = []
+
+    def fake_match(user_partner_profile, model_id, selection_mode, use_cache, top_k=1, deadline=None):
+        calls.append(use_cache)
+        return {"date_simulation": "", "compatibility_score": 50}
+
+    monkeypatch.setattr(lambda_function, 'match_profile', fake_match)
+    post({"user_partner_profile": PROFILE, "no_cache": no_cache})
+    assert calls == [use_cache]
@@ -0,0 +1,112 @@
+"""Retry, deadline and circuit breaker behaviour of resilience.ResilientClient."""
+import time
+
+import pytest
+
+from resilience import CircuitBreaker, ModelDeadlineError, ResilientClient, deadline_scope
+
+SIMULATION_REQUEST = {"kind": "simulation", "modelId": "m", "messages": [], "system": [{"text": "Simulate the date."}]}
+
+
+class RejectingClient:
+    """Answers every call with a validation error, as Bedrock does for a bad request."""
+
+    def converse(self, **request):
+        error = RuntimeError("Malformed input request")
+        error.response = {'Error': {'Code': 'ValidationException'}}
+        raise error
+
+
+class SlowClient:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def converse(self, **request):
+        time.sleep(self.delay)
+        return {"output": {"message": {"content": [{"text": "ok"}]}}}
+
+
+# Far beyond the deadlines below, so a busy test host cannot let a call finish in time
+SLOW_CALL_SECONDS = 0.5
+
+
+def test_caller_deadline_does_not_open_the_circuit():
+    slow = SlowClient(SLOW_CALL_SECONDS)
+    client = ResilientClient(slow, failure_threshold=2, hedge_percentile=0)
+    for _ in range(3):
+        with deadline_scope(time.monotonic() + 0.01):
+            with pytest.raises(ModelDeadlineError):
+                client.converse(**SIMULATION_REQUEST)
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    slow.delay = 0
+    assert client.converse(**SIMULATION_REQUEST)
+
+
+def test_own_call_timeout_counts_as_a_failure():
+    client = ResilientClient(SlowClient(SLOW_CALL_SECONDS), call_timeout=0.01, failure_threshold=2, hedge_percentile=0)
+    for _ in range(2):
+        with pytest.raises(ModelDeadlineError):
+            client.converse(**SIMULATION_REQUEST)
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+
+def opened_breaker(reset_timeout=60.0):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = opened_breaker()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert 0 < breaker.retry_after() <= 60
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = opened_breaker(reset_timeout=0)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
+
+
+def test_probe_outcome_closes_or_reopens():
+    breaker = opened_breaker(reset_timeout=0)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.healthy()
+
+    breaker = opened_breaker(reset_timeout=0)
+    assert breaker.allow()
+    breaker.record_attempt_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_bad_request_during_probe_does_not_close_the_circuit():
+    client = ResilientClient(RejectingClient(), failure_threshold=1, reset_timeout=0, hedge_percentile=0)
+    client.breaker.record_failure()
+    with pytest.raises(RuntimeError):
+        client.converse(**SIMULATION_REQUEST)
+    # Neither a success nor a failure: still half-open, and the next call may probe
+    assert client.breaker.state == CircuitBreaker.HALF_OPEN
+    assert client.breaker.allow()
+
+
+def test_requests_must_name_their_kind():
+    client = ResilientClient(SlowClient(0), hedge_percentile=0)
+    request = dict(SIMULATION_REQUEST)
+    del request['kind']
+    with pytest.raises(TypeError):
+        client.converse(**request)
@@ -0,0 +1,52 @@
+"""Expired rows in the shared SQLite stores are purged on warm-up and on a timer."""
+import json
+
+import pytest
+
+import lambda_function
+from result_cache import SQLiteCache
+
+
+@pytest.fixture
+def shared_cache(monkeypatch, tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite3'))
+    monkeypatch.setattr(lambda_function.RESULT_CACHE, 'shared', cache)
+    return cache
+
+
+def stored_keys(cache):
+    return {row[0] for row in cache._conn.execute("SELECT key FROM result_cache")}
+
+
+def test_warmup_purges_expired_entries(shared_cache):
+    shared_cache.set('expired', {"score": 1}, ttl_seconds=-1)
+    shared_cache.set('live', {"score": 2})
+    lambda_function.lambda_handler({"warmup": True}, None)
+    assert stored_keys(shared_cache) == {'live'}
+
+
+def test_requests_purge_at_most_once_per_interval(monkeypatch, shared_cache):
+    monkeypatch.setattr(lambda_function, 'STORE_PURGE_INTERVAL_SECONDS', 3600)
+    monkeypatch.setattr(lambda_function, '_last_store_purge', float('-inf'))
+    body = json.dumps({"user_partner_profile": "I love hiking, cooking and live music on weekends."})
+
+    shared_cache.set('first', {"score": 1}, ttl_seconds=-1)
+    lambda_function.lambda_handler({"httpMethod": "POST", "body": body}, None)
+    shared_cache.set('second', {"score": 1}, ttl_seconds=-1)
+    lambda_function.lambda_handler({"httpMethod": "POST", "body": body}, None)
+
+    keys = stored_keys(shared_cache)
+    assert 'first' not in keys and 'second' in keys
+
+
+@pytest.mark.parametrize('event', [
+    {"httpMethod": "OPTIONS"},
+    {"httpMethod": "GET", "path": "/health"},
+    {"httpMethod": "POST", "body": json.dumps({"user_partner_profile": ""})},
+    {"httpMethod": "POST", "body": json.dumps({"user_partner_profile": "I love hiking.", "top_k": 0})},
+])
+def test_rejected_and_non_match_requests_never_purge(monkeypatch, shared_cache, event):
+    monkeypatch.setattr(lambda_function, '_last_store_purge', float('-inf'))
+    shared_cache.set('expired', {"score": 1}, ttl_seconds=-1)
+    lambda_function.lambda_handler(event, None)
+    assert stored_keys(shared_cache) == {'expired'}
@@ -0,0 +1,56 @@
+"""Incremental parsing and repair of streamed model output."""
+import pytest
+
+from streaming_json import IncrementalJSONParser, repair_json
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('{"score": 8', {}),
+    ('{"score": 87, "ok": tr', {"score": 87}),
+    ('{"score": 87 ', {"score": 87}),
+    ('{"scores": [1, 2', {"scores": [1]}),
+])
+def test_close_drops_undelimited_trailing_literal(text, expected):
+    assert repair_json(text) == (expected, None)
+
+
+DOCUMENT = ('```json\n{"score": 87, "summary": "They met at \\"Caf\\u00e9 Luna\\" \\ud83d\\ude00\\nand talked", '
+            '"meta": {"compatibility_factors": {"humor": 9}, "potential_concerns": ["distance",]}}\n```')
+EXPECTED = {"score": 87, "summary": 'They met at "Café Luna" 😀\nand talked',
+            "meta": {"compatibility_factors": {"humor": 9}, "potential_concerns": ["distance"]}}
+
+
+def parse_in_chunks(text, size):
+    parser = IncrementalJSONParser(stream_paths=[('summary',)])
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return parser, events
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7, 11, len(DOCUMENT)])
+def test_chunk_boundaries_do_not_change_the_result(size):
+    parser, events = parse_in_chunks(DOCUMENT, size)
+    assert parser.done and parser.result == EXPECTED
+    # Escapes and surrogate pairs split across chunks are never streamed half-decoded
+    summary = ''.join(value for kind, path, value in events if kind == 'delta')
+    assert summary == EXPECTED['summary']
+    values = {path: value for kind, path, value in events if kind == 'value'}
+    assert values[('score',)] == 87
+    assert values[('meta', 'compatibility_factors')] == {"humor": 9}
+
+
+def test_close_keeps_a_truncated_string_and_reports_its_path():
+    value, truncated_path = repair_json('{"score": 87, "summary": "They met at the caf\\u00')
+    assert value == {"score": 87, "summary": "They met at the caf"}
+    assert truncated_path == ('summary',)
+
+
+def test_close_drops_an_unfinished_key_and_closes_containers():
+    assert repair_json('{"score": 87, "meta": {"compatibility_factors": {"humor": 9}, "potential_con') == (
+        {"score": 87, "meta": {"compatibility_factors": {"humor": 9}}}, None)
+
+
+def test_no_json_value_raises():
+    with pytest.raises(ValueError):
+        repair_json("Sorry, I can't help with that.")
@@ -0,0 +1,25 @@
+"""Streamed simulations end in a result event even when the model's output is unusable."""
+import pytest
+
+import lambda_function
+from model_backend import FakeBedrockBackend
+from resilience import ResilientClient
+
+USER = "28 years old, lives in Denver, CO. I love hiking and coffee shops."
+
+
+@pytest.fixture
+def malformed_client():
+    return ResilientClient(FakeBedrockBackend(malformed_rate=1.0, time_scale=0, seed=3), hedge_percentile=0)
+
+
+def test_missing_fields_fall_back_to_defaults(malformed_client):
+    candidate = lambda_function.DEMO_CANDIDATE_PROFILES[0]['profile']
+    events = list(lambda_function.stream_date_simulation(USER, candidate, malformed_client, lambda_function.MODEL_ID))
+    result = events[-1]
+    assert result['event'] == 'result'
+    meta = result['result']['meta']
+    assert 'compatibility_factors' in meta and 'potential_concerns' in meta
+    streamed = {event['event']: event for event in events}
+    if 'compatibility_factors' in streamed:
+        assert streamed['compatibility_factors']['compatibility_factors'] == meta['compatibility_factors']
@@ -0,0 +1,31 @@
+"""Profile compaction removes filler without rewriting what the user actually said."""
+import pytest
+
+from token_budget import compact_profile
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("We went to Bora Bora and Walla Walla.", "We went to Bora Bora and Walla Walla."),
+    ("I had had enough. I think that that matters.", "I had had enough. I think that that matters."),
+    ("I like like-minded people.", "I like like-minded people."),
+])
+def test_real_repetition_is_kept(text, expected):
+    assert compact_profile(text, 1000)[0] == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Um, you know, I like, like hiking.", "I like hiking."),
+    ("You know, I I love the the beach.", "I love the beach."),
+    ("I love hiking, you know, and cooking.", "I love hiking, and cooking."),
+])
+def test_filler_and_stutters_are_removed(text, expected):
+    compacted, report = compact_profile(text, 1000)
+    assert compacted == expected
+    assert report['fillers_removed'] > 0
+
+
+def test_budget_keeps_structured_facts_first():
+    text = "I really enjoy long walks on the beach at sunset. " * 3 + "28 years old, lives in Denver, CO."
+    compacted, report = compact_profile(text + " Something new every day keeps me going.", 20)
+    assert "lives in Denver" in compacted
+    assert report['duplicates_removed'] == 2 and report['tokens_after'] <= 20
@@ -0,0 +1,140 @@
+"""
+Token budget for user profiles: compact oversized profiles before they reach the model.
+
+A profile is the voice transcript followed by the form's structured sentences
+(see the frontend's profile formatter), and it is sent twice per request: to
+candidate selection and to the date simulation. Voice transcripts can be long,
+repetitive and full of filler, so compact_profile() bounds what the model prefills:
+
+    1. filler ("um", "uh", ", you know,", stuttered words) is removed
+    2. sentences repeated anywhere in the profile are kept once
+    3. if the profile is still over budget, whole sentences are kept in priority
+       order until the budget is used: structured facts (age, location, lifestyle,
+       dealbreakers), then stated values and preferences, then other free text
+
+Kept sentences stay in their original order, and a profile with nothing to remove
+is returned unchanged. Token counts are estimated locally
+(no tokenizer round trip), erring on the high side.
+"""
+import math
+import re
+
+from attribute_filter import extract_attributes
+
+# English prose averages about four characters per token; 3.5 overestimates a little
+CHARS_PER_TOKEN = 3.5
+
+# Unpunctuated speech-to-text output is split into chunks of this many words, so
+# one run-on "sentence" can still be deduplicated and trimmed
+MAX_SENTENCE_WORDS = 40
+
+PRIORITY_FACTS = 0
+PRIORITY_VALUES = 1
+PRIORITY_FREE_TEXT = 2
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n+')
+FILLER_WORDS = re.compile(r'(?:,\s*)?\b(?:u+[hm]+|e+rm+|hm+|mhm)\b,?', re.IGNORECASE)
+FILLER_PHRASES = re.compile(r'(?:^|,)\s*(?:you know|i mean|like|kind of|sort of|basically|literally)\s*,', re.IGNORECASE)
+# Stutters ("I I", "the the", "like, like") of short function words only: repeated
+# names ("Bora Bora") and grammatical repeats ("had had", "that that") are left alone
+STUTTER_WORDS = ('I', 'a', 'an', 'and', 'but', 'i', 'it', 'like', 'my', 'the', 'to', 'we')
+REPEATED_WORD = re.compile(rf"\b({'|'.join(STUTTER_WORDS)})(?:,?\s+\1\b(?!-))+")
+LEADING_PUNCTUATION = re.compile(r'^[\s,;]+')
+EXTRA_SPACE = re.compile(r'\s+(?=[,.!?;])|(?<=\s)\s+')
+NORMALIZE = re.compile(r'[^a-z0-9]+')
+
+# Phrases the frontend's profile formatter writes for form fields
+STRUCTURED_FACTS = re.compile(
+    r"\b\d+ years old\b|\blives in\b|\btall\b|^Works as\b|^Has an?\b|^Looking for\b|\bdrinks \w+"
+    r"|\bsmokes \w+|\buses marijuana\b|\bpolitically\b|\bwants children:|\bhas children\b|\breligious \("
+)
+STATED_VALUES = re.compile(
+    r"\b(?:i value|values?|important to me|matters? to me|i believe|i'?m looking for|looking for|i want|i need"
+    r"|i'?d (?:like|love)|must|deal ?-?breakers?|non-?negotiable|can'?t stand|won'?t date|i prefer|ideal partner"
+    r"|someone who|partner who)\b",
+    re.IGNORECASE
+)
+
+
+def estimate_tokens(text):
+    """Rough local token count for a piece of text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def split_sentences(text):
+    """Sentences of a profile, with run-on sentences chunked to MAX_SENTENCE_WORDS words."""
+    sentences = []
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        words = sentence.split()
+        for start in range(0, len(words), MAX_SENTENCE_WORDS):
+            sentences.append(' '.join(words[start:start + MAX_SENTENCE_WORDS]))
+    return sentences
+
+
+def remove_filler(sentence):
+    """The sentence without voice filler; returns (sentence, number of fillers removed)."""
+    # Phrases first: "Um, you know, ..." still has the comma that marks "you know"
+    sentence, phrases = FILLER_PHRASES.subn(',', sentence)
+    sentence, words = FILLER_WORDS.subn('', sentence)
+    sentence, repeats = REPEATED_WORD.subn(r'\1', sentence)
+    sentence = EXTRA_SPACE.sub('', LEADING_PUNCTUATION.sub('', sentence)).strip()
+    return sentence, words + phrases + repeats
+
+
+def sentence_priority(sentence):
+    """PRIORITY_FACTS, PRIORITY_VALUES or PRIORITY_FREE_TEXT; lower is kept first."""
+    if STRUCTURED_FACTS.search(sentence) or extract_attributes(sentence):
+        return PRIORITY_FACTS
+    if STATED_VALUES.search(sentence):
+        return PRIORITY_VALUES
+    return PRIORITY_FREE_TEXT
+
+
+def compact_profile(text, budget):
+    """Compact a profile to at most `budget` estimated tokens (0 means no limit).
+
+    Returns (compacted_text, report). The report counts tokens before and after,
+    fillers removed, duplicate sentences removed and sentences dropped for the budget.
+    """
+    report = {
+        "tokens_before": estimate_tokens(text),
+        "tokens_after": 0,
+        "fillers_removed": 0,
+        "duplicates_removed": 0,
+        "sentences_dropped": 0,
+    }
+
+    sentences = []
+    seen = set()
+    for sentence in split_sentences(text):
+        sentence, fillers = remove_filler(sentence)
+        report['fillers_removed'] += fillers
+        key = NORMALIZE.sub(' ', sentence.lower()).strip()
+        if not key:
+            continue
+        if key in seen:
+            report['duplicates_removed'] += 1
+            continue
+        seen.add(key)
+        sentences.append(sentence)
+
+    # Each sentence also costs the space that joins it to the next
+    costs = [estimate_tokens(sentence + ' ') for sentence in sentences]
+    if budget and sum(costs) > budget:
+        by_priority = sorted(range(len(sentences)), key=lambda position: (sentence_priority(sentences[position]), position))
+        kept = set()
+        remaining = budget
+        for position in by_priority:
+            if costs[position] <= remaining:
+                kept.add(position)
+                remaining -= costs[position]
+        report['sentences_dropped'] = len(sentences) - len(kept)
+        sentences = [sentence for position, sentence in enumerate(sentences) if position in kept]
+
+    if report['fillers_removed'] or report['duplicates_removed'] or report['sentences_dropped']:
+        compacted = ' '.join(sentences)
+    else:
+        # Nothing to remove: keep the text (and its line breaks) exactly as sent
+        compacted = text
+    report['tokens_after'] = estimate_tokens(compacted)
+    return compacted, report